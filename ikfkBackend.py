@@ -0,0 +1,61 @@
+'''
+The following script will let ikfkGen.py talk to a pluggable scene backend instead of importing maya.cmds directly.
+Inside Maya the backend is maya.cmds itself. Outside Maya (CI boxes, farm nodes without a license) it falls back to the
+in-memory scene graph of ikfkFakeScene.py, so the build and match logic can be imported, timed and regression-tested.
+
+    import ikfkBackend, ikfkFakeScene
+    ikfkBackend.set_backend(ikfkFakeScene.FakeScene())
+    import ikfkGen
+    ikfkGen.build_arm('L_shoulder')
+'''
+
+import contextlib
+
+_backend=None
+
+#----------------------------------------
+#         Select the Scene Backend
+#----------------------------------------
+
+def default_backend():
+    # a. maya.cmds when running inside Maya or mayapy
+    try:
+        import maya.cmds
+        return maya.cmds
+    # b. Otherwise an empty in-memory scene
+    except ImportError:
+        import ikfkFakeScene
+        return ikfkFakeScene.FakeScene()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend=default_backend()
+    return _backend
+
+def set_backend(backend):
+    global _backend
+    previous=_backend
+    _backend=backend
+    return previous
+
+@contextlib.contextmanager
+def use_backend(backend):
+    # To switch the backend for the duration of a with-block, e.g. one fake scene per benchmark run
+    previous=set_backend(backend)
+    try:
+        yield backend
+    finally:
+        set_backend(previous)
+
+#----------------------------------------
+#          The cmds Stand-in
+#----------------------------------------
+
+class CmdsProxy(object):
+    # Every attribute lookup is forwarded to the current backend, so `cmds.duplicate(...)` keeps working
+    # unchanged in ikfkGen.py whichever backend is active when the call is made.
+    def __getattr__(self,name):
+        return getattr(get_backend(),name)
+
+cmds=CmdsProxy()
@@ -0,0 +1,250 @@
+'''
+The following script will bake the IK/FK match over a frame range. ikTofk() and fkToik() match the controls at the
+current frame only; baking samples the world matrices of the source chain once per frame in a single pass (without
+stepping the current time), computes the control transforms of every frame at once with NumPy and writes each
+animated channel as one bulk key write. The IK joints are sampled in the same pass as the controls, evaluated by the
+ikHandle the way the scene plays back.
+
+    import ikfkBake
+    ikfkBake.bake_ik_to_fk('L_wrist_IK_Ctrl',1,2000)    # IK controls follow the FK chain
+    ikfkBake.bake_fk_to_ik('L_elbow_FK_Ctrl',1,2000)    # FK controls follow the IK chain
+
+bake_selected(start,end) bakes whichever control is selected, the way the Match buttons work. Offline, where the
+ikHandle is not evaluated, bake_fk_to_ik(...,solver=True) solves the IK chain of every frame with ikfkSolver from the
+handle, the pole vector and the parent of the shoulder instead of sampling it.
+'''
+
+import numpy as np
+
+import ikfkBackend
+import ikfkLinks
+import ikfkPoleVector
+import ikfkRoles
+from ikfkBackend import cmds
+
+#----------------------------------------
+#        Sampling and Key Writing
+#----------------------------------------
+
+def frame_range(start,end,step=1):
+    return [float(frame) for frame in np.arange(start,end+step*0.5,step)]
+
+def sample_world_matrices(nodes,frames):
+    # a. World matrices of every node at every frame: an (F,N,4,4) array
+    backend=ikfkBackend.get_backend()
+    # a.1 Backends with a native batch (the in-memory scene) sample everything in a single call
+    if hasattr(backend,'worldMatrices'):
+        return np.asarray(backend.worldMatrices(nodes,frames),dtype=float).reshape(len(frames),len(nodes),4,4)
+    # b. In Maya, one pass over the frames, each worldMatrix plug evaluated in a DG context at that frame
+    import maya.api.OpenMaya as om
+    selection=om.MSelectionList()
+    for node in nodes:
+        selection.add(node)
+    plugs=[om.MFnDependencyNode(selection.getDependNode(i)).findPlug('worldMatrix',False).elementByLogicalIndex(0)
+           for i in range(len(nodes))]
+    unit=om.MTime.uiUnit()
+    result=np.empty((len(frames),len(nodes),4,4))
+    for i,frame in enumerate(frames):
+        context=om.MDGContext(om.MTime(frame,unit))
+        for j,plug in enumerate(plugs):
+            result[i,j]=np.reshape(om.MFnMatrixData(plug.asMObject(context)).matrix(),(4,4))
+    return result
+
+def write_keys(plug,frames,values):
+    # a. All the keys of one channel in one call
+    backend=ikfkBackend.get_backend()
+    if hasattr(backend,'setKeys'):
+        backend.setKeys(plug,frames,[float(value) for value in values])
+        return
+    # b. In Maya through the animation curve of the plug, created the way setKeyframe would
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+    node,attr=plug.split('.',1)
+    if not cmds.keyframe(plug,q=True,kc=True):
+        cmds.setKeyframe(node,at=attr,t=frames[0])
+    selection=om.MSelectionList()
+    selection.add(plug)
+    curve=oma.MFnAnimCurve(selection.getPlug(0))
+    unit=om.MTime.uiUnit()
+    # b.1 Rotations are stored on the curve in radians
+    if curve.animCurveType==oma.MFnAnimCurve.kAnimCurveTA:
+        values=np.radians(values)
+    curve.addKeys([om.MTime(frame,unit) for frame in frames],[float(value) for value in values],
+                  oma.MFnAnimCurve.kTangentAuto,oma.MFnAnimCurve.kTangentAuto,False)
+
+#----------------------------------------
+#         Vectorized Transforms
+#----------------------------------------
+
+def matrix_to_euler(rotations):
+    # a. XYZ rotate order (R = Rx * Ry * Rz, row vectors), (...,3,3) rotation matrices to degrees
+    sy=np.clip(-rotations[...,0,2],-1.0,1.0)
+    y=np.arcsin(sy)
+    regular=np.abs(np.cos(y))>1e-6
+    x=np.where(regular,np.arctan2(rotations[...,1,2],rotations[...,2,2]),np.arctan2(-rotations[...,2,1],rotations[...,1,1]))
+    z=np.where(regular,np.arctan2(rotations[...,0,1],rotations[...,0,0]),0.0)
+    return np.degrees(np.stack([x,y,z],axis=-1))
+
+def euler_to_matrix(rotate):
+    # a. The inverse of matrix_to_euler(): XYZ rotate values in degrees, (...,3) to (...,3,3)
+    radians=np.radians(np.asarray(rotate,dtype=float))
+    (cx,cy,cz),(sx,sy,sz)=np.moveaxis(np.cos(radians),-1,0),np.moveaxis(np.sin(radians),-1,0)
+    # a.1 Rx * Ry * Rz multiplied out, one element at a time
+    matrices=np.empty(radians.shape[:-1]+(3,3))
+    matrices[...,0,0],matrices[...,0,1],matrices[...,0,2]=cy*cz,cy*sz,-sy
+    matrices[...,1,0],matrices[...,1,1],matrices[...,1,2]=sx*sy*cz-cx*sz,sx*sy*sz+cx*cz,sx*cy
+    matrices[...,2,0],matrices[...,2,1],matrices[...,2,2]=cx*sy*cz+sx*sz,cx*sy*sz-sx*cz,cx*cy
+    return matrices
+
+def local_channels(world,parent_world):
+    # a. Translate and rotate values giving each frame's control the world matrix, below its parent of that frame
+    local=np.matmul(world,np.linalg.inv(parent_world))
+    rotation=local[...,:3,:3]/np.linalg.norm(local[...,:3,:3],axis=-1,keepdims=True)
+    # b. Consecutive frames keep continuous angles instead of jumping by 360 degrees
+    rotate=np.degrees(np.unwrap(np.radians(matrix_to_euler(rotation)),axis=0))
+    return local[...,3,:3],rotate
+
+def with_translation(rotations,positions):
+    matrices=np.array(rotations,dtype=float)
+    matrices[...,3,:3]=positions
+    return matrices
+
+#----------------------------------------
+#           Rig Lookups
+#----------------------------------------
+
+def parent_of(node):
+    parent=cmds.listRelatives(node,p=True)
+    return parent[0] if parent else None
+
+def ik_to_fk_nodes(ik_ctrl):
+    # a. The nodes ikTofk() matches, through the links of the IK wrist control or the pole vector
+    rig=ikfkLinks.rig_of(ik_ctrl)
+    return {'ik_ctrl':rig['ik_control'],'pole_vec':rig['pole_vector'],'fk_shoulder':rig['fk_joints']['shoulder'],
+            'fk_elbow':rig['fk_joints']['elbow'],'fk_wrist':rig['fk_joints']['wrist']}
+
+def fk_to_ik_nodes(fk_ctrl):
+    # a. The FK controls of the arm, parents first, each with its IK joint
+    rig=ikfkLinks.rig_of(fk_ctrl)
+    return [(rig['fk_controls'][role],rig['ik_joints'][role]) for role in ikfkRoles.ROLES
+            if rig['fk_controls'][role] and rig['ik_joints'][role]]
+
+def ik_handle_of(ik_shoulder):
+    # a. The ikHandle solving a chain, connected to the message of its start joint
+    for node in cmds.listConnections(ik_shoulder+'.message',s=False,d=True) or []:
+        if cmds.nodeType(node)=='ikHandle':
+            return node
+    return None
+
+#----------------------------------------
+#            Solved IK Chain
+#----------------------------------------
+
+def local_matrices(rotations,translate):
+    matrices=np.zeros(np.shape(rotations)[:-2]+(4,4))
+    matrices[...,:3,:3]=rotations
+    matrices[...,3,:3]=translate
+    matrices[...,3,3]=1.0
+    return matrices
+
+def solved_ik_joints(rig,frames):
+    # a. World matrices of the IK shoulder, elbow and wrist joints at every frame, (F,3,4,4), solved by ikfkSolver from
+    #    the handle, the pole vector and the parent of the shoulder sampled in one pass, and the twist in another
+    import ikfkSolver
+    import ikfkTransfer
+    joints=[rig['ik_joints'][role] for role in ikfkRoles.ROLES]
+    handle=ik_handle_of(joints[0]) if all(joints) else None
+    if handle is None or not rig['pole_vector'] or not rig['ik_control']:
+        return sample_world_matrices(joints,frames)
+    parent=parent_of(joints[0])
+    world=sample_world_matrices([handle,rig['pole_vector'],rig['ik_control']]+([parent] if parent else []),frames)
+    parents=world[:,3] if parent else np.broadcast_to(np.identity(4),(len(frames),4,4))
+    translates=[cmds.getAttr(joint+'.translate')[0] for joint in joints]
+    orients=[cmds.getAttr(joint+'.jointOrient')[0] for joint in joints]
+    rotates=[cmds.getAttr(joint+'.rotate')[0] for joint in joints[:2]]
+    twist=ikfkTransfer.sample_channels([handle+'.twist'],frames)[0]
+    shoulder_rotate,elbow_rotate=ikfkSolver.solve_rotates(parents,translates,orients,rotates,world[:,0,3,:3],world[:,1,3,:3],twist)
+    # b. world = rotate * jointOrient * translate * parent; the wrist takes the world rotation of the IK control, which
+    #    its orientConstraint gives it
+    orient=euler_to_matrix(orients)
+    shoulder=np.matmul(local_matrices(np.matmul(euler_to_matrix(shoulder_rotate),orient[0]),translates[0]),parents)
+    elbow=np.matmul(local_matrices(np.matmul(euler_to_matrix(elbow_rotate),orient[1]),translates[1]),shoulder)
+    control=world[:,2,:3,:3]/np.linalg.norm(world[:,2,:3,:3],axis=-1,keepdims=True)
+    wrist=local_matrices(control,np.matmul(local_matrices(orient[2],translates[2]),elbow)[:,3,:3])
+    return np.stack([shoulder,elbow,wrist],axis=1)
+
+#----------------------------------------
+#               Baking
+#----------------------------------------
+
+def bake_ik_to_fk(ik_ctrl,start,end,step=1):
+    frames=frame_range(start,end,step)
+    nodes=ik_to_fk_nodes(ik_ctrl)
+    # a. One sampling pass: the FK chain and the parents of the two IK controls
+    sampled=[nodes['fk_shoulder'],nodes['fk_elbow'],nodes['fk_wrist']]
+    parents=[parent_of(nodes['ik_ctrl']),parent_of(nodes['pole_vec'])]
+    world=sample_world_matrices(sampled+[parent for parent in parents if parent],frames)
+    identity=np.broadcast_to(np.identity(4),(len(frames),4,4))
+    parent_world=[]
+    index=len(sampled)
+    for parent in parents:
+        parent_world.append(world[:,index] if parent else identity)
+        index+=1 if parent else 0
+    # b. The wrist control takes the FK wrist; the pole vector sits off the FK elbow in the plane of the FK chain
+    shoulder,elbow,wrist=world[:,0,3,:3],world[:,1,3,:3],world[:,2,3,:3]
+    poles=ikfkPoleVector.pole_vector_positions(shoulder,elbow,wrist)
+    translate,rotate=local_channels(world[:,2],parent_world[0])
+    pole_translate=local_channels(with_translation(identity,poles),parent_world[1])[0]
+    # c. Bulk key writes, one per channel
+    for axis,index in (('X',0),('Y',1),('Z',2)):
+        write_keys(nodes['ik_ctrl']+'.translate'+axis,frames,translate[:,index])
+        write_keys(nodes['ik_ctrl']+'.rotate'+axis,frames,rotate[:,index])
+        write_keys(nodes['pole_vec']+'.translate'+axis,frames,pole_translate[:,index])
+    return len(frames)
+
+def bake_fk_to_ik(fk_ctrl,start,end,step=1,solver=False):
+    frames=frame_range(start,end,step)
+    pairs=fk_to_ik_nodes(fk_ctrl)
+    ctrls=[ctrl for ctrl,joint in pairs]
+    # a. One sampling pass: the IK joints, the control groups and the controls as they are now
+    groups=[parent_of(ctrl) for ctrl in ctrls]
+    joints=[joint for ctrl,joint in pairs]
+    count=len(pairs)
+    if solver:
+        # a.1 Offline, the IK chain is solved from its handle instead of evaluated
+        rig=ikfkLinks.rig_of(fk_ctrl)
+        chain=[rig['ik_joints'][role] for role in ikfkRoles.ROLES]
+        targets=solved_ik_joints(rig,frames)[:,[chain.index(joint) for joint in joints]]
+        world=sample_world_matrices(groups+ctrls,frames)
+    else:
+        world=sample_world_matrices(joints+groups+ctrls,frames)
+        targets,world=world[:,:count],world[:,count:]
+    group_world,ctrl_world=world[:,:count],world[:,count:]
+    # b. Parents first: a control group hanging under another FK control moves with that control's new matrix
+    baked={}
+    for i,ctrl in enumerate(ctrls):
+        parent_ctrl=parent_of(groups[i])
+        parent_world=group_world[:,i]
+        if parent_ctrl in baked:
+            j=ctrls.index(parent_ctrl)
+            parent_world=np.matmul(np.matmul(group_world[:,i],np.linalg.inv(ctrl_world[:,j])),baked[parent_ctrl])
+        # b.1 FK controls only rotate, they keep the position of their group
+        target=with_translation(targets[:,i],parent_world[:,3,:3])
+        baked[ctrl]=target
+        rotate=local_channels(target,parent_world)[1]
+        for axis,index in (('X',0),('Y',1),('Z',2)):
+            write_keys(ctrl+'.rotate'+axis,frames,rotate[:,index])
+    return len(frames)
+
+def bake_selected(start,end,step=1):
+    selCtrl=cmds.ls(sl=True)
+    if not selCtrl or len(selCtrl)!=1:
+        cmds.warning('Please select only one control.')
+        return 0
+    # a. The pole vector bakes its arm like the IK wrist control does
+    if selCtrl[0].endswith('_IK_Ctrl') or selCtrl[0].endswith('_IK_PoleVec'):
+        return bake_ik_to_fk(selCtrl[0],start,end,step)
+    if selCtrl[0].endswith('_FK_Ctrl'):
+        return bake_fk_to_ik(selCtrl[0],start,end,step)
+    cmds.warning('Please select an IK or FK control.')
+    return 0
@@ -0,0 +1,163 @@
+'''
+The following script will build the IK/FK setup of ikfkGen.py headlessly on every matching arm of a list of scene files.
+Each scene is opened, rigged and saved by its own worker process, so a whole directory of character variants can be
+refreshed overnight without anyone clicking "Create".
+
+Usage (from mayapy):
+    mayapy ikfkBatch.py scenes/*.ma --pattern "*shoulder*" --workers 8 --output-dir rigged --report report.json
+
+With --fake the scenes are JSON dumps of the in-memory scene of ikfkFakeScene.py and no Maya is needed.
+'''
+
+import argparse
+import fnmatch
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+#----------------------------------------
+#          Worker Process Setup
+#----------------------------------------
+
+def init_worker(fake=False):
+    # a. To build into an in-memory scene instead of Maya
+    if fake:
+        import ikfkBackend
+        import ikfkFakeScene
+        ikfkBackend.set_backend(ikfkFakeScene.FakeScene())
+        return
+    # b. To start a standalone Maya session once per worker process
+    try:
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+    # b.1 A local stand-in of maya.cmds has no standalone module, nothing to initialize then
+    except ImportError:
+        pass
+
+#----------------------------------------
+#        Find the Arms in a Scene
+#----------------------------------------
+
+def find_shoulders(cmds,patterns):
+    import ikfkRoles
+    shoulders=[]
+    for jnt in cmds.ls(type='joint') or []:
+        # a. To skip the IK/FK chains of arms that are already rigged
+        if jnt.endswith('_IK') or jnt.endswith('_FK'):
+            continue
+        # b. To keep the joints matching any of the patterns, the same way create_joints() checks a selection
+        if not any(fnmatch.fnmatch(jnt.lower(),pattern.lower()) for pattern in patterns):
+            continue
+        if ikfkRoles.role_of(jnt)!='shoulder':
+            continue
+        if not cmds.listRelatives(jnt,c=True,type='joint'):
+            continue
+        if jnt not in shoulders:
+            shoulders.append(jnt)
+    return shoulders
+
+#----------------------------------------
+#          Rig a Single Scene
+#----------------------------------------
+
+def build_scene(job):
+    path,patterns,output_dir,options=job
+    options=dict(options)
+    plan_cache=options.pop('plan_cache',None)
+    result={'scene':path,'output':None,'arms':[],'failures':[],'seconds':0.0}
+    start=time.time()
+    try:
+        from ikfkBackend import cmds
+        import ikfkGen
+        import ikfkPlan
+        # a. To open the scene
+        cmds.file(path,open=True,force=True)
+        # b. To build the rig on every matching shoulder joint
+        for shoulder in find_shoulders(cmds,patterns):
+            try:
+                # b.1 With a plan cache, arms whose source chain was rigged before are applied from their spec
+                if plan_cache:
+                    ikfkPlan.build_arm(shoulder,cache=ikfkPlan.PlanCache(plan_cache),**options)
+                else:
+                    ikfkGen.build_arm(shoulder,**options)
+                result['arms'].append(shoulder)
+            except Exception:
+                result['failures'].append({'arm':shoulder,'error':traceback.format_exc()})
+        # c. To save the rigged scene next to the source or into the output directory
+        if output_dir:
+            output=os.path.join(output_dir,os.path.basename(path))
+        else:
+            root,ext=os.path.splitext(path)
+            output=root+'_rigged'+ext
+        scene_type='mayaBinary' if output.lower().endswith('.mb') else 'mayaAscii'
+        cmds.file(rename=output)
+        cmds.file(save=True,type=scene_type,force=True)
+        result['output']=output
+    except Exception:
+        result['failures'].append({'arm':None,'error':traceback.format_exc()})
+    result['seconds']=time.time()-start
+    return result
+
+#----------------------------------------
+#       Rig Many Scenes in a Pool
+#----------------------------------------
+
+def build_scenes(paths,patterns=('*shoulder*',),workers=None,output_dir=None,fake=False,options=None):
+    # a. options are passed on to ikfkGen.build_arm(), e.g. {'network':'lean'}; 'plan_cache' is a directory of build
+    #    specs shared by the workers, see ikfkPlan.py
+    if output_dir and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    jobs=[(path,list(patterns),output_dir,dict(options or {})) for path in paths]
+    # b. One scene per task so a crashing scene only takes its own build down
+    pool=multiprocessing.Pool(processes=workers,initializer=init_worker,initargs=(fake,),maxtasksperchild=1)
+    try:
+        results=list(pool.imap_unordered(build_scene,jobs))
+    finally:
+        pool.close()
+        pool.join()
+    results.sort(key=lambda result: paths.index(result['scene']))
+    return results
+
+def print_report(results):
+    total=0.0
+    for result in results:
+        total+=result['seconds']
+        status='FAILED' if result['failures'] else 'ok'
+        print('%-6s %8.2fs  %d arm(s)  %s' % (status,result['seconds'],len(result['arms']),result['scene']))
+        for failure in result['failures']:
+            print('       %s' % (failure['arm'] or 'scene'))
+            print('       '+failure['error'].strip().replace('\n','\n       '))
+    failed=len([result for result in results if result['failures']])
+    print('%d scene(s), %d failed, %.2fs of build time' % (len(results),failed,total))
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Build the IK/FK arm rig on a batch of scene files.')
+    parser.add_argument('scenes',nargs='+',help='scene files or glob patterns')
+    parser.add_argument('--pattern',action='append',dest='patterns',help='shoulder joint name pattern, may be repeated')
+    parser.add_argument('--workers',type=int,default=None,help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--output-dir',default=None,help='where the rigged scenes are saved')
+    parser.add_argument('--report',default=None,help='write the per-scene results to a JSON file')
+    parser.add_argument('--fake',action='store_true',help='build into the in-memory scene of ikfkFakeScene.py instead of Maya')
+    parser.add_argument('--network',choices=('classic','lean'),default='classic',help='switch network style, see ikfkGen.NETWORKS')
+    parser.add_argument('--fk-drive',choices=('constraint','direct'),default='constraint',help='how the FK controls drive the FK joints, see ikfkGen.FK_DRIVES')
+    parser.add_argument('--extract',choices=('duplicate','selective'),default='duplicate',help='how the IK and FK chains are made, see ikfkGen.EXTRACTIONS')
+    parser.add_argument('--plan-cache',default=None,help='directory of cached build specs, see ikfkPlan.py')
+    args=parser.parse_args(argv)
+
+    paths=[]
+    for scene in args.scenes:
+        for path in sorted(glob.glob(scene)) or [scene]:
+            if path not in paths:
+                paths.append(path)
+    results=build_scenes(paths,args.patterns or ['*shoulder*'],args.workers,args.output_dir,args.fake,{'network':args.network,'fk_drive':args.fk_drive,'extract':args.extract,'plan_cache':args.plan_cache})
+    print_report(results)
+    if args.report:
+        with open(args.report,'w') as f:
+            json.dump(results,f,indent=2)
+    return 1 if any(result['failures'] for result in results) else 0
+
+if __name__=='__main__':
+    raise SystemExit(main())
@@ -0,0 +1,722 @@
+'''
+The following script will time the IK/FK build and match on the in-memory scene of ikfkFakeScene.py, so build
+performance can be tracked on every commit without a Maya license.
+
+Usage:
+    python ikfkBench.py --arms 50 --repeat 3 --json bench.json
+'''
+
+import argparse
+import json
+import time
+
+import ikfkBackend
+import ikfkChannels
+import ikfkFakeScene
+import ikfkRoles
+
+#----------------------------------------
+#            Scene Helpers
+#----------------------------------------
+
+def arm_scene(arms):
+    # a. To lay out the sample arm skeleton N times, alternating sides, 200 units apart
+    scene=ikfkFakeScene.FakeScene()
+    shoulders=[]
+    for i in range(arms):
+        side='L' if i%2==0 else 'R'
+        shoulders.append(ikfkFakeScene.create_arm_skeleton(scene,side+str(i//2),offset=(0.0,0.0,200.0*(i//2))))
+    return scene,shoulders
+
+class NodeCounter(object):
+    # Forwards every command to the in-memory scene and counts the nodes it adds to the scene or removes from it
+    def __init__(self,scene):
+        self._scene=scene
+        self.created=0
+        self.deleted=0
+
+    def __getattr__(self,name):
+        command=getattr(self._scene,name)
+        if not callable(command):
+            return command
+
+        def counted(*args,**kwargs):
+            before=set(self._scene.nodes)
+            try:
+                return command(*args,**kwargs)
+            finally:
+                after=set(self._scene.nodes)
+                self.created+=len(after-before)
+                self.deleted+=len(before-after)
+        return counted
+
+def timed(function,*args):
+    start=time.time()
+    function(*args)
+    return time.time()-start
+
+#----------------------------------------
+#              Benchmarks
+#----------------------------------------
+
+def bench_build(arms):
+    import ikfkGen
+    scene,shoulders=arm_scene(arms)
+    ikfkChannels.reset_stats()
+    with ikfkBackend.use_backend(scene):
+        seconds=0.0
+        for shoulder in shoulders:
+            scene.select(shoulder)
+            seconds+=timed(ikfkGen.create_joints)
+    return {'arms':arms,'seconds':seconds,'nodes':len(scene.nodes),'lock_hide_calls_saved':ikfkChannels.calls_saved()}
+
+def bench_match(arms):
+    # a. Both matches on every arm; the commands per match stay the same however many arms the scene has
+    import ikfkGen
+    import ikfkProfile
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder)
+        ik_to_fk=fk_to_ik=0.0
+        with ikfkProfile.profile(ikfkGen) as profiler:
+            for shoulder in shoulders:
+                side=shoulder[:-len('_shoulder')]
+                scene.select(side+'_wrist_IK_Ctrl')
+                ik_to_fk+=timed(ikfkGen.ikTofk)
+                scene.select(side+'_elbow_FK_Ctrl')
+                fk_to_ik+=timed(ikfkGen.fkToik)
+    commands=sum(command['calls'] for command in profiler.summary()['commands'].values())
+    return {'arms':arms,'ikTofk_seconds':ik_to_fk,'fkToik_seconds':fk_to_ik,'commands_per_match':commands/(2.0*arms)}
+
+def bench_queries(arms):
+    # a. Hierarchy queries issued per arm build, the joint-role index keeps them to one walk per chain
+    import ikfkGen
+    import ikfkProfile
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        with ikfkProfile.profile(ikfkGen) as profiler:
+            for shoulder in shoulders:
+                scene.select(shoulder)
+                ikfkGen.create_joints()
+    commands=profiler.summary()['commands']
+    queries=sum(commands.get(name,{'calls':0})['calls'] for name in ('listRelatives','objExists','ls'))
+    return {'arms':arms,'hierarchy_queries':queries,'queries_per_arm':queries/float(arms)}
+
+def animate_fk(scene,side,frames):
+    # a. A few keys on the FK controls so every frame has a different pose to match
+    for frame in range(1,frames+1,max(1,frames//4)):
+        scene.setKeyframe(side+'_shoulder_FK_Ctrl',at='rotateZ',t=frame,v=(frame%90)-45.0)
+        scene.setKeyframe(side+'_elbow_FK_Ctrl',at='rotateY',t=frame,v=-(frame%60))
+
+def bench_batch(arms):
+    # a. Every arm matched both ways: one control at a time with ikTofk()/fkToik() against one batch over all of them,
+    #    each on its own copy of the same posed scene
+    import ikfkGen
+    import ikfkMatch
+    result={'arms':arms}
+    wrists={}
+    for mode in ('single','batch'):
+        scene,shoulders=arm_scene(arms)
+        sides=[shoulder[:-len('_shoulder')] for shoulder in shoulders]
+        with ikfkBackend.use_backend(scene):
+            for shoulder in shoulders:
+                ikfkGen.build_arm(shoulder)
+            for side in sides:
+                scene.setAttr(side+'_shoulder_FK_Ctrl.rotateZ',30.0)
+                scene.setAttr(side+'_elbow_FK_Ctrl.rotateY',-40.0)
+            seconds=0.0
+            for direction,single,control in (('ik',ikfkGen.ikTofk,'_wrist_IK_Ctrl'),('fk',ikfkGen.fkToik,'_elbow_FK_Ctrl')):
+                if mode=='single':
+                    start=time.time()
+                    for side in sides:
+                        scene.select(side+control)
+                        single()
+                    seconds+=time.time()-start
+                else:
+                    seconds+=timed(ikfkMatch.match_controls,[side+control for side in sides],direction)
+            wrists[mode]=[scene.xform(side+'_wrist',q=True,ws=True,t=True) for side in sides]
+        result[mode+'_seconds']=seconds
+    result['speedup']=result['single_seconds']/result['batch_seconds']
+    result['max_wrist_difference']=max(abs(a-b) for single,batch in zip(wrists['single'],wrists['batch']) for a,b in zip(single,batch))
+    return result
+
+def bench_live(arms,steps=50):
+    # a. The switch of every arm dragged from FK (1) to IK (0) in small steps, each step reported to the live mode the
+    #    way its attribute callback would; the queued flushes run afterwards like idle events
+    import ikfkGen
+    import ikfkLinks
+    import ikfkLive
+    scene,shoulders=arm_scene(arms)
+    sides=[shoulder[:-len('_shoulder')] for shoulder in shoulders]
+    queue=[]
+    ikfkLive.reset_stats()
+    with ikfkBackend.use_backend(scene):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder)
+        switches=[scene.listConnections(side+'_wrist_IK_Ctrl.'+ikfkLinks.SWITCH_LINK)[0] for side in sides]
+        auto=ikfkLive.AutoMatch(queue.append)
+        for side,switch in zip(sides,switches):
+            scene.setAttr(switch+'.ikFkSwitch',1.0)
+            auto.track(switch)
+            scene.setAttr(side+'_shoulder_FK_Ctrl.rotateZ',30.0)
+            scene.setAttr(side+'_elbow_FK_Ctrl.rotateY',-40.0)
+        before=[scene.xform(side+'_wrist',q=True,ws=True,t=True) for side in sides]
+        for step in range(steps+1):
+            value=1.0-float(step)/steps
+            for switch in switches:
+                scene.setAttr(switch+'.ikFkSwitch',value)
+                auto.changed(switch,value)
+        unmatched=[scene.xform(side+'_wrist',q=True,ws=True,t=True) for side in sides]
+        while queue:
+            queue.pop(0)()
+        after=[scene.xform(side+'_wrist',q=True,ws=True,t=True) for side in sides]
+
+    def pop(poses):
+        return max(abs(a-b) for pose,start in zip(poses,before) for a,b in zip(pose,start))
+    return {'arms':arms,'changes':ikfkLive.stats['changes'],'flushes':ikfkLive.stats['flushes'],'matches':ikfkLive.stats['matches'],
+            'callback_seconds':ikfkLive.stats['callback_seconds'],'flush_seconds':ikfkLive.stats['flush_seconds'],
+            'us_per_change':1e6*ikfkLive.stats['callback_seconds']/ikfkLive.stats['changes'],
+            'pop_without_match':pop(unmatched),'pop':pop(after)}
+
+def bench_extract(arms):
+    # a. The IK and FK chains duplicated with the whole hand and cut down, against created joint by joint; timed on
+    #    one scene, nodes counted on another
+    import ikfkGen
+    result={'arms':arms}
+    for extract in ikfkGen.EXTRACTIONS:
+        scene,shoulders=arm_scene(arms)
+        with ikfkBackend.use_backend(scene):
+            seconds=0.0
+            for shoulder in shoulders:
+                seconds+=timed(lambda: ikfkGen.build_arm(shoulder,extract=extract))
+        result[extract+'_seconds']=seconds
+        scene,shoulders=arm_scene(arms)
+        counter=NodeCounter(scene)
+        with ikfkBackend.use_backend(counter):
+            for shoulder in shoulders:
+                ikfkGen.build_arm(shoulder,extract=extract)
+        result[extract+'_created_per_arm']=counter.created/float(arms)
+        result[extract+'_deleted_per_arm']=counter.deleted/float(arms)
+    return result
+
+def bench_mirror(arms):
+    # a. The right arms of a scene of left/right pairs, built again against mirrored from the rigged left arms
+    import ikfkGen
+    import ikfkMirror
+    result={'arms':arms}
+    for mode in ('build','mirror'):
+        scene,shoulders=arm_scene(arms)
+        with ikfkBackend.use_backend(scene):
+            for shoulder in shoulders[0::2]:
+                ikfkGen.build_arm(shoulder)
+            seconds=0.0
+            for left,right in zip(shoulders[0::2],shoulders[1::2]):
+                seconds+=timed(ikfkGen.build_arm,right) if mode=='build' else timed(ikfkMirror.mirror_arm,left,right)
+        result[mode+'_seconds']=seconds
+    result['mirror_fraction']=result['mirror_seconds']/result['build_seconds']
+    return result
+
+def bench_stamp(arms):
+    # a. Every arm but the first built one at a time against stamped from the template of the first in one call
+    import ikfkGen
+    import ikfkTemplate
+    result={'arms':arms-1}
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        ikfkGen.build_arm(shoulders[0],extract='selective')
+        result['build_seconds']=sum(timed(lambda: ikfkGen.build_arm(shoulder,extract='selective')) for shoulder in shoulders[1:])
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        start=time.time()
+        template=ikfkTemplate.capture_template(shoulders[0])
+        result['capture_seconds']=time.time()-start
+        result['stamp_seconds']=ikfkTemplate.stamp_template(template,shoulders[1:])['seconds']
+    for mode in ('build','stamp'):
+        result[mode+'_arms_per_second']=result['arms']/result[mode+'_seconds']
+    return result
+
+def bench_evaluate(arms,steps=5,checked=2,frames=5000):
+    # a. The original chains of a few animated arms read by stepping the scene through some frames, against the
+    #    offline evaluator on the same inputs; then the evaluator alone for every arm over a long range
+    import numpy as np
+    import ikfkEvaluate
+    import ikfkGen
+    import ikfkLinks
+    import ikfkRoles
+    scene,shoulders=arm_scene(arms)
+    sides=[shoulder[:-len('_shoulder')] for shoulder in shoulders]
+    checked=min(checked,arms)
+    shape=(steps,checked,len(ikfkRoles.ROLES),3)
+    fk_rotate,ik_rotate,rotate=np.zeros(shape),np.zeros(shape),np.zeros(shape)
+    world=np.zeros(shape[:-1]+(4,4))
+    switch=np.zeros((steps,checked))
+    with ikfkBackend.use_backend(scene):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder)
+        rigs=[ikfkLinks.rig_of(side+'_wrist_IK_Ctrl') for side in sides]
+        for side,rig in zip(sides,rigs):
+            animate_fk(scene,side,steps)
+            scene.setKeyframe(rig['ik_control'],at='translateY',t=1,v=0.0)
+            scene.setKeyframe(rig['ik_control'],at='translateY',t=steps,v=-10.0)
+            scene.setKeyframe(rig['switch'],at='ikFkSwitch',t=1,v=0.0)
+            scene.setKeyframe(rig['switch'],at='ikFkSwitch',t=steps,v=1.0)
+        constants=ikfkEvaluate.rig_constants([rig['switch'] for rig in rigs])
+        start=time.time()
+        for frame in range(steps):
+            scene.currentTime(frame+1)
+            for i,(side,rig) in enumerate(zip(sides[:checked],rigs)):
+                switch[frame,i]=scene.getAttr(rig['switch']+'.ikFkSwitch')
+                for j,role in enumerate(ikfkRoles.ROLES):
+                    fk_rotate[frame,i,j]=scene.getAttr(rig['fk_joints'][role]+'.rotate')[0]
+                    ik_rotate[frame,i,j]=scene.getAttr(rig['ik_joints'][role]+'.rotate')[0]
+                    rotate[frame,i,j]=scene.getAttr(side+'_'+role+'.rotate')[0]
+                    world[frame,i,j]=np.reshape(scene.xform(side+'_'+role,q=True,ws=True,m=True),(4,4))
+        step_seconds=time.time()-start
+    subset=dict((key,value[:checked] if key in ('network','rest','parent_world') else value) for key,value in constants.items())
+    result=ikfkEvaluate.evaluate(fk_rotate,ik_rotate,switch,**subset)
+    # b. Every arm over a long range, the stepped frames and arms repeated
+    tiles=(frames//steps+1,arms//checked+1)
+    inputs=[np.tile(values,tiles+(1,)*(values.ndim-2))[:frames,:arms] for values in (fk_rotate,ik_rotate,switch)]
+    start=time.time()
+    ikfkEvaluate.evaluate(*inputs,**constants)
+    seconds=time.time()-start
+    return {'arms':arms,'frames':frames,'step_seconds':step_seconds,'step_rig_frames_per_second':steps*checked/step_seconds,
+            'evaluate_seconds':seconds,'evaluate_rig_frames_per_second':frames*arms/seconds,
+            'rotate_error':float(np.abs(result['rotate']-rotate).max()),'world_error':float(np.abs(result['world']-world).max())}
+
+def write_anim(path,columns,times,values):
+    # a. Keys of every frame in the layout of Maya's animExport: one animData block per (node, channel) column
+    lines=['animVersion 1.1;','timeUnit film;','linearUnit cm;','angularUnit deg;',
+           'startTime %g;' % times[0],'endTime %g;' % times[-1]]
+    for (node,channel),column in zip(columns,values):
+        attr=ikfkFakeScene.ALIASES.get(channel,channel)
+        output='angular' if attr.startswith('rotate') else 'linear' if attr.startswith('translate') else 'unitless'
+        full=attr[:-1]+'.'+attr if attr[-1] in 'XYZ' and attr[:-1] in ('translate','rotate') else attr
+        lines+=['anim %s %s %s 0 0 0;' % (full,attr,node),'animData {','  input time;','  output %s;' % output,
+                '  weighted 0;','  preInfinity constant;','  postInfinity constant;','  keys {']
+        lines+=['    %g %.7g auto auto 1 0 0;' % key for key in zip(times,column)]
+        lines+=['  }','}']
+    with open(path,'w') as f:
+        f.write('\n'.join(lines)+'\n')
+
+def read_anim(path):
+    # a. The (node, attribute) columns, the times and the (C,F) values of a file written by write_anim()
+    import numpy as np
+    columns,times,values=[],[],[]
+    keys=None
+    with open(path) as f:
+        for line in f:
+            words=line.split()
+            if not words:
+                continue
+            if words[0]=='anim':
+                columns.append((words[3],words[2]))
+                values.append([])
+                keys=None
+            elif words[0]=='keys':
+                keys=values[-1]
+            elif words[0]=='}':
+                if keys is values[0]:
+                    times=[key[0] for key in keys]
+                keys=None
+            elif keys is not None:
+                keys.append((float(words[0]),float(words[1])))
+    return columns,np.array(times),np.array([[value for time,value in keys] for keys in values])
+
+def bench_transfer(arms,characters=100,frames=240):
+    # a. Every channel of the animated arms exported to the binary format and imported back onto the same rigs
+    import os
+    import shutil
+    import tempfile
+    import numpy as np
+    import ikfkGen
+    import ikfkLinks
+    import ikfkTransfer
+    folder=tempfile.mkdtemp()
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder)
+        rigs=[ikfkLinks.rig_of(shoulder[:-len('_shoulder')]+'_wrist_IK_Ctrl') for shoulder in shoulders]
+        for shoulder,rig in zip(shoulders,rigs):
+            animate_fk(scene,shoulder[:-len('_shoulder')],frames)
+            scene.setKeyframe(rig['ik_control'],at='translateY',t=1,v=0.0)
+            scene.setKeyframe(rig['ik_control'],at='translateY',t=frames,v=-10.0)
+            scene.setKeyframe(rig['switch'],at='ikFkSwitch',t=1,v=0.0)
+            scene.setKeyframe(rig['switch'],at='ikFkSwitch',t=frames,v=1.0)
+        switches=[rig['switch'] for rig in rigs]
+        exported=ikfkTransfer.export_animation(os.path.join(folder,'arms.ikfk'),switches,1,frames)
+        imported=ikfkTransfer.import_animation(os.path.join(folder,'arms.ikfk'))
+        ikfkTransfer.export_animation(os.path.join(folder,'again.ikfk'),switches,1,frames)
+    header,times,values=ikfkTransfer.load_file(os.path.join(folder,'arms.ikfk'))
+    error=float(np.abs(ikfkTransfer.load_file(os.path.join(folder,'again.ikfk'))[2]-values).max())
+    # b. A shot of characters with two arms each, their channels repeated from the arms: one binary file against
+    #    one .anim file per character
+    per_rig=len(values)//arms
+    rig_values=np.asarray(values).reshape(arms,per_rig,-1)
+    shot=[rig_values[i%arms] for i in range(2*characters)]
+    columns=[[i,control,channel] for i in range(2*characters) for control,channel in ikfkTransfer.rig_columns(rigs[0])]
+    names=['C%03d:%s' % (i//2,switches[i%2]) for i in range(2*characters)]
+    shot_path=os.path.join(folder,'shot.ikfk')
+    binary_bytes=ikfkTransfer.write_file(shot_path,{'version':ikfkTransfer.VERSION,'switches':names,'columns':columns},
+                                         times,np.concatenate(shot))
+    anim_paths=[]
+    for character in range(characters):
+        path=os.path.join(folder,'C%03d.anim' % character)
+        anim_columns=[('C%03d:%s' % (character,ikfkTransfer.resolve(rigs[i%arms],control)),channel)
+                      for i in (2*character,2*character+1) for control,channel in ikfkTransfer.rig_columns(rigs[0])]
+        write_anim(path,anim_columns,times,np.concatenate(shot[2*character:2*character+2]))
+        anim_paths.append(path)
+    anim_bytes=sum(os.path.getsize(path) for path in anim_paths)
+    start=time.time()
+    mapped=ikfkTransfer.load_file(shot_path)[2]
+    map_seconds=time.time()-start
+    start=time.time()
+    np.array(ikfkTransfer.load_file(shot_path)[2])
+    read_seconds=time.time()-start
+    start=time.time()
+    parsed=[read_anim(path) for path in anim_paths]
+    anim_seconds=time.time()-start
+    anim_error=float(np.abs(np.concatenate([values for columns,times,values in parsed])-mapped).max())
+    shutil.rmtree(folder)
+    return {'arms':arms,'characters':characters,'frames':frames,'channels':len(mapped),
+            'export_seconds':exported['seconds'],'import_seconds':imported['seconds'],'round_trip_error':error,
+            'binary_bytes':binary_bytes,'anim_bytes':anim_bytes,'size_ratio':anim_bytes/float(binary_bytes),
+            'map_seconds':map_seconds,'read_seconds':read_seconds,'anim_seconds':anim_seconds,
+            'load_speedup':anim_seconds/read_seconds,'anim_error':anim_error}
+
+def bench_bake(arms,frames=200):
+    # a. IK controls following the FK chain over a frame range: stepping frames with ikTofk() against one bake
+    import ikfkBake
+    import ikfkGen
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder)
+            animate_fk(scene,shoulder[:-len('_shoulder')],frames)
+        step=bake=0.0
+        for shoulder in shoulders:
+            side=shoulder[:-len('_shoulder')]
+            start=time.time()
+            for frame in range(1,frames+1):
+                scene.currentTime(frame)
+                scene.select(side+'_wrist_IK_Ctrl')
+                ikfkGen.ikTofk()
+                scene.setKeyframe(side+'_wrist_IK_Ctrl',side+'_elbow_IK_PoleVec')
+            step+=time.time()-start
+            bake+=timed(ikfkBake.bake_ik_to_fk,side+'_wrist_IK_Ctrl',1,frames)
+    return {'arms':arms,'frames':frames,'step_seconds':step,'bake_seconds':bake,'speedup':step/bake}
+
+def bench_solver(arms,poses=1000000):
+    # a. Analytic two-bone IK over a million wrist and pole vector targets around the sample arm
+    import numpy as np
+    import ikfkSolver
+    shoulder,elbow,wrist=np.array([15.0,140.0,0.0]),np.array([42.0,140.0,-3.0]),np.array([68.0,140.0,0.0])
+    random=np.random.RandomState(0)
+    targets=shoulder+random.uniform(-60.0,60.0,(poses,3))
+    poles=elbow+random.uniform(-60.0,60.0,(poses,3))
+    seconds=timed(ikfkSolver.solve,shoulder,elbow,wrist,targets,poles)
+    # b. Solved chains keep their bone lengths and reach every target within reach
+    upper,lower=np.linalg.norm(elbow-shoulder),np.linalg.norm(wrist-elbow)
+    elbows,wrists=ikfkSolver.solve_positions(np.broadcast_to(shoulder,(poses,3)),upper,lower,targets,poles)
+    distance=np.linalg.norm(targets-shoulder,axis=-1)
+    reachable=(distance<upper+lower)&(distance>abs(upper-lower))
+    result={'poses':poses,'seconds':seconds,'poses_per_second':poses/seconds,
+            'max_reach_error':float(np.abs(wrists-targets)[reachable].max()),
+            'max_length_error':float(np.abs(np.linalg.norm(elbows-shoulder,axis=-1)-upper).max())}
+    result.update(solver_reference())
+    result.update(solver_chain())
+    return result
+
+def solver_reference(poses=2000):
+    # a. ikfkSolver against ikfkFakeScene.rotate_plane(), the solve the in-memory scene evaluates its handles with, over
+    #    bent rest poses, targets, pole vectors and twists; then the rotate values of solve_rotates() put back together
+    #    against the world rotations of solve()
+    import numpy as np
+    import ikfkBake
+    import ikfkSolver
+    random=np.random.RandomState(1)
+    shoulder,elbow,wrist=np.array([15.0,140.0,0.0]),np.array([42.0,140.0,-3.0]),np.array([68.0,140.0,0.0])
+    rests=[np.linalg.qr(random.normal(size=(3,3)))[0] for i in range(2)]
+    rests=[rest*np.sign(np.linalg.det(rest)) for rest in rests]
+    targets=shoulder+random.uniform(-60.0,60.0,(poses,3))
+    poles=elbow+random.uniform(-60.0,60.0,(poses,3))
+    twists=random.uniform(-180.0,180.0,poses)
+    solved=ikfkSolver.solve(shoulder,elbow,wrist,targets,poles,rests[0],rests[1],twists)
+    rest_matrices=[ikfkSolver._matrices(rest,[0.0,0.0,0.0]).tolist() for rest in rests]
+    error=0.0
+    for i in range(poses):
+        reference=ikfkFakeScene.rotate_plane(shoulder.tolist(),elbow.tolist(),wrist.tolist(),rest_matrices[0],rest_matrices[1],
+                                             targets[i].tolist(),poles[i].tolist(),float(twists[i]))
+        error=max(error,max(float(np.abs(solved[j][i]-np.array(reference[j])[:3,:3]).max()) for j in range(2)))
+    # b. A chain below a turned and moved parent, with joint orients and a rest pose of its own
+    parents=np.tile(np.identity(4),(poses,1,1))
+    parents[:,:3,:3]=ikfkBake.euler_to_matrix(random.uniform(-90.0,90.0,(poses,3)))
+    parents[:,3,:3]=random.uniform(-20.0,20.0,(poses,3))
+    translates=[[15.0,140.0,0.0],[27.0,0.0,-3.0],[26.0,0.0,3.0]]
+    orients=random.uniform(-45.0,45.0,(3,3))
+    rotates=random.uniform(-30.0,30.0,(2,3))
+    shoulder_rotate,elbow_rotate=ikfkSolver.solve_rotates(parents,translates,orients,rotates,targets,poles,twists)
+    joints=ikfkBake.euler_to_matrix(orients)
+    rest_shoulder=np.matmul(ikfkSolver._matrices(np.matmul(ikfkBake.euler_to_matrix(rotates[0]),joints[0]),translates[0]),parents)
+    rest_elbow=np.matmul(ikfkSolver._matrices(np.matmul(ikfkBake.euler_to_matrix(rotates[1]),joints[1]),translates[1]),rest_shoulder)
+    rest_wrist=np.matmul(ikfkSolver._matrices(joints[2],translates[2]),rest_elbow)
+    world=ikfkSolver.solve(rest_shoulder[:,3,:3],rest_elbow[:,3,:3],rest_wrist[:,3,:3],targets,poles,
+                           rest_shoulder[:,:3,:3],rest_elbow[:,:3,:3],twists)
+    shoulder_world=np.matmul(np.matmul(ikfkBake.euler_to_matrix(shoulder_rotate),joints[0]),parents[:,:3,:3])
+    elbow_world=np.matmul(np.matmul(ikfkBake.euler_to_matrix(elbow_rotate),joints[1]),shoulder_world)
+    return {'reference_poses':poses,'reference_error':error,
+            'rotate_error':float(max(np.abs(shoulder_world-world[0]).max(),np.abs(elbow_world-world[1]).max()))}
+
+def solver_chain(frames=50):
+    # a. The IK chain ikfkBake solves for an offline bake against the chain the scene evaluates with rotate_plane(),
+    #    with the clavicle, the IK control, the pole vector and the twist of the handle animated
+    import numpy as np
+    import ikfkBake
+    import ikfkGen
+    import ikfkLinks
+    scene,shoulders=arm_scene(1)
+    side=shoulders[0][:-len('_shoulder')]
+    with ikfkBackend.use_backend(scene):
+        ikfkGen.build_arm(shoulders[0])
+        for frame,value in ((1,0.0),(frames//2,1.0),(frames,-1.0)):
+            scene.setKeyframe(side+'_clavicle',at='rotateY',t=frame,v=15.0*value)
+            scene.setKeyframe(side+'_wrist_IK_Ctrl',at='translateY',t=frame,v=10.0*value)
+            scene.setKeyframe(side+'_wrist_IK_Ctrl',at='rotateX',t=frame,v=30.0*value)
+            scene.setKeyframe(side+'_elbow_IK_PoleVec',at='translateZ',t=frame,v=-20.0*value)
+            scene.setKeyframe(side+'_wrist_IK_Handle',at='twist',t=frame,v=40.0*value)
+        rig=ikfkLinks.rig_of(side+'_wrist_IK_Ctrl')
+        range_=ikfkBake.frame_range(1,frames)
+        solved=ikfkBake.solved_ik_joints(rig,range_)
+        evaluated=ikfkBake.sample_world_matrices([rig['ik_joints'][role] for role in ikfkRoles.ROLES],range_)
+    return {'bake_chain_error':float(np.abs(solved-evaluated).max())}
+
+def graph_counts(scene):
+    # a. DG nodes and connections of a scene, the DAG nodes (transforms, joints, shapes) left out of the utility count
+    utility=[node for node in scene.nodes.values() if not node.is_dag()]
+    constraints=[node for node in scene.nodes.values() if ikfkFakeScene.is_type(node.type,'constraint')]
+    return {'nodes':len(scene.nodes),'utility_nodes':len(utility)+len(constraints),
+            'connections':sum(len(node.inputs) for node in scene.nodes.values())}
+
+def bench_network(arms):
+    # a. Classic and lean switch networks side by side; the in-memory scene counts the graph, playback is timed in Maya
+    import ikfkGen
+    import ikfkGraph
+    result={'arms':arms}
+    for network in ikfkGen.NETWORKS:
+        for fk_drive in ikfkGen.FK_DRIVES:
+            scene,shoulders=arm_scene(arms)
+            with ikfkBackend.use_backend(scene):
+                for shoulder in shoulders:
+                    ikfkGen.build_arm(shoulder,network=network,fk_drive=fk_drive)
+                # a.1 Depth and cycles of one arm's dependency graph
+                report=ikfkGraph.analyze_rig(shoulders[0])
+            counts=graph_counts(scene)
+            counts.update(depth=report['depth'],max_width=report['max_width'],cycle_nodes=sum(len(cycle) for cycle in report['cycles']))
+            for name,value in counts.items():
+                result['%s_%s_%s' % (network,fk_drive,name)]=value
+    return result
+
+def bench_fkdrive(arms):
+    # a. Both FK drives on the same arms, posed and with the clavicles turned after the build: the FK and original
+    #    joints of the direct drive against the constraint setup, with untouched and with posed controls
+    import numpy as np
+    import ikfkBake
+    import ikfkGen
+    import ikfkLinks
+    import ikfkRoles
+    steps=((0.0,False),(20.0,False),(20.0,True),(35.0,True),(-15.0,True))
+    poses=np.random.RandomState(7).uniform(-60.0,60.0,(arms,len(ikfkRoles.ROLES),3))
+    world={}
+    result={'arms':arms}
+    for fk_drive in ikfkGen.FK_DRIVES:
+        scene,shoulders=arm_scene(arms)
+        with ikfkBackend.use_backend(scene):
+            for shoulder in shoulders:
+                ikfkGen.build_arm(shoulder,fk_drive=fk_drive)
+            rigs=[ikfkLinks.rig_of(shoulder+'_FK_Ctrl') for shoulder in shoulders]
+            joints=[joint for shoulder,rig in zip(shoulders,rigs) for joint in
+                    [rig['fk_joints'][role] for role in ikfkRoles.ROLES]+[rig['fk_joints'][role][:-len('_FK')] for role in ikfkRoles.ROLES]]
+            sampled=[]
+            for angle,posed in steps:
+                for shoulder,rig,pose in zip(shoulders,rigs,poses):
+                    scene.setAttr(rig['switch']+'.ikFkSwitch',1)
+                    scene.setAttr(ikfkBake.parent_of(shoulder)+'.rotateY',angle)
+                    for role,rotate in zip(ikfkRoles.ROLES,pose if posed else ()):
+                        scene.setAttr(rig['fk_controls'][role]+'.rotate',*rotate)
+                sampled.append([scene.xform(joint,q=True,ws=True,m=True) for joint in joints])
+        world[fk_drive]=np.array(sampled)
+        result[fk_drive+'_constraints']=sum(1 for node in scene.nodes.values() if node.type.endswith('Constraint'))
+    difference=np.abs(world['direct']-world['constraint'])
+    result['pose_error']=float(difference.max())
+    result['clavicle_error']=float(difference[1:].max())
+    return result
+
+def bench_plan(arms):
+    # a. The same skeletons rigged with a plain build and from the specs planned on a third copy of them
+    import numpy as np
+    import ikfkGen
+    import ikfkPlan
+    scene,shoulders=arm_scene(arms)
+    with ikfkBackend.use_backend(scene):
+        start=time.time()
+        specs=[ikfkPlan.plan_arm(shoulder) for shoulder in shoulders]
+        result={'arms':arms,'plan_seconds':time.time()-start}
+    scenes={}
+    for phase,build in (('build',ikfkGen.build_arm),('apply',ikfkPlan.apply_plan)):
+        scene,shoulders=arm_scene(arms)
+        with ikfkBackend.use_backend(scene):
+            result[phase+'_seconds']=sum(timed(build,item) for item in (shoulders if phase=='build' else specs))
+        scenes[phase]=scene
+    # b. Both give the same nodes at the same place with the same inputs
+    built,applied=scenes['build'],scenes['apply']
+    names=sorted(name for name,node in built.nodes.items() if node.is_dag() and name in applied.nodes)
+    result['apply_error']=float(np.abs(np.subtract(built.worldMatrices(names,[1.0]),applied.worldMatrices(names,[1.0]))).max())
+    result['apply_node_difference']=len(set(built.nodes)^set(applied.nodes))
+    result['apply_connection_difference']=sum(1 for name,node in built.nodes.items()
+                                              if name in applied.nodes and sorted(node.inputs)!=sorted(applied.nodes[name].inputs))
+    result['spec_bytes']=sum(len(json.dumps(spec,separators=(',',':'))) for spec in specs)
+    # c. ikfkPlan.build_arm() as it runs, source key included: a miss plans and caches every arm, a hit on the same
+    #    skeletons applies the cached specs
+    cache=ikfkPlan.PlanCache()
+    for phase in ('miss','hit'):
+        scene,shoulders=arm_scene(arms)
+        with ikfkBackend.use_backend(scene):
+            result['cache_'+phase+'_seconds']=sum(timed(lambda shoulder:ikfkPlan.build_arm(shoulder,cache=cache),shoulder)
+                                                  for shoulder in shoulders)
+    result['cache_hit_speedup']=result['build_seconds']/result['cache_hit_seconds']
+    return result
+
+def bench_update(arms):
+    # a. Rigged arms whose elbows moved: updated in place against deleted and built again
+    import ikfkGen
+    import ikfkTransaction
+    import ikfkUpdate
+    result={'arms':arms}
+    for mode in ('update','rebuild'):
+        scene,shoulders=arm_scene(arms)
+        rigs={}
+        with ikfkBackend.use_backend(scene):
+            for shoulder in shoulders:
+                with ikfkTransaction.BuildTransaction('ikfkBench') as transaction:
+                    ikfkGen.build_arm(shoulder)
+                rigs[shoulder]=transaction.created_nodes()
+            for shoulder in shoulders:
+                elbow=shoulder.replace('_shoulder','_elbow')
+                scene.setAttr(elbow+'.translateX',scene.getAttr(elbow+'.translateX')*1.1)
+            seconds=0.0
+            for shoulder in shoulders:
+                if mode=='update':
+                    seconds+=timed(ikfkUpdate.update_arm,shoulder)
+                else:
+                    start=time.time()
+                    scene.delete([node for node in rigs[shoulder] if scene.objExists(node)])
+                    ikfkGen.build_arm(shoulder)
+                    seconds+=time.time()-start
+        result[mode+'_seconds']=seconds
+    result.update(update_twist(arms))
+    return result
+
+def twist_scene(arms):
+    # a. The sample arms with a twist joint between the elbow and the wrist, which a selective extraction folds in
+    scene,shoulders=arm_scene(arms)
+    for shoulder in shoulders:
+        side=shoulder[:-len('_shoulder')]
+        scene.select(side+'_elbow')
+        twist=scene.joint(name=side+'_twist',p=scene.xform(side+'_forearm',q=True,ws=True,t=True))
+        scene.parent(side+'_wrist',twist)
+    scene.select(cl=True)
+    return scene,shoulders
+
+def update_twist(arms):
+    # a. Selective builds of arms with a twist joint: an update of the unchanged arms changes nothing, and after the
+    #    elbows moved the updated rig matches a build from scratch
+    import numpy as np
+    import ikfkGen
+    import ikfkRoles
+    import ikfkTransaction
+    import ikfkUpdate
+    sampled={}
+    for mode in ('update','rebuild'):
+        scene,shoulders=twist_scene(arms)
+        with ikfkBackend.use_backend(scene):
+            rigs={}
+            for shoulder in shoulders:
+                with ikfkTransaction.BuildTransaction('ikfkBench') as transaction:
+                    ikfkGen.build_arm(shoulder,extract='selective')
+                rigs[shoulder]=transaction.created_nodes()
+            unchanged=sum(len(ikfkUpdate.update_arm(shoulder)['joints']) for shoulder in shoulders)
+            for shoulder in shoulders:
+                elbow=shoulder.replace('_shoulder','_elbow')
+                scene.setAttr(elbow+'.translateX',scene.getAttr(elbow+'.translateX')*1.1)
+            for shoulder in shoulders:
+                if mode=='update':
+                    ikfkUpdate.update_arm(shoulder)
+                else:
+                    scene.delete([node for node in rigs[shoulder] if scene.objExists(node)])
+                    ikfkGen.build_arm(shoulder,extract='selective')
+            nodes=[]
+            for shoulder in shoulders:
+                joints=[shoulder.replace('_shoulder','_'+role)+'_'+chain for chain in ('IK','FK') for role in ikfkRoles.ROLES]
+                nodes+=joints+[joint+'_CtrlGrp' for joint in joints[2:]]+[joints[1]+'_PoleVectorGrp']
+            sampled[mode]=np.array([scene.xform(node,q=True,ws=True,m=True) for node in nodes])
+        if mode=='update':
+            result={'twist_unchanged_joints':unchanged}
+    result['twist_update_error']=float(np.abs(sampled['update']-sampled['rebuild']).max())
+    return result
+
+def bench_shapes(arms,controls=100):
+    # a. FK controls the way they used to be made (circle, select the CVs, scale them) against one curve() call of the
+    #    shape library; the commands of each are counted through a recording backend
+    import ikfkPlan
+    import ikfkShapes
+    def scaled_circle(name,size):
+        control=ikfkBackend.cmds.circle(name=name,nr=[1,0,0],ch=0)
+        ikfkBackend.cmds.select(control[0]+'.cv[0:7]',r=True)
+        ikfkBackend.cmds.scale(size,size,size)
+        return control
+    result={'arms':arms,'controls':controls}
+    for method,create in (('circle',scaled_circle),('library',lambda name,size: ikfkShapes.create(name,'circle',size))):
+        scene=ikfkFakeScene.FakeScene()
+        recorder=ikfkPlan.RecordingBackend(scene)
+        with ikfkBackend.use_backend(recorder):
+            start=time.time()
+            for i in range(controls):
+                create('control%d_Ctrl' % i,7.0)
+            result[method+'_seconds']=time.time()-start
+        result[method+'_commands']=len(recorder.operations)
+    return result
+
+def bench_poles(arms):
+    # a. Pole vectors of every arm of the scene placed with one vectorized call
+    import ikfkPoleVector
+    scene,shoulders=arm_scene(arms)
+    positions=[[scene.xform(shoulder.replace('_shoulder',role),q=True,ws=True,t=True) for shoulder in shoulders]
+               for role in ('_shoulder','_elbow','_wrist')]
+    return {'arms':arms,'seconds':timed(ikfkPoleVector.pole_vector_matrices,*positions)}
+
+BENCHMARKS={'bake':bench_bake,'batch':bench_batch,'build':bench_build,'evaluate':bench_evaluate,'extract':bench_extract,'fkdrive':bench_fkdrive,'live':bench_live,'match':bench_match,'mirror':bench_mirror,'network':bench_network,'plan':bench_plan,'poles':bench_poles,'queries':bench_queries,'shapes':bench_shapes,
+          'solver':bench_solver,'stamp':bench_stamp,'transfer':bench_transfer,'update':bench_update}
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Time the IK/FK builder on the in-memory scene.')
+    parser.add_argument('benchmarks',nargs='*',default=sorted(BENCHMARKS),help='benchmarks to run: %s' % ', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('--arms',type=int,default=20,help='number of arms per scene')
+    parser.add_argument('--repeat',type=int,default=3,help='runs per benchmark, the fastest is reported')
+    parser.add_argument('--json',default=None,help='write the results to a JSON file')
+    args=parser.parse_args(argv)
+
+    results={}
+    for name in args.benchmarks:
+        runs=[BENCHMARKS[name](args.arms) for _ in range(args.repeat)]
+        # a. The fastest run is the least disturbed by the machine
+        results[name]=min(runs,key=lambda run: sum(v for k,v in run.items() if k.endswith('seconds')))
+        print('%-8s %s' % (name,' '.join('%s=%s' % (k,round(v,4) if isinstance(v,float) else v) for k,v in sorted(results[name].items()))))
+    if args.json:
+        with open(args.json,'w') as f:
+            json.dump(results,f,indent=2)
+    return results
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+The following script will lock and hide the channels of the IK/FK controls in one batched operation.
+Each kind of control declares a channel policy (which channels get locked and hidden); the builder adds every control
+it creates to a ChannelBatch and applies the whole batch once at the end of the build, instead of issuing one
+setAttr(lock=True,keyable=False,channelBox=False) per channel. In Maya the batch sets the flags on the plugs through
+OpenMaya, like ikfkOpenMaya.py does, so no command goes through the command engine at all. Those plug edits are not on
+the undo queue; the batched channels belong to controls the same build created, and undoing the build removes them.
+'''
+
+import ikfkBackend
+
+TRANSLATE=('tx','ty','tz')
+ROTATE=('rx','ry','rz')
+SCALE=('sx','sy','sz')
+VISIBILITY=('v',)
+ALL_CHANNELS=TRANSLATE+ROTATE+SCALE+VISIBILITY
+
+def channels_except(*keep):
+    return tuple(channel for channel in ALL_CHANNELS if channel not in keep)
+
+#----------------------------------------
+#            Channel Policies
+#----------------------------------------
+# The channels each kind of control has locked and hidden. The switch keeps only its ikFkSwitch attribute.
+
+FK_CONTROL=TRANSLATE+SCALE
+IK_CONTROL=SCALE
+POLE_VECTOR=ROTATE+SCALE
+SWITCH_CONTROL=channels_except()
+
+# Totals of every batch applied in this session, see calls_saved()
+stats={'channels':0,'calls':0}
+
+#----------------------------------------
+#             Channel Batch
+#----------------------------------------
+
+class ChannelBatch(object):
+    def __init__(self):
+        self.plugs=[]
+
+    def add(self,control,policy):
+        if isinstance(control,(list,tuple)):
+            control=control[0]
+        self.plugs.extend(control+'.'+channel for channel in policy)
+
+    def apply(self):
+        if not self.plugs:
+            return 0
+        lock_hide(self.plugs)
+        stats['channels']+=len(self.plugs)
+        stats['calls']+=1
+        saved=len(self.plugs)-1
+        self.plugs=[]
+        return saved
+
+def lock_hide(plugs):
+    backend=ikfkBackend.get_backend()
+    # a. Backends with a native batch (the in-memory scene) take every plug in a single call
+    if hasattr(backend,'lockHideAttrs'):
+        backend.lockHideAttrs(plugs,lock=True,keyable=False,channelBox=False)
+        return
+    # b. In Maya every plug is found in one selection list and its flags are set on the MPlug, no command is issued
+    import maya.api.OpenMaya as om
+    selection=om.MSelectionList()
+    for plug in plugs:
+        selection.add(plug)
+    for i in range(selection.length()):
+        plug=selection.getPlug(i)
+        plug.isKeyable=False
+        plug.isChannelBox=False
+        plug.isLocked=True
+
+def calls_saved():
+    # To report how many per-channel setAttr commands the batches replaced, one backend call per batch
+    return stats['channels']-stats['calls']
+
+def reset_stats():
+    stats['channels']=0
+    stats['calls']=0
@@ -0,0 +1,174 @@
+'''
+The following script will evaluate the switch network of IK/FK rigs offline, for whole animation ranges of many rigs at
+once, without Maya. It reproduces what the nodes of switch_generator() compute, for arrays over F frames and N rigs:
+
+    blendColors     the rotate of the original shoulder, elbow and wrist: color1 (FK) * ikFkSwitch + color2 (IK) * (1 - ikFkSwitch)
+    condition       classic visibility: the FK controls are hidden at 0 (IK), the IK controls at 1 (FK)
+    setRange        lean visibility: the same, from one setRange
+    FK pole vector  the position ikTofk() snaps the IK pole vector to. The build no longer makes the helper locator and
+                    its multiplyDivide, the pole is computed from the FK chain with ikfkPoleVector.py; for rigs built
+                    before that, the multiplyDivide turning the helper group by half the FK elbow's rotateZ is
+                    reproduced from the helper's values
+
+    import ikfkEvaluate
+    result=ikfkEvaluate.evaluate(fk_rotate,ik_rotate,switch)          # (F,N,3,3) degrees, (F,N,3,3), (F,N)
+    result['rotate']                                                 # (F,N,3,3) rotate of the original chains
+    result['visibility']                                             # {'fk':(F,N),'ik':(F,N)}
+
+With the rest values of the rigs (read once in Maya with rig_constants(), a plain dictionary of arrays that can be
+saved with NumPy) the world matrices of the original chains and the FK pole vectors are evaluated as well:
+
+    constants=ikfkEvaluate.rig_constants(['IK_FK_Switch_Ctrl','IK_FK_Switch_Ctrl1'])
+    result=ikfkEvaluate.evaluate(fk_rotate,ik_rotate,switch,**constants)
+    result['world'], result['fk_pole_vector']                        # (F,N,3,4,4), (F,N,3)
+
+Joints rotate in the XYZ order. python ikfkBench.py evaluate compares the evaluator with stepping the scene.
+'''
+
+import numpy as np
+
+import ikfkBake
+import ikfkPoleVector
+import ikfkRoles
+
+# The secondTerm of the condition of each side, firstTerm is the ikFkSwitch; Equal gives colorIfTrue, else colorIfFalse
+CONDITION_TERMS={'fk':0.0,'ik':1.0}
+CONDITION_COLORS=(0.0,1.0)
+# The setRange of the lean network per side, as lean_visibility() sets it: min, max, oldMin, oldMax
+SET_RANGES={'fk':(0.0,1.0,0.0,0.001),'ik':(1.0,0.0,0.999,1.0)}
+# The multiplyDivide of rigs built with the FK pole vector locator: input2X times the FK elbow's rotateZ
+LEGACY_FACTOR=0.5
+
+#----------------------------------------
+#            Network Nodes
+#----------------------------------------
+
+def blend(fk_rotate,ik_rotate,switch):
+    # a. blendColors: output = color1 * blender + color2 * (1 - blender), for every joint and axis
+    blender=np.asarray(switch,dtype=float)[...,None,None]
+    return np.asarray(fk_rotate,dtype=float)*blender+np.asarray(ik_rotate,dtype=float)*(1.0-blender)
+
+def condition(first,second,if_true=CONDITION_COLORS[0],if_false=CONDITION_COLORS[1]):
+    # a. condition with the Equal operation, outColorR
+    return np.where(np.asarray(first,dtype=float)==second,if_true,if_false)
+
+def set_range(value,low,high,old_low,old_high):
+    # a. setRange: the value remapped from oldMin..oldMax to min..max, clamped to the range
+    weight=np.clip((np.asarray(value,dtype=float)-old_low)/(old_high-old_low),0.0,1.0)
+    return low+(high-low)*weight
+
+def visibility(switch,network='classic'):
+    # a. The visibility of the FK control groups and of the IK controls; network is one name or one per rig
+    lean=np.asarray(network)=='lean'
+    result={}
+    for side in ('fk','ik'):
+        classic=condition(switch,CONDITION_TERMS[side])
+        result[side]=np.where(lean,set_range(switch,*SET_RANGES[side]),classic) if lean.any() else classic
+    return result
+
+#----------------------------------------
+#            Chain Matrices
+#----------------------------------------
+
+def rotation_matrices(rotate):
+    # a. (...,3) rotate values in degrees to (...,4,4) matrices
+    rotate=np.asarray(rotate,dtype=float)
+    matrices=np.zeros(rotate.shape[:-1]+(4,4))
+    matrices[...,:3,:3]=ikfkBake.euler_to_matrix(rotate)
+    matrices[...,3,3]=1.0
+    return matrices
+
+def chain_world(rotate,rest,parent_world=None):
+    # a. World matrices (F,N,3,4,4) of a shoulder, elbow and wrist chain from its rotate values (F,N,3,3) and its rest
+    #    values (N,3,2,3: translate and jointOrient): rotate, then jointOrient and translate, then the joint above.
+    #    parent_world is (N,4,4) or (F,N,4,4); rotations and positions are carried apart, 3x3 instead of 4x4.
+    rest=np.asarray(rest,dtype=float)
+    rotate=np.asarray(rotate,dtype=float)
+    local=np.matmul(ikfkBake.euler_to_matrix(rotate),ikfkBake.euler_to_matrix(rest[...,1,:]))
+    parent=np.identity(4) if parent_world is None else np.asarray(parent_world,dtype=float)
+    rotation,position=parent[...,:3,:3],parent[...,3,:3]
+    world=np.zeros(np.broadcast_shapes(rotate.shape[:-2],parent.shape[:-2])+(len(ikfkRoles.ROLES),4,4))
+    world[...,3,3]=1.0
+    for i in range(len(ikfkRoles.ROLES)):
+        position=np.einsum('...j,...jk->...k',rest[...,i,0,:],rotation)+position
+        rotation=np.matmul(local[...,i,:,:],rotation)
+        world[...,i,:3,:3]=rotation
+        world[...,i,3,:3]=position
+    return world
+
+def fk_pole_vectors(fk_world):
+    # a. The FK pole vector of every frame and rig, (F,N,3), the closed form ikTofk() uses
+    shape=fk_world.shape[:-3]
+    positions=ikfkPoleVector.pole_vector_positions(*[fk_world[...,i,3,:3] for i in range(len(ikfkRoles.ROLES))])
+    return positions.reshape(shape+(3,))
+
+def legacy_pole_vectors(fk_world,elbow_rotate_z,legacy):
+    # a. Rigs built with the helper locator: its shoulder group follows the FK shoulder, its elbow group has the
+    #    multiplyDivide output as rotateZ, the locator keeps its place in the elbow group
+    rotate=np.broadcast_to(np.asarray(legacy['rotate'],dtype=float),fk_world.shape[:-3]+(3,)).copy()
+    rotate[...,2]=np.asarray(legacy['factor'],dtype=float)*elbow_rotate_z
+    group=rotation_matrices(rotate)
+    group[...,3,:3]=legacy['translate']
+    world=np.matmul(np.matmul(np.asarray(legacy['locator'],dtype=float),group),fk_world[...,0,:,:])
+    return world[...,3,:3]
+
+#----------------------------------------
+#             Evaluation
+#----------------------------------------
+
+def evaluate(fk_rotate,ik_rotate,switch,network='classic',rest=None,parent_world=None,legacy=None):
+    # a. The blended rotate values and the visibility of every frame and rig in one call
+    result={'rotate':blend(fk_rotate,ik_rotate,switch),'visibility':visibility(switch,network)}
+    if rest is None:
+        return result
+    # b. With the rest values: the world matrices of the original chains and the FK pole vectors
+    result['world']=chain_world(result['rotate'],rest,parent_world)
+    fk_world=chain_world(fk_rotate,rest,parent_world)
+    result['fk_pole_vector']=fk_pole_vectors(fk_world)
+    if legacy is not None:
+        result['legacy_pole_vector']=legacy_pole_vectors(fk_world,np.asarray(fk_rotate,dtype=float)[...,1,2],legacy)
+    return result
+
+#----------------------------------------
+#        Rig Constants (in Maya)
+#----------------------------------------
+
+def rig_network(switch):
+    # a. 'lean' when the switch drives a setRange, 'classic' for the conditions
+    from ikfkBackend import cmds
+    targets=cmds.listConnections(switch+'.ikFkSwitch',s=False,d=True) or []
+    return 'lean' if any(cmds.nodeType(node)=='setRange' for node in targets) else 'classic'
+
+def legacy_helper(rig):
+    # a. The values of the FK pole vector helper of a rig built before it was removed, None for any other rig
+    from ikfkBackend import cmds
+    fk_elbow=rig['fk_joints']['elbow']
+    group=fk_elbow+'PoleVecGroup'
+    locator=rig['pole_vector'].replace('_IK_PoleVec','')+'_FK_PoleVec' if rig['pole_vector'] else None
+    if not (locator and cmds.objExists(group) and cmds.objExists(locator) and cmds.objExists(fk_elbow+'multiply')):
+        return None
+    local=rotation_matrices(cmds.getAttr(locator+'.rotate')[0])
+    local[3,:3]=cmds.getAttr(locator+'.translate')[0]
+    return {'translate':cmds.getAttr(group+'.translate')[0],'rotate':cmds.getAttr(group+'.rotate')[0],
+            'locator':local,'factor':cmds.getAttr(fk_elbow+'multiply.input2X')}
+
+def rig_constants(switches):
+    # a. What evaluate() needs of N rigs besides the animation, read once: networks, rest values of the chains (the
+    #    IK joints keep them, joints in between folded in), the world matrix of each shoulder's parent at the current
+    #    frame and the legacy helpers (NaN for rigs without one)
+    import ikfkLinks
+    import ikfkUpdate
+    from ikfkBackend import cmds
+    rigs=[ikfkLinks.rig_of(switch) for switch in switches]
+    rest=np.array([[ikfkUpdate.joint_values(rig['ik_joints'][role]) for role in ikfkRoles.ROLES] for rig in rigs])
+    parents=[ikfkBake.parent_of(rig['ik_joints']['shoulder']) for rig in rigs]
+    parent_world=np.broadcast_to(np.identity(4),(len(rigs),4,4)).copy()
+    sampled=[i for i,parent in enumerate(parents) if parent]
+    if sampled:
+        parent_world[sampled]=ikfkBake.sample_world_matrices([parents[i] for i in sampled],[cmds.currentTime(q=True)])[0]
+    constants={'network':[rig_network(switch) for switch in switches],'rest':rest,'parent_world':parent_world,'legacy':None}
+    helpers=[legacy_helper(rig) for rig in rigs]
+    if any(helpers):
+        missing={'translate':[np.nan]*3,'rotate':[np.nan]*3,'locator':np.full((4,4),np.nan),'factor':np.nan}
+        constants['legacy']=dict((key,np.array([(helper or missing)[key] for helper in helpers])) for key in missing)
+    return constants
@@ -0,0 +1,1515 @@
+'''
+The following script is a pure-Python, in-memory stand-in for the part of maya.cmds used by the IK/FK builder.
+It keeps a real DAG (parenting, joints, transforms, curve CVs) and a DG of attribute connections that is evaluated on
+demand, so create_joints(), ikTofk() and fkToik() can run, be profiled and be regression-tested without Maya.
+
+What is evaluated: transforms and world matrices (scale * rotate(XYZ) * jointOrient * translate), parent, orient, aim
+and pole vector constraints, offsetParentMatrix, blendColors, condition, multiplyDivide, setRange, keyframed channels (linear animation curves
+evaluated at the current time) and two-bone rotate-plane IK handles, solved by rotate_plane() from the rest pose kept
+in the joints' own rotate values, apart from ikfkSolver.py so the bench can check one against the other. Other IK handles are created and wired but not solved. Like Maya, listRelatives/listConnections return None when nothing is found,
+and a value that was driven by a deleted node is kept on the attribute it drove.
+
+Evaluated outputs and world matrices are kept until the next edit of the scene (a value set, a connection made or
+broken, a node parented or deleted, keys written) or until the time changes, the way the DG keeps clean plugs, so
+repeated queries of a rigged chain cost one evaluation.
+'''
+
+import bisect
+import fnmatch
+import json
+import math
+import re
+
+#----------------------------------------
+#             Matrix Helpers
+#----------------------------------------
+# Matrices are 4x4 nested lists in Maya's row-vector convention: world point = local point * matrix.
+
+def identity():
+    return [[1.0,0.0,0.0,0.0],[0.0,1.0,0.0,0.0],[0.0,0.0,1.0,0.0],[0.0,0.0,0.0,1.0]]
+
+def mult(a,b):
+    return [[a[i][0]*b[0][j]+a[i][1]*b[1][j]+a[i][2]*b[2][j]+a[i][3]*b[3][j] for j in range(4)] for i in range(4)]
+
+def inverse(m):
+    # a. Affine inverse: invert the 3x3 part, then the translation
+    a,b,c=m[0][:3],m[1][:3],m[2][:3]
+    det=a[0]*(b[1]*c[2]-b[2]*c[1])-a[1]*(b[0]*c[2]-b[2]*c[0])+a[2]*(b[0]*c[1]-b[1]*c[0])
+    if abs(det)<1e-12:
+        return identity()
+    inv=[[(b[1]*c[2]-b[2]*c[1])/det,(a[2]*c[1]-a[1]*c[2])/det,(a[1]*b[2]-a[2]*b[1])/det],
+         [(b[2]*c[0]-b[0]*c[2])/det,(a[0]*c[2]-a[2]*c[0])/det,(a[2]*b[0]-a[0]*b[2])/det],
+         [(b[0]*c[1]-b[1]*c[0])/det,(a[1]*c[0]-a[0]*c[1])/det,(a[0]*b[1]-a[1]*b[0])/det]]
+    t=m[3][:3]
+    it=[-(t[0]*inv[0][j]+t[1]*inv[1][j]+t[2]*inv[2][j]) for j in range(3)]
+    return [inv[0]+[0.0],inv[1]+[0.0],inv[2]+[0.0],it+[1.0]]
+
+def euler_to_matrix(rotate):
+    # a. XYZ rotate order, angles in degrees: R = Rx * Ry * Rz
+    x,y,z=[math.radians(angle) for angle in rotate]
+    cx,sx,cy,sy,cz,sz=math.cos(x),math.sin(x),math.cos(y),math.sin(y),math.cos(z),math.sin(z)
+    rx=[[1.0,0.0,0.0,0.0],[0.0,cx,sx,0.0],[0.0,-sx,cx,0.0],[0.0,0.0,0.0,1.0]]
+    ry=[[cy,0.0,-sy,0.0],[0.0,1.0,0.0,0.0],[sy,0.0,cy,0.0],[0.0,0.0,0.0,1.0]]
+    rz=[[cz,sz,0.0,0.0],[-sz,cz,0.0,0.0],[0.0,0.0,1.0,0.0],[0.0,0.0,0.0,1.0]]
+    return mult(mult(rx,ry),rz)
+
+def matrix_to_euler(m):
+    # a. Inverse of euler_to_matrix for a pure rotation matrix, returns degrees
+    sy=max(-1.0,min(1.0,-m[0][2]))
+    y=math.asin(sy)
+    if abs(math.cos(y))>1e-6:
+        x=math.atan2(m[1][2],m[2][2])
+        z=math.atan2(m[0][1],m[0][0])
+    else:
+        x=math.atan2(-m[2][1],m[1][1])
+        z=0.0
+    return [math.degrees(x),math.degrees(y),math.degrees(z)]
+
+def compose(translate,rotate,scale,joint_orient=None):
+    m=[[scale[0],0.0,0.0,0.0],[0.0,scale[1],0.0,0.0],[0.0,0.0,scale[2],0.0],[0.0,0.0,0.0,1.0]]
+    m=mult(m,euler_to_matrix(rotate))
+    if joint_orient is not None:
+        m=mult(m,euler_to_matrix(joint_orient))
+    m[3][0],m[3][1],m[3][2]=translate[0],translate[1],translate[2]
+    return m
+
+def decompose(m):
+    # a. Returns translate, the pure rotation matrix and scale of an unsheared matrix
+    scale=[math.sqrt(sum(v*v for v in m[i][:3])) or 1.0 for i in range(3)]
+    rot=[[m[i][j]/scale[i] for j in range(3)]+[0.0] for i in range(3)]+[[0.0,0.0,0.0,1.0]]
+    return list(m[3][:3]),rot,scale
+
+def rotation_only(m):
+    return decompose(m)[1]
+
+def flatten(m):
+    return [v for row in m for v in row]
+
+def unflatten(values):
+    return [list(values[i*4:i*4+4]) for i in range(4)]
+
+#----------------------------------------
+#            Node Type Schemas
+#----------------------------------------
+
+ALIASES={'t':'translate','tx':'translateX','ty':'translateY','tz':'translateZ',
+         'r':'rotate','rx':'rotateX','ry':'rotateY','rz':'rotateZ',
+         's':'scale','sx':'scaleX','sy':'scaleY','sz':'scaleZ',
+         'v':'visibility','jo':'jointOrient','jox':'jointOrientX','joy':'jointOrientY','joz':'jointOrientZ',
+         'wm':'worldMatrix','pm':'parentMatrix','pim':'parentInverseMatrix','m':'matrix',
+         'ro':'rotateOrder','pv':'poleVector','pvx':'poleVectorX','pvy':'poleVectorY','pvz':'poleVectorZ'}
+
+def _xyz(name,default=(0.0,0.0,0.0),suffix='XYZ'):
+    return (name,[name+s for s in suffix],list(default))
+
+TRANSFORM_ATTRS=[_xyz('translate'),_xyz('rotate'),_xyz('scale',(1.0,1.0,1.0)),('visibility',None,True),('rotateOrder',None,0)]
+
+SCHEMAS={
+    'transform':TRANSFORM_ATTRS,
+    'joint':TRANSFORM_ATTRS+[_xyz('jointOrient')],
+    'ikHandle':TRANSFORM_ATTRS+[_xyz('poleVector',(0.0,1.0,0.0)),('twist',None,0.0)],
+    'ikEffector':TRANSFORM_ATTRS,
+    'parentConstraint':TRANSFORM_ATTRS+[_xyz('constraintTranslate'),_xyz('constraintRotate')],
+    'orientConstraint':TRANSFORM_ATTRS+[_xyz('constraintRotate')],
+    'aimConstraint':TRANSFORM_ATTRS+[_xyz('constraintRotate')],
+    'poleVectorConstraint':TRANSFORM_ATTRS+[_xyz('constraintTranslate')],
+    'nurbsCurve':[('visibility',None,True)],
+    'locator':[('visibility',None,True)],
+    'blendColors':[_xyz('color1',(1.0,0.0,0.0),'RGB'),_xyz('color2',(0.0,0.0,1.0),'RGB'),('blender',None,0.5),_xyz('output',suffix='RGB')],
+    'condition':[('operation',None,0),('firstTerm',None,0.0),('secondTerm',None,0.0),
+                 _xyz('colorIfTrue',suffix='RGB'),_xyz('colorIfFalse',(1.0,1.0,1.0),'RGB'),_xyz('outColor',suffix='RGB')],
+    'multiplyDivide':[('operation',None,1),_xyz('input1'),_xyz('input2',(1.0,1.0,1.0)),_xyz('output')],
+    'setRange':[_xyz('value'),_xyz('min'),_xyz('max'),_xyz('oldMin'),_xyz('oldMax'),_xyz('outValue')],
+    'animCurveTL':[('output',None,0.0)],
+    'animCurveTA':[('output',None,0.0)],
+    'animCurveTU':[('output',None,0.0)],
+}
+
+SUPER_TYPES={'joint':'transform','ikHandle':'transform','ikEffector':'transform',
+             'parentConstraint':'constraint','orientConstraint':'constraint','aimConstraint':'constraint',
+             'poleVectorConstraint':'constraint','constraint':'transform',
+             'nurbsCurve':'shape','locator':'shape','shape':'dagNode','transform':'dagNode',
+             'animCurveTL':'animCurve','animCurveTA':'animCurve','animCurveTU':'animCurve'}
+
+def is_type(node_type,wanted):
+    while node_type:
+        if node_type==wanted:
+            return True
+        node_type=SUPER_TYPES.get(node_type)
+    return False
+
+#----------------------------------------
+#                 Nodes
+#----------------------------------------
+
+class Node(object):
+    def __init__(self,name,node_type):
+        self.name=name
+        self.type=node_type
+        self.parent=None
+        self.children=[]
+        self.values={}
+        self.flags={}
+        self.compounds={}
+        self.children_of={}
+        self.dynamic=[]
+        self.inputs={}
+        self.outputs=[]
+        self.cvs=[]
+        self.data={}
+        for attr,children,default in SCHEMAS.get(node_type,[]):
+            self.add_attr(attr,children,default)
+
+    def add_attr(self,attr,children=None,default=0.0,minimum=None,maximum=None,keyable=True):
+        if children:
+            self.compounds[attr]=list(children)
+            for child,value in zip(children,default):
+                self.values[child]=value
+                self.children_of[child]=attr
+                self.flags[child]={'lock':False,'keyable':keyable,'channelBox':False}
+        else:
+            self.values[attr]=default
+            self.flags[attr]={'lock':False,'keyable':keyable,'channelBox':False,'min':minimum,'max':maximum}
+
+    def is_dag(self):
+        return is_type(self.type,'transform') or is_type(self.type,'shape')
+
+    def long_name(self):
+        names=[]
+        node=self
+        while node is not None:
+            names.append(node.name)
+            node=node.parent
+        return '|'+'|'.join(reversed(names))
+
+    def has_attr(self,attr):
+        if attr=='offsetParentMatrix':
+            return 'translate' in self.compounds
+        return attr in self.values or attr in self.compounds or attr in ('worldMatrix','matrix','parentMatrix','parentInverseMatrix','worldInverseMatrix','message')
+
+#----------------------------------------
+#            The Fake Scene
+#----------------------------------------
+
+class FakeScene(object):
+    def __init__(self):
+        self.nodes={}
+        self.selection=[]
+        self.warnings=[]
+        self.scene_name=''
+        self.evaluating=set()
+        self.time=1.0
+        self.undo_chunks=[]
+        self.refresh_suspended=False
+        self.evaluation_mode='parallel'
+        # Node added callbacks by id, each called with every node created from then on
+        self.node_added={}
+        # Evaluated outputs, IK rotations and world matrices by node at cache_time, cleared by every edit of the scene
+        self.cache={}
+        self.cache_time=None
+
+    #-------------- naming -------------------
+
+    def unique_name(self,name):
+        # a. Like Maya: invalid characters become underscores, clashes get the next free trailing number
+        name=re.sub(r'[^A-Za-z0-9_]','_',name)
+        if name and name[0].isdigit():
+            name='_'+name
+        if name not in self.nodes:
+            return name
+        base,digits=re.match(r'^(.*?)(\d*)$',name).groups()
+        index=int(digits)+1 if digits else 1
+        while base+str(index) in self.nodes:
+            index+=1
+        return base+str(index)
+
+    def create_node(self,node_type,name,parent=None):
+        node=Node(self.unique_name(name),node_type)
+        self.nodes[node.name]=node
+        if parent is not None:
+            self.reparent(node,parent)
+        for function in list(self.node_added.values()):
+            function(node)
+        return node
+
+    def node(self,name):
+        if isinstance(name,Node):
+            return name
+        if isinstance(name,(list,tuple)):
+            name=name[0]
+        short=name.split('.')[0].split('|')[-1]
+        if short not in self.nodes:
+            raise ValueError('No object matches name: %s' % name)
+        return self.nodes[short]
+
+    def names(self,args):
+        # a. Commands accept strings, lists of strings or both
+        result=[]
+        for arg in args:
+            if isinstance(arg,(list,tuple)):
+                result.extend(self.names(arg))
+            elif arg is not None:
+                result.append(arg)
+        return result
+
+    def transform_of(self,node):
+        if is_type(node.type,'shape'):
+            return node.parent
+        return node
+
+    #-------------- DAG ----------------------
+
+    def reparent(self,node,parent):
+        self.dirty()
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        node.parent=parent
+        if parent is not None:
+            parent.children.append(node)
+
+    def descendants(self,node):
+        # a. Maya lists descendants deepest first
+        result=[]
+        stack=list(reversed(node.children))
+        while stack:
+            child=stack.pop()
+            result.append(child)
+            stack.extend(reversed(child.children))
+        result.reverse()
+        return result
+
+    #-------------- attributes ---------------
+
+    def plug(self,plug):
+        name,attr=plug.split('.',1)
+        attr=attr.rstrip('.')
+        node=self.node(name)
+        # a. Single-instance nodes: worldMatrix[0] is the worldMatrix
+        if attr in ('worldMatrix[0]','wm[0]'):
+            attr='worldMatrix'
+        attr=ALIASES.get(attr,attr)
+        if not node.has_attr(attr):
+            raise ValueError('No object matches name: %s' % plug)
+        return node,attr
+
+    def leaves(self,node,attr):
+        return node.compounds.get(attr,[attr])
+
+    def evaluated(self):
+        # a. What was evaluated since the last edit, at the current time, like the clean plugs of the DG
+        if self.cache_time!=self.time:
+            self.cache={}
+            self.cache_time=self.time
+        return self.cache
+
+    def dirty(self):
+        self.cache={}
+
+    def read(self,node,attr):
+        # a. Connected leaf
+        if attr in node.inputs:
+            return self.read(*node.inputs[attr])
+        # a.1 Rotation of a joint solved by an IK handle
+        if 'ikHandle' in node.data and attr in ('rotate','rotateX','rotateY','rotateZ') and self.ik_solvable(node):
+            rotate=self.ik_rotate(node)
+            return list(rotate) if attr=='rotate' else rotate['XYZ'.index(attr[-1])]
+        # b. Leaf of a connected compound, read the matching child of the source compound
+        parent=node.children_of.get(attr)
+        if parent is not None and parent in node.inputs:
+            source,source_attr=node.inputs[parent]
+            index=node.compounds[parent].index(attr)
+            return self.read(source,self.leaves(source,source_attr)[index])
+        # c. Compound attribute
+        if attr in node.compounds:
+            return [self.read(node,child) for child in node.compounds[attr]]
+        # d. Matrices and computed outputs
+        if attr in ('worldMatrix','matrix','parentMatrix','parentInverseMatrix','worldInverseMatrix'):
+            return flatten(self.matrix_attr(node,attr))
+        compute=COMPUTE.get(node.type)
+        if compute is not None and attr in OUTPUTS.get(node.type,()):
+            cache=self.evaluated()
+            if ('outputs',node) in cache:
+                return cache[('outputs',node)][attr]
+            key=(node.name,attr)
+            if key not in self.evaluating:
+                self.evaluating.add(key)
+                try:
+                    outputs=compute(self,node)
+                    cache[('outputs',node)]=outputs
+                    return outputs[attr]
+                finally:
+                    self.evaluating.discard(key)
+        return node.values.get(attr)
+
+    def read_vector(self,node,attr):
+        return [float(v) for v in self.read(node,attr)]
+
+    def matrix_attr(self,node,attr):
+        node=self.transform_of(node)
+        if attr=='matrix':
+            return self.local_matrix(node)
+        if attr=='worldMatrix':
+            return self.world_matrix(node)
+        if attr=='worldInverseMatrix':
+            return inverse(self.world_matrix(node))
+        parent_matrix=self.world_matrix(node.parent) if node.parent is not None else identity()
+        return parent_matrix if attr=='parentMatrix' else inverse(parent_matrix)
+
+    def local_matrix(self,node):
+        node=self.transform_of(node)
+        if node is None or not node.compounds.get('translate'):
+            return identity()
+        joint_orient=self.read_vector(node,'jointOrient') if node.type=='joint' else None
+        return compose(self.read_vector(node,'translate'),self.read_vector(node,'rotate'),self.read_vector(node,'scale'),joint_orient)
+
+    def rest_matrix(self,node,parent_matrix):
+        # a. World matrix of a joint from its own rotate values, the rest pose the IK solve starts from
+        translate=[node.values[leaf] for leaf in node.compounds['translate']]
+        rotate=[node.values[leaf] for leaf in node.compounds['rotate']]
+        scale=[node.values[leaf] for leaf in node.compounds['scale']]
+        return mult(compose(translate,rotate,scale,self.read_vector(node,'jointOrient')),parent_matrix)
+
+    def ik_solvable(self,node):
+        # a. The handle and every joint of its chain still exist
+        handle=self.nodes.get(node.data['ikHandle'])
+        return handle is not None and all(name in self.nodes for name in handle.data['joints']+[handle.data['end']])
+
+    def ik_rotate(self,node):
+        # a. Rotate values of the start and middle joints of a two-bone ikRPsolver chain
+        handle=self.nodes[node.data['ikHandle']]
+        cache=self.evaluated()
+        if ('ik',node) in cache:
+            return cache[('ik',node)]
+        start,middle=[self.nodes[name] for name in handle.data['joints']]
+        end=self.nodes[handle.data['end']]
+        parent=self.parent_matrix(start)
+        start_rest=self.rest_matrix(start,parent)
+        middle_rest=self.rest_matrix(middle,start_rest)
+        end_rest=self.rest_matrix(end,middle_rest)
+        origin=start_rest[3][:3]
+        target=self.world_position(handle)
+        pole=[o+p for o,p in zip(origin,self.read_vector(handle,'poleVector'))]
+        # b. Solved from the rest pose kept in the rotate values of the start and middle joints
+        start_rot,middle_rot=rotate_plane(origin,middle_rest[3][:3],end_rest[3][:3],rotation_only(start_rest),
+                                          rotation_only(middle_rest),target,pole,self.read(handle,'twist'))
+        # c. Back to rotate values, below the parent of the chain and below the solved start joint
+        for joint,world,above in ((start,start_rot,rotation_only(parent)),(middle,middle_rot,start_rot)):
+            local=mult(mult(world,inverse(above)),inverse(euler_to_matrix(self.read_vector(joint,'jointOrient'))))
+            cache[('ik',joint)]=matrix_to_euler(local)
+        return cache[('ik',node)]
+
+    def offset_parent_matrix(self,node):
+        # a. None when the node has no offsetParentMatrix set or connected, the identity Maya defaults to
+        if 'offsetParentMatrix' in node.inputs or node.values.get('offsetParentMatrix'):
+            return unflatten(self.read(node,'offsetParentMatrix'))
+        return None
+
+    def placed_matrix(self,node):
+        # a. The local matrix followed by the offsetParentMatrix, what a node adds to its parent's world matrix
+        matrix=self.local_matrix(node)
+        offset=self.offset_parent_matrix(node)
+        return mult(matrix,offset) if offset is not None else matrix
+
+    def world_matrix(self,node):
+        # a. Each node's world matrix is evaluated once until the next edit, its parent's is reused
+        node=self.transform_of(node)
+        if node is None:
+            return identity()
+        cache=self.evaluated()
+        if ('world',node) not in cache:
+            matrix=self.placed_matrix(node)
+            cache[('world',node)]=mult(matrix,self.world_matrix(node.parent)) if node.parent is not None else matrix
+        return cache[('world',node)]
+
+    def parent_matrix(self,node):
+        # a. Everything above the local matrix of a node: its offsetParentMatrix and its parent's world matrix
+        node=self.transform_of(node)
+        matrix=self.world_matrix(node.parent) if node.parent is not None else identity()
+        offset=self.offset_parent_matrix(node)
+        return mult(offset,matrix) if offset is not None else matrix
+
+    def world_position(self,node):
+        return self.world_matrix(node)[3][:3]
+
+    def world_pivot(self,node):
+        # a. World position from the translate and the parents only, so a node's own rotation is never read
+        node=self.transform_of(node)
+        offset=compose(self.read_vector(node,'translate') if node.compounds.get('translate') else [0.0,0.0,0.0],[0.0,0.0,0.0],[1.0,1.0,1.0])
+        return mult(offset,self.parent_matrix(node))[3][:3]
+
+    def local_from_world(self,node,world):
+        # a. Returns translate, rotate and scale values of a node giving it the world matrix
+        local=mult(world,inverse(self.parent_matrix(node)))
+        translate,rot,scale=decompose(local)
+        if node.type=='joint':
+            rot=mult(rot,inverse(euler_to_matrix(self.read_vector(node,'jointOrient'))))
+        return translate,matrix_to_euler(rot),scale
+
+    def write(self,node,attr,value,force=False):
+        self.dirty()
+        leaves=self.leaves(node,attr)
+        values=value if len(leaves)>1 else [value]
+        for leaf,leaf_value in zip(leaves,values):
+            if node.flags.get(leaf,{}).get('lock') and not force:
+                raise RuntimeError('The attribute \'%s.%s\' is locked or connected and cannot be modified.' % (node.name,leaf))
+            if not self.set_keyed(node,leaf,leaf_value):
+                node.values[leaf]=leaf_value
+
+    def set_transform(self,node,translate=None,rotate=None,scale=None):
+        # a. Locked or driven channels are skipped, the same way matchTransform leaves them alone
+        self.dirty()
+        for attr,value in (('translate',translate),('rotate',rotate),('scale',scale)):
+            if value is None:
+                continue
+            for leaf,leaf_value in zip(node.compounds[attr],value):
+                if node.flags[leaf]['lock'] or self.set_keyed(node,leaf,leaf_value):
+                    continue
+                if leaf in node.inputs or attr in node.inputs:
+                    continue
+                node.values[leaf]=leaf_value
+
+    def connect(self,source,source_attr,target,target_attr,force=False):
+        self.dirty()
+        if target_attr in target.inputs:
+            if not force:
+                raise RuntimeError('%s.%s is already connected.' % (target.name,target_attr))
+            self.disconnect(target,target_attr)
+        target.inputs[target_attr]=(source,source_attr)
+        source.outputs.append((source_attr,target,target_attr))
+
+    def disconnect(self,target,target_attr,keep_value=False):
+        source,source_attr=target.inputs[target_attr]
+        if keep_value:
+            value=self.read(target,target_attr)
+        self.dirty()
+        del target.inputs[target_attr]
+        source.outputs.remove((source_attr,target,target_attr))
+        if keep_value:
+            for leaf,leaf_value in zip(self.leaves(target,target_attr),value if target_attr in target.compounds else [value]):
+                target.values[leaf]=leaf_value
+
+    #----------------------------------------
+    #         maya.cmds compatible API
+    #----------------------------------------
+
+    def warning(self,message):
+        self.warnings.append(message)
+
+    def objExists(self,name):
+        try:
+            if '.' in name:
+                self.plug(name)
+            else:
+                self.node(name)
+            return True
+        except ValueError:
+            return False
+
+    def nodeType(self,name):
+        return self.node(name).type
+
+    def ls(self,*args,**kwargs):
+        selected=kwargs.get('sl',kwargs.get('selection',False))
+        node_type=kwargs.get('type',kwargs.get('typ'))
+        long_names=kwargs.get('l',kwargs.get('long',False))
+        if selected:
+            items=list(self.selection)
+        else:
+            patterns=self.names(args)
+            items=[]
+            if not patterns:
+                items=list(self.nodes.values())
+            for pattern in patterns:
+                short=pattern.split('|')[-1]
+                # a.1 Exact names are looked up directly, wildcards are matched against every node
+                if not any(c in short for c in '*?['):
+                    if short in self.nodes and self.nodes[short] not in items:
+                        items.append(self.nodes[short])
+                    continue
+                items.extend(node for node in self.nodes.values() if fnmatch.fnmatchcase(node.name,short) and node not in items)
+        result=[]
+        for item in items:
+            if isinstance(item,tuple):
+                if node_type is None:
+                    result.append(item[0].name+'.'+item[1])
+                continue
+            if node_type is not None and not any(is_type(item.type,t) for t in ([node_type] if isinstance(node_type,str) else node_type)):
+                continue
+            result.append(item.long_name() if long_names and item.is_dag() else item.name)
+        return result
+
+    def select(self,*args,**kwargs):
+        if kwargs.get('cl',kwargs.get('clear',False)):
+            self.selection=[]
+            return
+        items=[]
+        for name in self.names(args):
+            node=self.node(name)
+            if '.' in name:
+                items.append((node,name.split('.',1)[1]))
+            else:
+                items.append(node)
+        if kwargs.get('add',False):
+            self.selection.extend(item for item in items if item not in self.selection)
+        elif kwargs.get('d',kwargs.get('deselect',False)):
+            self.selection=[item for item in self.selection if item not in items]
+        else:
+            self.selection=items
+
+    def listRelatives(self,*args,**kwargs):
+        node_type=kwargs.get('type',kwargs.get('typ'))
+        result=[]
+        for name in self.names(args) or [item for item in self.selection if isinstance(item,Node)]:
+            node=self.node(name)
+            if kwargs.get('p',kwargs.get('parent',False)):
+                found=[node.parent] if node.parent is not None else []
+            elif kwargs.get('ad',kwargs.get('allDescendents',False)):
+                found=self.descendants(node)
+            elif kwargs.get('s',kwargs.get('shapes',False)):
+                found=[child for child in node.children if is_type(child.type,'shape')]
+            else:
+                found=list(node.children)
+            for item in found:
+                if node_type is None or is_type(item.type,node_type):
+                    if item.name not in result:
+                        result.append(item.long_name() if kwargs.get('f',kwargs.get('fullPath',False)) else item.name)
+        return result or None
+
+    def listConnections(self,*args,**kwargs):
+        source=kwargs.get('s',kwargs.get('source',True))
+        destination=kwargs.get('d',kwargs.get('destination',True))
+        plugs=kwargs.get('p',kwargs.get('plugs',False))
+        pairs=kwargs.get('c',kwargs.get('connections',False))
+        result=[]
+        for name in self.names(args):
+            if '.' in name:
+                node,attr=self.plug(name)
+                attrs=set(self.leaves(node,attr))|{attr}
+            else:
+                node,attrs=self.node(name),None
+            if source:
+                for target_attr,(src,src_attr) in node.inputs.items():
+                    if attrs is None or target_attr in attrs:
+                        if pairs:
+                            result.append(node.name+'.'+target_attr)
+                        result.append(src.name+'.'+src_attr if plugs else src.name)
+            if destination:
+                for src_attr,target,target_attr in node.outputs:
+                    if attrs is None or src_attr in attrs:
+                        if pairs:
+                            result.append(node.name+'.'+src_attr)
+                        result.append(target.name+'.'+target_attr if plugs else target.name)
+        return result or None
+
+    def rename(self,old,new):
+        node=self.node(old)
+        del self.nodes[node.name]
+        node.name=self.unique_name(new)
+        self.nodes[node.name]=node
+        return node.name
+
+    #-------------- creation -----------------
+
+    def createNode(self,node_type,name=None,n=None,parent=None,p=None,**kwargs):
+        parent=parent or p
+        node=self.create_node(node_type,name or n or node_type+'1',self.node(parent) if parent else None)
+        return node.name
+
+    def shadingNode(self,node_type,name=None,n=None,asUtility=False,au=False,**kwargs):
+        return self.create_node(node_type,name or n or node_type+'1').name
+
+    def group(self,*args,**kwargs):
+        name=kwargs.get('name',kwargs.get('n','group1'))
+        empty=kwargs.get('em',kwargs.get('empty',False))
+        objects=[] if empty else [self.node(item) for item in (self.names(args) or [item for item in self.selection if isinstance(item,Node)])]
+        # a. The group is created under the parent of the first object, with an identity transform
+        parent=objects[0].parent if objects else None
+        group=self.create_node('transform',name,parent)
+        for node in objects:
+            self.reparent(node,group)
+        self.selection=[group]
+        return group.name
+
+    def spaceLocator(self,name=None,n=None,position=None,p=None,**kwargs):
+        locator=self.create_node('transform',name or n or 'locator1')
+        self.create_node('locator',locator.name+'Shape',locator)
+        position=position or p
+        if position:
+            self.write(locator,'translate',list(position))
+        self.selection=[locator]
+        return [locator.name]
+
+    def circle(self,name=None,n=None,nr=(0,0,1),normal=None,degree=3,d=None,sections=8,s=None,r=1.0,radius=None,ch=True,**kwargs):
+        degree=d or degree
+        sections=s or sections
+        radius=radius or r
+        normal=normal or nr
+        curve=self.create_node('transform',name or n or 'nurbsCircle1')
+        shape=self.create_node('nurbsCurve',curve.name+'Shape',curve)
+        shape.cvs=circle_cvs(normal,radius,sections,degree)
+        shape.data['degree']=degree
+        self.selection=[curve]
+        return [curve.name]
+
+    def curve(self,name=None,n=None,d=1,degree=None,p=None,point=None,**kwargs):
+        curve=self.create_node('transform',name or n or 'curve1')
+        shape=self.create_node('nurbsCurve',curve.name+'Shape',curve)
+        shape.cvs=[list(point) for point in (point or p)]
+        shape.data['degree']=degree or d
+        # a. A periodic curve repeats its first CVs at the end; like circle() only the distinct CVs are kept
+        if kwargs.get('per',kwargs.get('periodic',False)):
+            shape.cvs=shape.cvs[:-shape.data['degree']]
+        self.selection=[curve]
+        return curve.name
+
+    def joint(self,*args,**kwargs):
+        names=self.names(args)
+        # a. Query the world position of a joint
+        if kwargs.get('q',kwargs.get('query',False)):
+            node=self.node(names[0] if names else self.selection[-1])
+            if kwargs.get('p',kwargs.get('position',False)):
+                return list(self.world_position(node))
+            if kwargs.get('o',kwargs.get('orientation',False)):
+                return self.read_vector(node,'jointOrient')
+            return None
+        # b. Edit a joint
+        if kwargs.get('e',kwargs.get('edit',False)):
+            node=self.node(names[0] if names else self.selection[-1])
+            new_name=kwargs.get('name',kwargs.get('n'))
+            if new_name:
+                self.rename(node,new_name)
+            if kwargs.get('o',kwargs.get('orientation')) is not None:
+                self.write(node,'jointOrient',list(kwargs.get('o',kwargs.get('orientation'))))
+            return None
+        # c. Create a joint under the selected joint, at a world position
+        parents=[item for item in self.selection if isinstance(item,Node) and item.type=='joint']
+        parent=parents[-1] if parents else None
+        node=self.create_node('joint',kwargs.get('name',kwargs.get('n','joint1')),parent)
+        position=kwargs.get('p',kwargs.get('position'))
+        if position is not None:
+            world=compose(list(position),[0.0,0.0,0.0],[1.0,1.0,1.0])
+            self.write(node,'translate',decompose(mult(world,inverse(self.parent_matrix(node))))[0])
+        orientation=kwargs.get('o',kwargs.get('orientation'))
+        if orientation is not None:
+            self.write(node,'jointOrient',list(orientation))
+        self.selection=[node]
+        return node.name
+
+    def duplicate(self,*args,**kwargs):
+        names=self.names(args) or [item.name for item in self.selection if isinstance(item,Node)]
+        source=self.node(names[0])
+        created=[]
+
+        def copy(node,parent,name):
+            new=self.create_node(node.type,name,parent)
+            new.values=dict(node.values)
+            new.flags=dict((attr,dict(flags)) for attr,flags in node.flags.items())
+            new.compounds=dict((attr,list(children)) for attr,children in node.compounds.items())
+            new.children_of=dict(node.children_of)
+            new.dynamic=list(node.dynamic)
+            new.cvs=[list(cv) for cv in node.cvs]
+            new.data=dict(node.data)
+            created.append(new.name)
+            for child in node.children:
+                # b. With renameChildren the children get unique names (elbow -> elbow1)
+                copy(child,new,child.name)
+            return new
+
+        top=copy(source,source.parent,kwargs.get('name',kwargs.get('n',source.name)))
+        self.selection=[top]
+        return created
+
+    def delete(self,*args,**kwargs):
+        nodes=[self.node(name) for name in (self.names(args) or [item for item in self.selection if isinstance(item,Node)])]
+        # a. Only delete the constraints on the given objects
+        if kwargs.get('constraints',kwargs.get('cn',False)):
+            targets=[]
+            for node in nodes:
+                targets.extend(child for child in node.children if is_type(child.type,'constraint'))
+            nodes=targets
+        for node in nodes:
+            if node.name in self.nodes and self.nodes[node.name] is node:
+                self.delete_node(node)
+
+    def delete_node(self,node):
+        for child in list(node.children):
+            self.delete_node(child)
+        # a. What the node drove keeps its last value
+        for source_attr,target,target_attr in list(node.outputs):
+            if target.name in self.nodes and target is not node:
+                self.disconnect(target,target_attr,keep_value=True)
+        for target_attr in list(node.inputs):
+            self.disconnect(node,target_attr)
+        self.reparent(node,None)
+        del self.nodes[node.name]
+        self.selection=[item for item in self.selection if (item[0] if isinstance(item,tuple) else item) is not node]
+
+    def parent(self,*args,**kwargs):
+        names=self.names(args)
+        world=kwargs.get('w',kwargs.get('world',False))
+        parent=None if world else self.node(names[-1])
+        children=[self.node(name) for name in (names if world else names[:-1])]
+        relative=kwargs.get('r',kwargs.get('relative',False))
+        for child in children:
+            # a. Keep the world transform when reparenting, a relative parent keeps the values instead
+            matrix=None if relative else self.world_matrix(child)
+            self.reparent(child,parent)
+            if child.compounds.get('translate') and not relative:
+                translate,rotate,scale=self.local_from_world(child,matrix)
+                self.set_transform(child,translate,rotate,scale)
+        return [child.name for child in children]
+
+    #-------------- attributes ---------------
+
+    def addAttr(self,*args,**kwargs):
+        names=self.names(args) or [item.name for item in self.selection if isinstance(item,Node)]
+        attr=kwargs.get('ln',kwargs.get('longName'))
+        # a. A message attribute holds no value, it is only connected
+        message=kwargs.get('at',kwargs.get('attributeType'))=='message'
+        for name in names:
+            node=self.node(name)
+            node.add_attr(attr,None,None if message else kwargs.get('dv',kwargs.get('defaultValue',0.0)),kwargs.get('min',kwargs.get('minValue')),
+                          kwargs.get('max',kwargs.get('maxValue')),bool(kwargs.get('k',kwargs.get('keyable',False))))
+            node.dynamic.append(attr)
+
+    def setAttr(self,plug,*values,**kwargs):
+        node,attr=self.plug(plug)
+        # a. Flags only
+        for flag,names in (('lock',('lock','l')),('keyable',('keyable','k')),('channelBox',('channelBox','cb'))):
+            for key in names:
+                if key in kwargs:
+                    for leaf in self.leaves(node,attr):
+                        node.flags.setdefault(leaf,{})[flag]=bool(kwargs[key])
+        if not values:
+            return
+        # b. Values
+        if kwargs.get('type')=='matrix' or kwargs.get('type')=='double3' and len(values)==1:
+            values=values[0]
+        value=list(values) if len(values)>1 else values[0]
+        if isinstance(value,(list,tuple)) and attr not in node.compounds:
+            value=list(value)
+        self.write(node,attr,value)
+
+    def lockHideAttrs(self,plugs,lock=True,keyable=False,channelBox=False):
+        # a. Batched form of setAttr(plug,lock=...,keyable=...,channelBox=...) over many plugs
+        for plug in plugs:
+            node,attr=self.plug(plug)
+            for leaf in self.leaves(node,attr):
+                flags=node.flags.setdefault(leaf,{})
+                flags['lock']=bool(lock)
+                flags['keyable']=bool(keyable)
+                flags['channelBox']=bool(channelBox)
+
+    def getAttr(self,plug,**kwargs):
+        node,attr=self.plug(plug)
+        # a. Evaluated at another time without changing the current time
+        if kwargs.get('t',kwargs.get('time')) is not None:
+            current=self.time
+            self.time=float(kwargs.pop('t',kwargs.pop('time',None)))
+            try:
+                return self.getAttr(plug,**kwargs)
+            finally:
+                self.time=current
+        for flag,names in (('lock',('lock','l')),('keyable',('keyable','k')),('channelBox',('channelBox','cb'))):
+            if any(kwargs.get(key) for key in names):
+                return all(node.flags.get(leaf,{}).get(flag,False) for leaf in self.leaves(node,attr))
+        value=self.read(node,attr)
+        # a. Compound values come back as a list with one tuple, like Maya
+        if attr in node.compounds:
+            return [tuple(value)]
+        return value
+
+    def connectAttr(self,source,target,f=False,force=False,**kwargs):
+        source_node,source_attr=self.plug(source)
+        target_node,target_attr=self.plug(target)
+        self.connect(source_node,source_attr,target_node,target_attr,f or force)
+
+    def disconnectAttr(self,source,target):
+        target_node,target_attr=self.plug(target)
+        self.disconnect(target_node,target_attr)
+
+    def attributeQuery(self,attr,node=None,n=None,exists=False,ex=False,**kwargs):
+        return self.node(node or n).has_attr(ALIASES.get(attr,attr))
+
+    #-------------- transforms ---------------
+
+    def xform(self,*args,**kwargs):
+        nodes=[self.node(name) for name in (self.names(args) or [item.name for item in self.selection if isinstance(item,Node)])]
+        world=kwargs.get('ws',kwargs.get('worldSpace',False))
+        query=kwargs.get('q',kwargs.get('query',False))
+        node=nodes[0]
+        if query:
+            matrix=self.world_matrix(node) if world else self.local_matrix(node)
+            if kwargs.get('m',kwargs.get('matrix',False)):
+                return flatten(matrix)
+            translate,rot,scale=decompose(matrix)
+            if kwargs.get('t',kwargs.get('translation',False)):
+                return translate
+            if kwargs.get('ro',kwargs.get('rotation',False)):
+                return matrix_to_euler(rot) if world else self.read_vector(node,'rotate')
+            if kwargs.get('s',kwargs.get('scale',False)):
+                return scale
+            return None
+        for node in nodes:
+            matrix=kwargs.get('m',kwargs.get('matrix'))
+            if matrix is not None:
+                world_matrix=unflatten(matrix) if world else mult(unflatten(matrix),self.parent_matrix(node))
+                translate,rotate,scale=self.local_from_world(node,world_matrix)
+                self.set_transform(node,translate,rotate,scale)
+            translation=kwargs.get('t',kwargs.get('translation'))
+            if translation is not None:
+                if world:
+                    world_matrix=self.world_matrix(node)
+                    world_matrix[3][:3]=list(translation)
+                    translation=self.local_from_world(node,world_matrix)[0]
+                self.set_transform(node,translate=list(translation))
+            rotation=kwargs.get('ro',kwargs.get('rotation'))
+            if rotation is not None:
+                if world:
+                    world_matrix=self.world_matrix(node)
+                    position=world_matrix[3][:3]
+                    world_matrix=compose(position,list(rotation),decompose(world_matrix)[2])
+                    rotation=self.local_from_world(node,world_matrix)[1]
+                self.set_transform(node,rotate=list(rotation))
+
+    def matchTransform(self,*args,**kwargs):
+        names=self.names(args)
+        target=self.transform_of(self.node(names[-1]))
+        position=kwargs.get('pos',kwargs.get('position',False))
+        rotation=kwargs.get('rot',kwargs.get('rotation',False))
+        scale=kwargs.get('scl',kwargs.get('scale',False))
+        if not (position or rotation or scale):
+            position=rotation=scale=True
+        target_matrix=self.world_matrix(target)
+        for name in names[:-1]:
+            node=self.transform_of(self.node(name))
+            translate,rotate,scales=self.local_from_world(node,target_matrix)
+            # a. Scale is matched on its own so a scaled target does not change the rotation
+            if scale:
+                source_scale=decompose(target_matrix)[2]
+                node_scale=decompose(self.world_matrix(node))[2]
+                current=self.read_vector(node,'scale')
+                scales=[c*s/(n or 1.0) for c,s,n in zip(current,source_scale,node_scale)]
+            self.set_transform(node,translate if position else None,rotate if rotation else None,scales if scale else None)
+
+    def move(self,*args,**kwargs):
+        values=[a for a in args if isinstance(a,(int,float))]
+        names=self.names([a for a in args if not isinstance(a,(int,float))])
+        relative=kwargs.get('r',kwargs.get('relative',False))
+        object_space=kwargs.get('os',kwargs.get('objectSpace',False))
+        for name in names or [item.name for item in self.selection if isinstance(item,Node)]:
+            node=self.node(name)
+            if relative:
+                delta=list(values)
+                # a. In object space the offset follows the node's own axes
+                if object_space:
+                    rot=rotation_only(self.local_matrix(node))
+                    delta=[sum(values[i]*rot[i][j] for i in range(3)) for j in range(3)]
+                self.set_transform(node,translate=[a+b for a,b in zip(self.read_vector(node,'translate'),delta)])
+            else:
+                self.xform(node.name,ws=True,t=values)
+
+    def scale(self,*args,**kwargs):
+        values=[a for a in args if isinstance(a,(int,float))]
+        names=self.names([a for a in args if not isinstance(a,(int,float))])
+        relative=kwargs.get('r',kwargs.get('relative',False))
+        items=[self.node(name) if '.' not in name else (self.node(name),name.split('.',1)[1]) for name in names] if names else list(self.selection)
+        for item in items:
+            # a. Components (curve CVs) are scaled about their centre
+            if isinstance(item,tuple):
+                shape=item[0] if item[0].cvs else [child for child in item[0].children if child.cvs][0]
+                indices=cv_indices(item[1],len(shape.cvs))
+                centre=[sum(shape.cvs[i][axis] for i in indices)/len(indices) for axis in range(3)]
+                for i in indices:
+                    shape.cvs[i]=[centre[axis]+(shape.cvs[i][axis]-centre[axis])*values[axis] for axis in range(3)]
+            else:
+                current=self.read_vector(item,'scale')
+                self.set_transform(item,scale=[c*v for c,v in zip(current,values)] if relative else list(values))
+
+    def makeIdentity(self,*args,**kwargs):
+        for name in self.names(args) or [item.name for item in self.selection if isinstance(item,Node)]:
+            node=self.node(name)
+            if not kwargs.get('a',kwargs.get('apply',False)):
+                continue
+            translate=kwargs.get('t',kwargs.get('translate',False))
+            rotate=kwargs.get('r',kwargs.get('rotate',False))
+            scale=kwargs.get('s',kwargs.get('scale',False))
+            if not (translate or rotate or scale):
+                translate=rotate=scale=True
+            # a. Bake the frozen channels into the CVs of the shapes
+            frozen=compose(self.read_vector(node,'translate') if translate else [0.0,0.0,0.0],
+                           self.read_vector(node,'rotate') if rotate else [0.0,0.0,0.0],
+                           self.read_vector(node,'scale') if scale else [1.0,1.0,1.0])
+            for shape in node.children:
+                shape.cvs=[mult([cv+[1.0],[0.0]*4,[0.0]*4,[0.0]*4],frozen)[0][:3] for cv in shape.cvs]
+            self.set_transform(node,[0.0,0.0,0.0] if translate else None,[0.0,0.0,0.0] if rotate else None,[1.0,1.0,1.0] if scale else None)
+
+    #-------------- constraints --------------
+
+    def constraint(self,node_type,args,kwargs,offset=False):
+        names=self.names(args) or [item.name for item in self.selection if isinstance(item,Node)]
+        targets=[self.node(name) for name in names[:-1]]
+        driven=self.transform_of(self.node(names[-1]))
+        name=kwargs.get('name',kwargs.get('n',driven.name+'_'+node_type+'1'))
+        con=self.create_node(node_type,name,driven)
+        for index,target in enumerate(targets):
+            con.add_attr('target[%d].targetWorldMatrix' % index,None,None)
+            self.connect(target,'worldMatrix',con,'target[%d].targetWorldMatrix' % index)
+            for attr in ('targetOffsetTranslate','targetOffsetRotate'):
+                plug='target[%d].%s' % (index,attr)
+                con.add_attr(plug,[plug+axis for axis in 'XYZ'],[0.0,0.0,0.0])
+        con.add_attr('constraintParentInverseMatrix',None,None)
+        self.connect(driven,'parentInverseMatrix',con,'constraintParentInverseMatrix')
+        # a. With maintainOffset the current relation between the driven node and the first target is kept, in the
+        #    space of the target like Maya's targetOffsetTranslate/targetOffsetRotate
+        if offset:
+            translate,rot,scale=decompose(mult(self.world_matrix(driven),inverse(self.world_matrix(targets[0]))))
+            self.write(con,'target[0].targetOffsetTranslate',translate)
+            self.write(con,'target[0].targetOffsetRotate',matrix_to_euler(rot))
+        for flag,key in (('aim',('aim','aimVector')),('up',('u','upVector')),('worldUpType',('wut','worldUpType')),
+                         ('worldUpVector',('wu','worldUpVector')),('worldUpObject',('wuo','worldUpObject'))):
+            for k in key:
+                if k in kwargs:
+                    con.data[flag]=kwargs[k] if flag!='worldUpObject' else self.node(kwargs[k]).name
+        self.dirty()
+        return con,driven
+
+    def parentConstraint(self,*args,**kwargs):
+        con,driven=self.constraint('parentConstraint',args,kwargs,kwargs.get('mo',kwargs.get('maintainOffset',False)))
+        self.connect(con,'constraintTranslate',driven,'translate',True)
+        self.connect(con,'constraintRotate',driven,'rotate',True)
+        return [con.name]
+
+    def orientConstraint(self,*args,**kwargs):
+        con,driven=self.constraint('orientConstraint',args,kwargs,kwargs.get('mo',kwargs.get('maintainOffset',False)))
+        self.connect(con,'constraintRotate',driven,'rotate',True)
+        return [con.name]
+
+    def aimConstraint(self,*args,**kwargs):
+        con,driven=self.constraint('aimConstraint',args,kwargs)
+        self.connect(con,'constraintRotate',driven,'rotate',True)
+        return [con.name]
+
+    def poleVectorConstraint(self,*args,**kwargs):
+        con,handle=self.constraint('poleVectorConstraint',args,kwargs)
+        self.connect(con,'constraintTranslate',handle,'poleVector',True)
+        return [con.name]
+
+    def ikHandle(self,*args,**kwargs):
+        start=kwargs.get('sj',kwargs.get('startJoint'))
+        end=kwargs.get('ee',kwargs.get('endEffector'))
+        joints=[item for item in self.selection if isinstance(item,Node) and item.type=='joint']
+        end=self.node(end) if end else joints[-1]
+        # a. The start joint is the first selected ancestor of the end joint, otherwise the root of its chain
+        if start:
+            start=self.node(start)
+        else:
+            ancestors=[]
+            parent=end.parent
+            while parent is not None and parent.type=='joint':
+                ancestors.append(parent)
+                parent=parent.parent
+            selected=[joint for joint in joints if joint in ancestors]
+            start=selected[0] if selected else ancestors[-1]
+        handle=self.create_node('ikHandle',kwargs.get('n',kwargs.get('name','ikHandle1')))
+        effector=self.create_node('ikEffector','effector1',end.parent)
+        self.write(handle,'translate',self.world_position(end))
+        handle.data['solver']=kwargs.get('sol',kwargs.get('solver','ikRPsolver'))
+        handle.add_attr('startJoint',None,None)
+        handle.add_attr('endEffector',None,None)
+        # a.1 Two-bone rotate-plane chains are solved: the start and middle joints get their rotation from the handle
+        if handle.data['solver']=='ikRPsolver' and end.parent is not None and end.parent.parent is start:
+            # a.2 Like Maya, the pole vector starts out in the plane the chain bends in, so creating the handle does
+            #     not twist the chain
+            origin,middle,tip=[self.world_position(joint) for joint in (start,end.parent,end)]
+            axis=[t-o for o,t in zip(origin,tip)]
+            bend=[m-o for o,m in zip(origin,middle)]
+            along=sum(a*b for a,b in zip(axis,bend))/(sum(a*a for a in axis) or 1.0)
+            bend=[b-along*a for a,b in zip(axis,bend)]
+            if math.sqrt(sum(b*b for b in bend))>1e-8:
+                self.write(handle,'poleVector',bend)
+            handle.data['joints']=[start.name,end.parent.name]
+            handle.data['end']=end.name
+            for joint in (start,end.parent):
+                joint.data['ikHandle']=handle.name
+            self.dirty()
+        self.connect(start,'message',handle,'startJoint')
+        self.connect(effector,'message',handle,'endEffector')
+        self.selection=[handle]
+        return [handle.name,effector.name]
+
+    #-------------- animation ----------------
+
+    def anim_curve(self,node,leaf):
+        # a. The animation curve keying a leaf attribute, created and connected on the first key like setKeyframe
+        if leaf in node.inputs and is_type(node.inputs[leaf][0].type,'animCurve'):
+            return node.inputs[leaf][0]
+        curve_type='animCurveTL' if leaf.startswith('translate') else 'animCurveTA' if leaf.startswith('rotate') else 'animCurveTU'
+        curve=self.create_node(curve_type,node.name+'_'+leaf)
+        curve.data['keys']=[]
+        self.connect(curve,'output',node,leaf)
+        return curve
+
+    def keyed_leaves(self,args,kwargs):
+        names=self.names(args) or [item.name for item in self.selection if isinstance(item,Node)]
+        attributes=kwargs.get('at',kwargs.get('attribute'))
+        if isinstance(attributes,str):
+            attributes=[attributes]
+        result=[]
+        for name in names:
+            if '.' in name:
+                node,attr=self.plug(name)
+                result.extend((node,leaf) for leaf in self.leaves(node,attr))
+                continue
+            node=self.node(name)
+            if attributes:
+                for attr in attributes:
+                    attr=ALIASES.get(attr,attr)
+                    result.extend((node,leaf) for leaf in self.leaves(node,attr))
+            else:
+                # a.1 Without attributes: every keyable, unlocked channel that is not driven by another node
+                result.extend((node,leaf) for leaf,flags in node.flags.items() if flags.get('keyable') and not flags.get('lock')
+                              and (leaf not in node.inputs or is_type(node.inputs[leaf][0].type,'animCurve')))
+        return result
+
+    def insert_keys(self,curve,times,values):
+        # a. New keys replace the existing keys within their time range, like MFnAnimCurve.addKeys()
+        times=[float(t) for t in times]
+        first,last=min(times),max(times)
+        keys=[key for key in curve.data['keys'] if key[0]<first or key[0]>last]
+        keys.extend([t,float(v)] for t,v in zip(times,values))
+        keys.sort()
+        self.dirty()
+        curve.data['keys']=keys
+        curve.data.pop('override',None)
+
+    def set_keyed(self,node,leaf,value):
+        # a. Like Maya, a keyed channel takes a new value until the time changes or the value gets keyed
+        if leaf in node.inputs and is_type(node.inputs[leaf][0].type,'animCurve'):
+            node.inputs[leaf][0].data['override']=[self.time,value]
+            return True
+        return False
+
+    def currentTime(self,*args,**kwargs):
+        if kwargs.get('q',kwargs.get('query',False)):
+            return self.time
+        self.time=float(args[0] if args else kwargs.get('e',kwargs.get('edit')))
+        return self.time
+
+    def setKeyframe(self,*args,**kwargs):
+        times=kwargs.get('t',kwargs.get('time',self.time))
+        times=list(times) if isinstance(times,(list,tuple)) else [times]
+        value=kwargs.get('v',kwargs.get('value'))
+        count=0
+        for node,leaf in self.keyed_leaves(args,kwargs):
+            for t in times:
+                key_value=value if value is not None else self.getAttr(node.name+'.'+leaf,time=t)
+                self.insert_keys(self.anim_curve(node,leaf),[t],[key_value])
+                count+=1
+        return count
+
+    def setKeys(self,plug,times,values):
+        # a. Batched form of setKeyframe over many frames of one plug
+        node,attr=self.plug(plug)
+        for index,leaf in enumerate(self.leaves(node,attr)):
+            leaf_values=values if len(self.leaves(node,attr))==1 else [value[index] for value in values]
+            self.insert_keys(self.anim_curve(node,leaf),times,leaf_values)
+        return len(times)
+
+    def keyframe(self,*args,**kwargs):
+        # a. Query only: key times (tc), values (vc) or count (kc) of the keyed leaves, optionally within t=(start,end)
+        first,last=kwargs.get('t',kwargs.get('time',(None,None)))
+        keys=[]
+        for node,leaf in self.keyed_leaves(args,kwargs):
+            if leaf in node.inputs and is_type(node.inputs[leaf][0].type,'animCurve'):
+                keys.extend(key for key in node.inputs[leaf][0].data['keys']
+                            if (first is None or key[0]>=first) and (last is None or key[0]<=last))
+        if kwargs.get('kc',kwargs.get('keyframeCount',False)):
+            return len(keys)
+        if kwargs.get('vc',kwargs.get('valueChange',False)):
+            return [key[1] for key in keys] or None
+        return [key[0] for key in keys] or None
+
+    def worldMatrices(self,nodes,times):
+        # a. Batched form of getAttr(node+'.worldMatrix',time=t): one flat matrix per node per time
+        nodes=[self.node(name) for name in nodes]
+        current=self.time
+        try:
+            result=[]
+            for t in times:
+                self.time=float(t)
+                result.append([flatten(self.world_matrix(node)) for node in nodes])
+            return result
+        finally:
+            self.time=current
+
+    def getAttrs(self,plugs,times):
+        # a. Batched form of getAttr(plug,time=t) for single-value plugs: one row of values per time
+        leaves=[self.plug(plug) for plug in plugs]
+        current=self.time
+        try:
+            result=[]
+            for t in times:
+                self.time=float(t)
+                result.append([self.read(node,attr) for node,attr in leaves])
+            return result
+        finally:
+            self.time=current
+
+    #-------------- session ------------------
+
+    def undoInfo(self,openChunk=False,closeChunk=False,chunkName='',q=False,query=False,state=False,st=False,**kwargs):
+        # a. Nothing is undone in the in-memory scene, only the chunks are tracked; the undo queue reads as off
+        if openChunk:
+            self.undo_chunks.append(chunkName)
+        elif closeChunk and self.undo_chunks:
+            self.undo_chunks.pop()
+        if (q or query) and (state or st):
+            return False
+        return len(self.undo_chunks) if (q or query) else None
+
+    #-------------- callbacks ----------------
+
+    def addNodeAddedCallback(self,function):
+        # a. Like OpenMaya.MDGMessage.addNodeAddedCallback: function(node) for every node created from now on
+        callback=max(self.node_added or [0])+1
+        self.node_added[callback]=function
+        return callback
+
+    def removeCallback(self,callback):
+        self.node_added.pop(callback,None)
+
+    def nodeNames(self,nodes):
+        # a. The current names of the given nodes that still exist, found after a rename like an MObjectHandle
+        return [node.name for node in nodes if self.nodes.get(node.name) is node]
+
+    def refresh(self,suspend=None,su=None,**kwargs):
+        suspend=suspend if suspend is not None else su
+        if suspend is not None:
+            self.refresh_suspended=bool(suspend)
+
+    def evaluationManager(self,q=False,query=False,mode=None,**kwargs):
+        if q or query:
+            return [self.evaluation_mode]
+        if mode is not None:
+            self.evaluation_mode=mode
+
+    #-------------- scene files --------------
+
+    def file(self,path=None,open=False,o=False,force=False,f=False,rename=None,save=False,s=False,new=False,
+             q=False,query=False,sn=False,sceneName=False,type=None,**kwargs):
+        if q or query:
+            return self.scene_name
+        if new:
+            self.__init__()
+            return ''
+        if rename:
+            self.scene_name=rename
+            return rename
+        if open or o:
+            self.load(path)
+            self.scene_name=path
+            return path
+        if save or s:
+            self.save(self.scene_name)
+            return self.scene_name
+
+    def save(self,path):
+        with _open(path,'w') as f:
+            json.dump(self.to_data(),f)
+
+    def load(self,path):
+        with _open(path) as f:
+            self.from_data(json.load(f))
+
+    def to_data(self):
+        nodes=[]
+        for node in self.nodes.values():
+            nodes.append({'name':node.name,'type':node.type,'parent':node.parent.name if node.parent is not None else None,
+                          'values':node.values,'flags':node.flags,'compounds':node.compounds,'dynamic':node.dynamic,
+                          'cvs':node.cvs,'data':node.data,
+                          'inputs':dict((attr,[src.name,src_attr]) for attr,(src,src_attr) in node.inputs.items())})
+        return {'nodes':nodes,'time':self.time}
+
+    def from_data(self,data):
+        self.__init__()
+        self.time=data.get('time',1.0)
+        for item in data['nodes']:
+            node=Node(item['name'],item['type'])
+            node.values=item['values']
+            node.flags=item['flags']
+            node.compounds=item['compounds']
+            node.children_of=dict((child,attr) for attr,children in node.compounds.items() for child in children)
+            node.dynamic=item['dynamic']
+            node.cvs=item['cvs']
+            node.data=item['data']
+            self.nodes[node.name]=node
+        for item in data['nodes']:
+            node=self.nodes[item['name']]
+            if item['parent']:
+                self.reparent(node,self.nodes[item['parent']])
+        for item in data['nodes']:
+            for attr,(src,src_attr) in item['inputs'].items():
+                self.connect(self.nodes[src],src_attr,self.nodes[item['name']],attr)
+
+_open=open
+
+#----------------------------------------
+#            Curve Helpers
+#----------------------------------------
+
+def circle_cvs(normal,radius=1.0,sections=8,degree=3):
+    # a. Points on a circle perpendicular to the normal; degree 1 circles are closed by repeating the first point
+    normal=[float(v) for v in normal]
+    length=math.sqrt(sum(v*v for v in normal)) or 1.0
+    normal=[v/length for v in normal]
+    helper=[0.0,0.0,1.0] if abs(normal[2])<0.9 else [1.0,0.0,0.0]
+    u=cross(normal,helper)
+    u_length=math.sqrt(sum(v*v for v in u))
+    u=[v/u_length for v in u]
+    w=cross(normal,u)
+    points=[]
+    for i in range(sections):
+        angle=2.0*math.pi*i/sections
+        points.append([radius*(math.cos(angle)*u[axis]+math.sin(angle)*w[axis]) for axis in range(3)])
+    if degree==1:
+        points.append(list(points[0]))
+    return points
+
+def cross(a,b):
+    return [a[1]*b[2]-a[2]*b[1],a[2]*b[0]-a[0]*b[2],a[0]*b[1]-a[1]*b[0]]
+
+def cv_indices(component,count):
+    match=re.match(r'cv\[(\d+)(?::(\d+))?\]',component)
+    if not match:
+        return list(range(count))
+    first=int(match.group(1))
+    last=int(match.group(2)) if match.group(2) else first
+    return [i for i in range(first,last+1) if i<count]
+
+#----------------------------------------
+#          Node Evaluation (DG)
+#----------------------------------------
+
+def _anim_curve(scene,node):
+    # a. Linear between keys, constant before the first and after the last key
+    override=node.data.get('override')
+    if override and override[0]==scene.time:
+        return {'output':override[1]}
+    keys=node.data.get('keys') or [[0.0,node.values['output']]]
+    times=[key[0] for key in keys]
+    index=bisect.bisect_right(times,scene.time)
+    if index==0:
+        return {'output':keys[0][1]}
+    if index==len(keys):
+        return {'output':keys[-1][1]}
+    (t0,v0),(t1,v1)=keys[index-1],keys[index]
+    return {'output':v0+(v1-v0)*(scene.time-t0)/(t1-t0)}
+
+def _blend_colors(scene,node):
+    blender=scene.read(node,'blender')
+    color1=scene.read_vector(node,'color1')
+    color2=scene.read_vector(node,'color2')
+    output=[a*blender+b*(1.0-blender) for a,b in zip(color1,color2)]
+    return dict(zip(node.compounds['output'],output))
+
+def _condition(scene,node):
+    first,second=scene.read(node,'firstTerm'),scene.read(node,'secondTerm')
+    operation=scene.read(node,'operation')
+    passed=[first==second,first!=second,first>second,first>=second,first<second,first<=second][operation]
+    color=scene.read_vector(node,'colorIfTrue' if passed else 'colorIfFalse')
+    return dict(zip(node.compounds['outColor'],color))
+
+def _set_range(scene,node):
+    # a. Each axis remapped from oldMin..oldMax to min..max, clamped to the range
+    output=[]
+    for value,low,high,old_low,old_high in zip(*[scene.read_vector(node,attr) for attr in ('value','min','max','oldMin','oldMax')]):
+        weight=min(1.0,max(0.0,(value-old_low)/(old_high-old_low))) if old_high!=old_low else 0.0
+        output.append(low+(high-low)*weight)
+    return dict(zip(node.compounds['outValue'],output))
+
+def _multiply_divide(scene,node):
+    input1=scene.read_vector(node,'input1')
+    input2=scene.read_vector(node,'input2')
+    operation=scene.read(node,'operation')
+    if operation==2:
+        output=[a/b if b else 0.0 for a,b in zip(input1,input2)]
+    elif operation==3:
+        output=[a**b for a,b in zip(input1,input2)]
+    elif operation==0:
+        output=input1
+    else:
+        output=[a*b for a,b in zip(input1,input2)]
+    return dict(zip(node.compounds['output'],output))
+
+def _target_matrices(scene,node):
+    return [unflatten(scene.read(node,attr)) for attr in sorted(node.values) if attr.startswith('target[') and attr.endswith('.targetWorldMatrix')]
+
+def _driven(node):
+    return node.parent
+
+def _constraint_local(scene,node,world):
+    driven=_driven(node)
+    return scene.local_from_world(driven,world)
+
+def _target_offset(scene,node):
+    # a. The offset matrix is composed again only when the offset values change
+    values=tuple(node.values[leaf] for attr in ('target[0].targetOffsetTranslate','target[0].targetOffsetRotate') for leaf in node.compounds[attr])
+    if node.data.get('offset_values')!=values:
+        node.data['offset_values']=values
+        node.data['offset']=compose(values[:3],values[3:],[1.0,1.0,1.0])
+    return node.data['offset']
+
+def _parent_constraint(scene,node):
+    world=mult(_target_offset(scene,node),_target_matrices(scene,node)[0])
+    translate,rotate,scale=_constraint_local(scene,node,world)
+    return dict(list(zip(node.compounds['constraintTranslate'],translate))+list(zip(node.compounds['constraintRotate'],rotate)))
+
+def _orient_constraint(scene,node):
+    target=_target_matrices(scene,node)[0]
+    world=mult(rotation_only(_target_offset(scene,node)),rotation_only(target))
+    world[3][:3]=scene.world_pivot(_driven(node))
+    rotate=_constraint_local(scene,node,world)[1]
+    return dict(zip(node.compounds['constraintRotate'],rotate))
+
+def _aim_constraint(scene,node):
+    driven=_driven(node)
+    targets=_target_matrices(scene,node)
+    position=scene.world_pivot(driven)
+    aim_at=[sum(m[3][axis] for m in targets)/len(targets) for axis in range(3)]
+    # a. World up: scene Y, or an up vector in the space of the world up object
+    world_up=[float(v) for v in node.data.get('worldUpVector',(0.0,1.0,0.0))]
+    if node.data.get('worldUpType') in ('objectrotation','objectRotation') and node.data.get('worldUpObject') in scene.nodes:
+        rot=rotation_only(scene.world_matrix(scene.nodes[node.data['worldUpObject']]))
+        world_up=[sum(world_up[i]*rot[i][j] for i in range(3)) for j in range(3)]
+    rotate=aim_rotation([a-p for a,p in zip(aim_at,position)],world_up,node.data.get('aim',(1.0,0.0,0.0)),node.data.get('up',(0.0,1.0,0.0)))
+    world=compose(position,rotate,[1.0,1.0,1.0])
+    rotate=_constraint_local(scene,node,world)[1]
+    return dict(zip(node.compounds['constraintRotate'],rotate))
+
+def _pole_vector_constraint(scene,node):
+    handle=_driven(node)
+    pole=_target_matrices(scene,node)[0][3][:3]
+    start=handle.inputs.get('startJoint')
+    origin=scene.world_pivot(start[0]) if start else scene.world_pivot(handle)
+    return dict(zip(node.compounds['constraintTranslate'],[p-o for p,o in zip(pole,origin)]))
+
+def _normalize(v):
+    length=math.sqrt(sum(x*x for x in v)) or 1.0
+    return [x/length for x in v]
+
+def aim_rotation(direction,world_up,aim,up):
+    # a. Rotation (XYZ degrees) turning the local aim axis onto the direction, with the up axis towards world up
+    a=_normalize(direction)
+    dot=sum(x*y for x,y in zip(world_up,a))
+    u=_normalize([w-dot*x for w,x in zip(world_up,a)])
+    local_aim=_normalize([float(v) for v in aim])
+    local_up=_normalize([float(v) for v in up])
+    local=[local_aim,local_up,cross(local_aim,local_up)]
+    world=[a,u,cross(a,u)]
+    # b. R = local^T * world, both bases being orthonormal
+    rot=[[sum(local[k][i]*world[k][j] for k in range(3)) for j in range(3)]+[0.0] for i in range(3)]+[[0.0,0.0,0.0,1.0]]
+    return matrix_to_euler(rot)
+
+def _dot(a,b):
+    return sum(x*y for x,y in zip(a,b))
+
+def _length(v):
+    return math.sqrt(_dot(v,v))
+
+def _rotation_about(axis,angle):
+    # a. Row vector rotation by angle (radians) about a unit axis, right-handed: v' = v * R
+    x,y,z=axis
+    c,s=math.cos(angle),math.sin(angle)
+    rows=[[c+(1.0-c)*x*x,(1.0-c)*x*y+s*z,(1.0-c)*x*z-s*y],
+          [(1.0-c)*y*x-s*z,c+(1.0-c)*y*y,(1.0-c)*y*z+s*x],
+          [(1.0-c)*z*x+s*y,(1.0-c)*z*y-s*x,c+(1.0-c)*z*z]]
+    return [row+[0.0] for row in rows]+[[0.0,0.0,0.0,1.0]]
+
+def _turn(vector,matrix):
+    return [sum(vector[k]*matrix[k][j] for k in range(3)) for j in range(3)]
+
+def _signed_angle(a,b,axis):
+    return math.atan2(_dot(cross(a,b),axis),_dot(a,b))
+
+def _perpendicular(vector,axis):
+    # a. The unit part of a vector perpendicular to a unit axis, any perpendicular when the vector is along the axis
+    rest=[v-a*_dot(vector,axis) for v,a in zip(vector,axis)]
+    if _dot(rest,rest)<1e-16:
+        rest=cross(axis,[1.0,0.0,0.0] if abs(axis[0])<0.9 else [0.0,1.0,0.0])
+    return _normalize(rest)
+
+def rotate_plane(shoulder,elbow,wrist,shoulder_rest,elbow_rest,target,pole,twist):
+    # a. A two-bone ikRPsolver solve as a sequence of rotations: aim the chain at the target, turn it about the handle
+    #    vector into the plane of the pole vector and the twist (degrees), then bend the shoulder and the elbow in that
+    #    plane until the wrist is on the target. Rest rotations and the results are world rotations (4x4).
+    upper_bone=[e-s for e,s in zip(elbow,shoulder)]
+    upper,lower=_length(upper_bone),_length([w-e for w,e in zip(wrist,elbow)])
+    reach=[t-s for t,s in zip(target,shoulder)]
+    axis=_normalize(reach)
+    distance=min(max(_length(reach),abs(upper-lower)+1e-8),upper+lower)
+    rest_axis=_normalize([w-s for w,s in zip(wrist,shoulder)])
+    hinge=_perpendicular(cross(rest_axis,axis),rest_axis)
+    aim=_rotation_about(hinge,_signed_angle(rest_axis,axis,hinge))
+    # b. Turn about the handle vector until the upper bone is in the plane of the pole vector, turned by the twist
+    bone=_turn(upper_bone,aim)
+    want=_turn(_perpendicular([p-s for p,s in zip(pole,shoulder)],axis),_rotation_about(axis,math.radians(twist)))
+    plane=_rotation_about(axis,_signed_angle(_perpendicular(bone,axis),want,axis))
+    bone=_turn(bone,plane)
+    # c. Lift the upper bone to the angle of the law of cosines, then bend the elbow until the wrist is on the target
+    normal=_normalize(cross(axis,want))
+    cos_angle=(upper*upper+distance*distance-lower*lower)/(2.0*upper*distance)
+    direction=[cos_angle*a+math.sqrt(max(1.0-cos_angle*cos_angle,0.0))*w for a,w in zip(axis,want)]
+    lift=_rotation_about(normal,_signed_angle(bone,direction,normal))
+    chain=mult(mult(aim,plane),lift)
+    elbow_now=_turn(upper_bone,chain)
+    wrist_now=_turn([w-s for w,s in zip(wrist,shoulder)],chain)
+    bend=_rotation_about(normal,_signed_angle([w-e for w,e in zip(wrist_now,elbow_now)],
+                                              [distance*a-e for a,e in zip(axis,elbow_now)],normal))
+    return mult(shoulder_rest,chain),mult(mult(elbow_rest,chain),bend)
+
+COMPUTE={'animCurveTL':_anim_curve,'animCurveTA':_anim_curve,'animCurveTU':_anim_curve,
+         'blendColors':_blend_colors,'condition':_condition,'multiplyDivide':_multiply_divide,'setRange':_set_range,
+         'parentConstraint':_parent_constraint,'orientConstraint':_orient_constraint,
+         'aimConstraint':_aim_constraint,'poleVectorConstraint':_pole_vector_constraint}
+
+OUTPUTS={'animCurveTL':('output',),'animCurveTA':('output',),'animCurveTU':('output',),
+         'blendColors':('outputR','outputG','outputB'),
+         'condition':('outColorR','outColorG','outColorB'),
+         'multiplyDivide':('outputX','outputY','outputZ'),
+         'setRange':('outValueX','outValueY','outValueZ'),
+         'parentConstraint':('constraintTranslateX','constraintTranslateY','constraintTranslateZ',
+                             'constraintRotateX','constraintRotateY','constraintRotateZ'),
+         'orientConstraint':('constraintRotateX','constraintRotateY','constraintRotateZ'),
+         'aimConstraint':('constraintRotateX','constraintRotateY','constraintRotateZ'),
+         'poleVectorConstraint':('constraintTranslateX','constraintTranslateY','constraintTranslateZ')}
+
+#----------------------------------------
+#         Sample Arm Skeleton
+#----------------------------------------
+
+def create_arm_skeleton(scene,side='L',offset=(0.0,0.0,0.0)):
+    # a. clavicle > shoulder > elbow > (forearm, wrist > (palm > fingers, thumb)), the layout create_joints() expects
+    sign=1.0 if side.startswith('L') else -1.0
+    ox,oy,oz=offset
+
+    def at(x,y,z):
+        return (ox+sign*x,oy+y,oz+z)
+
+    scene.select(cl=True)
+    scene.joint(name=side+'_clavicle',p=at(3.0,140.0,2.0))
+    shoulder=scene.joint(name=side+'_shoulder',p=at(15.0,140.0,0.0))
+    elbow=scene.joint(name=side+'_elbow',p=at(42.0,140.0,-3.0))
+    scene.joint(name=side+'_forearm',p=at(55.0,140.0,-1.5))
+    scene.select(elbow)
+    scene.joint(name=side+'_wrist',p=at(68.0,140.0,0.0))
+    palm=scene.joint(name=side+'_palm',p=at(74.0,140.0,0.0))
+    for finger,z in (('index',3.0),('middle',1.0),('ring',-1.0),('pinky',-3.0)):
+        scene.select(palm)
+        for i in range(3):
+            scene.joint(name='%s_%s%d' % (side,finger,i+1),p=at(78.0+i*3.0,140.0,z))
+    scene.select(side+'_wrist')
+    for i in range(3):
+        scene.joint(name='%s_thumb%d' % (side,i+1),p=at(70.0+i*3.0,138.0,5.0))
+    scene.select(cl=True)
+    return shoulder
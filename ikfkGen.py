@@ -7,36 +7,64 @@ Last Edited on July 7, 2017
 - Search key word is 'palm' instead of 'hand'
 '''
 
-import maya.cmds as cmds
+# maya.cmds inside Maya, the in-memory scene of ikfkFakeScene.py anywhere else
+import numpy as np
+
+from ikfkBackend import cmds
+import ikfkBake
+import ikfkChannels
+import ikfkLinks
+import ikfkLive
+import ikfkMatch
+import ikfkMirror
+import ikfkPoleVector
+import ikfkRoles
+import ikfkShapes
+import ikfkTemplate
+import ikfkTransaction
+import ikfkUpdate
+
+# Switch network styles: 'classic' blendColors and condition nodes with a constrained switch control, 'lean' one shared
+# setRange for the visibility and the switch control held below the shoulder's parent through its offsetParentMatrix
+NETWORKS=('classic','lean')
+# FK drive styles: 'constraint' a parentConstraint per FK joint, 'direct' the control's rotate connected to the joint's
+# (an fk shoulder below a parent keeps its constraint, so the chain stays in the space of the controls)
+FK_DRIVES=('constraint','direct')
+# Chain extractions: 'duplicate' copies the whole arm and deletes the forearm and hand joints, 'selective' creates the
+# shoulder, elbow and wrist joints only
+EXTRACTIONS=('duplicate','selective')
+# The joint attributes a selective extraction copies from the source joints, where they exist
+JOINT_ATTRS=('translate','rotate','scale','jointOrient','rotateAxis','preferredAngle','rotateOrder','radius','segmentScaleCompensate')
 
 #-------------------------------------------
 #  Add IK Controls to the IK Joint Chain
 #-------------------------------------------  
-def ik_generator(ikShoulder):    
+def ik_generator(ikShoulder,channels=None,roles=None):    
+    # To collect the channels to lock and hide, they are applied in one batch at the end
+    batch=channels if channels is not None else ikfkChannels.ChannelBatch()
+    # To look the joints up by role, the chain is only walked when no index is passed in
+    if roles is None:
+        roles=ikfkRoles.JointRoleIndex().scan('IK',ikShoulder[0])
     # a. To generate an ikHandle for the shoulder - wrist joint 
-    for child in cmds.listRelatives(ikShoulder[0],ad=True,type='joint'):        
-        # a.2 Then to select the wrist joint
-        if 'wrist' in child.lower():    
-            cmds.select(child,add=True)
-            wrist_joint=child
-        elif 'elbow' in child.lower():
-            elbow_joint=child
-        # a.3 to check if there are still any extra joints not being deleted before    
-        else:
-            cmds.delete(child)    
-            cmds.warning('Extra joints are deleted.')       
-    # a.4 To generate an ikHandle based on selection    
-    ik_handle=cmds.ikHandle(sol='ikRPsolver',n=wrist_joint+'_Handle')
+    # a.2 The wrist joint ends the chain
+    wrist_joint=roles.joint('wrist','IK')
+    elbow_joint=roles.joint('elbow','IK')
+    # a.1 The joint positions size the control and place the pole vector
+    positions=[cmds.xform(jnt,q=True,ws=True,t=True) for jnt in (ikShoulder[0],elbow_joint,wrist_joint)]
+    # a.3 to check if there are still any extra joints not being deleted before    
+    for child in roles.extras('IK'):
+        cmds.delete(child)    
+        roles.remove('IK',child)
+        cmds.warning('Extra joints are deleted.')       
+    # a.4 To generate an ikHandle from the ik shoulder to the wrist, whatever else is selected
+    ik_handle=cmds.ikHandle(sj=ikShoulder[0],ee=wrist_joint,sol='ikRPsolver',n=wrist_joint+'_Handle')
 	
     # b. To generate a control for the ikHandle  
-    # b.1 To generate a nerb circle, and put it in a group.
-    ik_control=cmds.circle(n=wrist_joint+'_Ctrl',nr=[1,0,0],degree=1,sections=4,ch=0)
+    # b.1 To generate a square control sized by the forearm, and put it in a group.
+    ik_control=ikfkShapes.create(wrist_joint+'_Ctrl','square',ikfkShapes.control_size('ik',ikfkShapes.bone_lengths(*positions)))
     ik_group=cmds.group(ik_control[0],name=ik_control[0]+'Grp')
     # b.2 To match transform
     cmds.matchTransform(ik_group,wrist_joint)
-    # b.3 To freeze the scale
-    cmds.scale(4,4,4,ik_control)
-    cmds.makeIdentity(ik_control,a=True,s=True,n=0,pn=True)
     # b.4 To orient constrain the wrist joint and the control
     cmds.orientConstraint(ik_control,wrist_joint,weight=1)
     # b.5 To parent the ik handle with the control
@@ -44,38 +72,25 @@ def ik_generator(ikShoulder):
     # b.6 To hide the ik handle
     cmds.setAttr(ik_handle[0]+'.v',False)
     # b.7 To lock and hide scale attributes
-    cmds.setAttr(ik_control[0]+'.sx',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(ik_control[0]+'.sy',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(ik_control[0]+'.sz',lock=True,keyable=False,channelBox=False)
+    batch.add(ik_control,ikfkChannels.IK_CONTROL)
     
     # c. To set up a pole vector    
-    # c.1 To set up a locator with constraints
-    pole_vec=cmds.spaceLocator(name=elbow_joint+'_PoleVec')
-    cmds.matchTransform(pole_vec,elbow_joint,position=True)    
-    cmds.aimConstraint(ikShoulder[0],wrist_joint,pole_vec,aim=[0.0,0.0,1.0])
-    cmds.delete(pole_vec,constraints=True)    
-    # c.2 To place the locator to the right position    
-    # c.2.1 To determine the distance between the pole vector and the elbow joint
-    wrist_pos=cmds.joint(wrist_joint,q=True,p=True)
-    move_distance=abs(wrist_pos[0])*(-0.5)
-    # c.2.2 To put the locator in a group
+    # c.1 To compute its transform from the joint positions: off the elbow, in the plane of the chain
+    pole_matrix=ikfkPoleVector.pole_vector_matrix(*positions)
+    # c.2 To create the group at the right position and the locator directly in it
     pole_vecGrp=cmds.group(em=True,name=elbow_joint+'_PoleVectorGrp')
-    # c.2.3 To place the locator at the right position
-    cmds.move(0,0,move_distance,pole_vec,r=True,os=True)
-    cmds.matchTransform(pole_vecGrp,pole_vec)
-    # c.2.4 To make the locator a pole vector
+    cmds.xform(pole_vecGrp,ws=True,m=pole_matrix)
+    pole_vec=cmds.spaceLocator(name=elbow_joint+'_PoleVec')
+    # c.3 The transform values of the pole vector stay cleared out
+    cmds.parent(pole_vec,pole_vecGrp,r=True)
+    # c.4 To make the locator a pole vector
     cmds.poleVectorConstraint(pole_vec,ik_handle[0])
-    # c.3 To clear out the transform values of the pole vector
-    cmds.parent(pole_vec,pole_vecGrp)
-    # c.4 To hide the ik shoulder chain
+    # c.5 To hide the ik shoulder chain
     cmds.setAttr(ikShoulder[0]+'.v',False)
     # c.6 To hide rotation and scale attributes of the pole vector
-    cmds.setAttr(pole_vec[0]+'.rx',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(pole_vec[0]+'.ry',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(pole_vec[0]+'.rz',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(pole_vec[0]+'.sx',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(pole_vec[0]+'.sy',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(pole_vec[0]+'.sz',lock=True,keyable=False,channelBox=False)
+    batch.add(pole_vec,ikfkChannels.POLE_VECTOR)
+    if channels is None:
+        batch.apply()
     # c.7 To pass the variables to the main part
     return pole_vec,ik_control
 
@@ -84,133 +99,132 @@ def ik_generator(ikShoulder):
 #  Add FK Controls to the FK Joint Chain
 #----------------------------------------    
   
-def fk_generator(fkShoulder,fk_locator):
+def fk_generator(fkShoulder,channels=None,roles=None,fk_drive='constraint'):
+    batch=channels if channels is not None else ikfkChannels.ChannelBatch()
+    if roles is None:
+        roles=ikfkRoles.JointRoleIndex().scan('FK',fkShoulder[0])
     # a. To store the fk shoulder joint and all its descendents into an array
-    cmds.select(fkShoulder[0],r=True)
-    for child in cmds.listRelatives(fkShoulder[0],ad=True,type='joint'):
-        cmds.select(child,add=True)    
-    selection=cmds.ls(sl=True,type='joint')
+    selection=roles.joints('FK')
     # b. To generate controls for each joint in the array
     # b.1 To set up an array to store all the controls
     fkGroups=[]
+    fkControls={}
+    fkCtrlGroups={}
+    # b.1.1 The controls are sized by the bones of the arm
+    lengths=ikfkShapes.bone_lengths(*[cmds.xform(roles.joint(role,'FK'),q=True,ws=True,t=True) for role in ikfkRoles.ROLES])
+    shoulderParent=roles.root_parent('FK')
         
     for jnt in selection: 
-        # b.2 To create a nerb circle with proper name
-        fk_control=cmds.circle(name=jnt+'_Ctrl',nr=[1,0,0],ch=0)
+        # b.2 To create a circle control with proper name, at its final size
+        role=roles.role(jnt,'FK')
+        fk_control=ikfkShapes.create(jnt+'_Ctrl','circle',ikfkShapes.control_size(role,lengths))
         # b.2.1 To lock all the translate and scale values for the circle
-        cmds.setAttr(fk_control[0]+'.tx',lock=True,keyable=False,channelBox=False)
-        cmds.setAttr(fk_control[0]+'.ty',lock=True,keyable=False,channelBox=False)
-        cmds.setAttr(fk_control[0]+'.tz',lock=True,keyable=False,channelBox=False)
-        cmds.setAttr(fk_control[0]+'.sx',lock=True,keyable=False,channelBox=False)
-        cmds.setAttr(fk_control[0]+'.sy',lock=True,keyable=False,channelBox=False)
-        cmds.setAttr(fk_control[0]+'.sz',lock=True,keyable=False,channelBox=False)
-        
-        
-        if 'shoulder' in jnt.lower():
-            cmds.select(fk_control[0]+'.cv[0:7]',r=True)
-            cmds.scale(10,10,10)
-        elif 'elbow' in jnt.lower():
-            cmds.select(fk_control[0]+'.cv[0:7]',r=True)
-            cmds.scale(7,7,7)              
-        else:
-            cmds.select(fk_control[0]+'.cv[0:7]',r=True)
-            cmds.scale(3.8,3.8,3.8)  
+        batch.add(fk_control,ikfkChannels.FK_CONTROL)
         # b.3 To generate a group for each circle with proper name
         grp=cmds.group(fk_control[0],name=fk_control[0]+'Grp')
         # b.3.1 To add the new group to the fkGroups so it can be returned later
         fkGroups.append(grp)
         cmds.matchTransform(grp,jnt)
         # b.4 To parent constrain the joint to the nerb
-        cmds.parentConstraint(fk_control[0],jnt)
+        if fk_drive=='direct' and direct_driven(jnt,fkShoulder[0],shoulderParent):
+            direct_drive(fk_control[0],grp,jnt)
+        else:
+            cmds.parentConstraint(fk_control[0],jnt)
         # b.5 To parent the control group to its parent in the hierachy
-        if cmds.listRelatives(jnt,p=True):
-            parentJnt=cmds.listRelatives(jnt,p=True)
-            if cmds.objExists((parentJnt[0]+'_Ctrl')):
-                cmds.parent(grp,(parentJnt[0]+'_Ctrl'))
-        if cmds.listRelatives(jnt,c=True,type='joint'):
-            for child in cmds.listRelatives(jnt,c=True,type='joint'):
-                if cmds.objExists(child+'_CtrlGrp'):
-                    cmds.parent((child+'_CtrlGrp'),fk_control) 
-    # c. To set up the fk locator pole vector for ik/fk match  
-    for jnt in selection:
-        # c.1 To store the fk elbow joint into a variable           
-        if 'elbow' in jnt.lower():    
-            fk_elbow=jnt
-    # c.2 To set up a group at the fk shoulder joint      
-    shoulderGrp=cmds.group(em=True,name=fkShoulder[0]+'PoleVecGroup')
-    cmds.matchTransform(shoulderGrp,fkShoulder[0])
-    # c.3 To set up a group at the fk elbow joint
-    elbowGrp=cmds.group(em=True,name=fk_elbow+'PoleVecGroup')
-    cmds.matchTransform(elbowGrp,fk_elbow)
-    # c.4 To parent the groups 
-    cmds.parent(elbowGrp,shoulderGrp)
-    cmds.parent(fk_locator,elbowGrp)
-    # c.5 To parent constraint the shoulder group to the shoulder. So the entire group moves when the shoulder rotates
-    cmds.parentConstraint(fkShoulder[0],shoulderGrp)
-    # c.6 To make it rotates when the elbow joint rotates
-    rotMultiply=cmds.shadingNode('multiplyDivide',name=fk_elbow+'multiply',asUtility=True)    
-    cmds.connectAttr(fk_elbow+'.rotateZ',rotMultiply+'.input1X',f=True)
-    cmds.setAttr(rotMultiply+'.input2X',0.5)
-    cmds.connectAttr(rotMultiply+'.outputX',elbowGrp+'.rotateZ')
-    
+        parentJnt=roles.parent(jnt,'FK')
+        if parentJnt in fkControls:
+            cmds.parent(grp,fkControls[parentJnt])
+        for child in roles.children(jnt,'FK'):
+            if child in fkCtrlGroups:
+                cmds.parent(fkCtrlGroups[child],fk_control) 
+        fkControls[jnt]=fk_control[0]
+        fkCtrlGroups[jnt]=grp
+    # c. The fk pole vector for ik/fk match is computed from the fk chain when matching, no helper rig is built
     cmds.setAttr(fkShoulder[0]+'.v',False)
+    if channels is None:
+        batch.apply()
     
     return fkGroups    
 
+def direct_driven(jnt,fk_shoulder,shoulderParent):
+    # a. A rotate connection gives the pose of the constraint wherever the joint's parent stays with its control: the
+    #    elbow and wrist below the fk shoulder, and a shoulder without a parent. A shoulder below a clavicle would
+    #    follow the clavicle while its control stays, so it keeps the parentConstraint.
+    return jnt!=fk_shoulder or not shoulderParent
+
+def direct_drive(fk_control,grp,jnt):
+    # a. The group takes the joint's frame without its rotate values and the control takes them instead, so the
+    #    control's rotate is the joint's rotate in any pose and a plain connection replaces the constraint
+    rest=cmds.getAttr(jnt+'.rotate')[0]
+    if any(rest):
+        joint_world=np.reshape(cmds.xform(jnt,q=True,ws=True,m=True),(4,4))
+        rotation=np.identity(4)
+        rotation[:3,:3]=ikfkBake.euler_to_matrix(rest)
+        frame=np.matmul(np.linalg.inv(rotation),joint_world)
+        cmds.xform(grp,ws=True,m=[float(value) for value in frame.ravel()])
+        cmds.setAttr(fk_control+'.rotate',*rest)
+    cmds.connectAttr(fk_control+'.rotate',jnt+'.rotate')
+
 #----------------------------------------
 #         Generate IK&FK Switch
 #----------------------------------------
 
-def switch_generator(sel,fkShoulder,ikShoulder,fkGroups,pole_vecCtrl,ik_Ctrl):    
-    # a. To create a nerb shape
-    switch_control=cmds.circle(n='IK/FK_Switch_Ctrl',nr=[0,1,0],degree=1,sections=4,ch=0)
+def switch_generator(sel,fkShoulder,ikShoulder,fkGroups,pole_vecCtrl,ik_Ctrl,channels=None,roles=None,network='classic'):    
+    batch=channels if channels is not None else ikfkChannels.ChannelBatch()
+    if roles is None:
+        roles=ikfkRoles.JointRoleIndex()
+        for chain,root in (('original',sel[0]),('FK',fkShoulder[0]),('IK',ikShoulder[0])):
+            roles.scan(chain,root)
+    # a. To create the switch shape, sized by the forearm
+    wrist_joint=roles.joint('wrist','original')
+    lengths=ikfkShapes.bone_lengths(*[cmds.xform(roles.joint(role,'original'),q=True,ws=True,t=True) for role in ikfkRoles.ROLES])
+    switch_control=ikfkShapes.create('IK/FK_Switch_Ctrl','switch',ikfkShapes.control_size('switch',lengths))
     # b. To place it near the original wrist joint    
-    for child in cmds.listRelatives(sel[0],ad=True,type='joint'):
-        if 'wrist' in child.lower():
-            cmds.matchTransform(switch_control,child)
-            wrist_joint=child
+    cmds.matchTransform(switch_control,wrist_joint)
                 
     cmds.move(0,2,0,switch_control,relative=True,os=True)  
-    cmds.scale(1.5,1,0.5,switch_control,r=True)       
     # c. To parent constrain the switch control with the original wrist joint
-    cmds.parentConstraint(wrist_joint,switch_control,maintainOffset=True)    
+    if network=='lean':
+        # c.1 Lean: the switch stays where it is below the parent of the shoulder, through its offsetParentMatrix. It
+        #     does not follow the wrist its ikFkSwitch blends, so the network has no switch - wrist cycle.
+        shoulder_parent=cmds.listRelatives(sel[0],p=True)
+        if shoulder_parent:
+            offset=cmds.xform(switch_control,q=True,ws=True,m=True)
+            cmds.connectAttr(shoulder_parent[0]+'.worldMatrix[0]',switch_control[0]+'.offsetParentMatrix')
+            cmds.xform(switch_control,ws=True,m=offset)
+    else:
+        cmds.parentConstraint(wrist_joint,switch_control,maintainOffset=True)    
     # d. To create a new attribute for the switch control
     cmds.select(switch_control,r=True)
     cmds.addAttr(ln='ikFkSwitch',at='float',min=0,max=1,dv=0.5)
     cmds.setAttr(switch_control[0]+'.ikFkSwitch',keyable=True)    
     # e. To lock and hide all other attributes
-    cmds.setAttr(switch_control[0]+'.tx',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(switch_control[0]+'.ty',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(switch_control[0]+'.tz',lock=True,keyable=False,channelBox=False) 
-    cmds.setAttr(switch_control[0]+'.rx',lock=True,keyable=False,channelBox=False)
-    cmds.setAttr(switch_control[0]+'.ry',lock=True,keyable=False,channelBox=False) 
-    cmds.setAttr(switch_control[0]+'.rz',lock=True,keyable=False,channelBox=False) 
-    cmds.setAttr(switch_control[0]+'.sx',lock=True,keyable=False,channelBox=False) 
-    cmds.setAttr(switch_control[0]+'.sy',lock=True,keyable=False,channelBox=False) 
-    cmds.setAttr(switch_control[0]+'.sz',lock=True,keyable=False,channelBox=False) 
-    cmds.setAttr(switch_control[0]+'.v',lock=True,keyable=False,channelBox=False)     
+    batch.add(switch_control,ikfkChannels.SWITCH_CONTROL)
     # f. To build connections between IK and FK 
     # f.1 To store all joints into variables
     fk_shoulder_jnt=fkShoulder[0]
-    for child in cmds.listRelatives(fkShoulder[0],ad=True,type='joint'):
-        if 'elbow' in child.lower():
-            fk_elbow_jnt=child
-        elif 'wrist' in child.lower():
-            fk_wrist_jnt=child
+    fk_elbow_jnt=roles.joint('elbow','FK')
+    fk_wrist_jnt=roles.joint('wrist','FK')
             
     ik_shoulder_jnt=ikShoulder[0]
-    for child in cmds.listRelatives(ikShoulder[0],ad=True,type='joint'):
-        if 'elbow' in child.lower():
-            ik_elbow_jnt=child
-        elif 'wrist' in child.lower():
-            ik_wrist_jnt=child
+    ik_elbow_jnt=roles.joint('elbow','IK')
+    ik_wrist_jnt=roles.joint('wrist','IK')
     
     orig_shoulder_jnt=sel[0]       
-    for child in cmds.listRelatives(sel[0],ad=True,type='joint'):
-        if 'elbow' in child.lower():
-            orig_elbow_jnt=child
-        elif 'wrist' in child.lower():
-            orig_wrist_jnt=child    
+    orig_elbow_jnt=roles.joint('elbow','original')
+    orig_wrist_jnt=roles.joint('wrist','original')
+    # f.2 To blend the original chain between them and let the switch drive the visibility
+    switch_network(switch_control,(orig_shoulder_jnt,orig_elbow_jnt,orig_wrist_jnt),(fk_shoulder_jnt,fk_elbow_jnt,fk_wrist_jnt),
+                   (ik_shoulder_jnt,ik_elbow_jnt,ik_wrist_jnt),fkGroups,pole_vecCtrl,ik_Ctrl,network)
+    if channels is None:
+        batch.apply()
+    return switch_control
+
+def switch_network(switch_control,orig_joints,fk_joints,ik_joints,fkGroups,pole_vecCtrl,ik_Ctrl,network='classic'):
+    # a. The shoulder, elbow and wrist joints of the original, FK and IK chains
+    orig_shoulder_jnt,orig_elbow_jnt,orig_wrist_jnt=orig_joints
+    fk_shoulder_jnt,fk_elbow_jnt,fk_wrist_jnt=fk_joints
+    ik_shoulder_jnt,ik_elbow_jnt,ik_wrist_jnt=ik_joints
 
     # f.2 To create blendColors node
     shoulder_blend=cmds.shadingNode('blendColors',name=orig_shoulder_jnt+'Blend',asUtility=True)
@@ -233,6 +247,9 @@ def switch_generator(sel,fkShoulder,ikShoulder,fkGroups,pole_vecCtrl,ik_Ctrl):
     cmds.connectAttr(wrist_blend+'.output',orig_wrist_jnt+'.rotate.')  
     
     # g. To let the IK/FK switch control the visibility of FK, Ik controls and joints
+    if network=='lean':
+        lean_visibility(switch_control,fkGroups,pole_vecCtrl,ik_Ctrl)
+        return
     vizFK_condition=cmds.shadingNode('condition',name='FK_Condition',asUtility=True)
     vizIK_condition=cmds.shadingNode('condition',name='IK_Condition',asUtility=True)    
     # g.1 To get all the control groups
@@ -247,46 +264,38 @@ def switch_generator(sel,fkShoulder,ikShoulder,fkGroups,pole_vecCtrl,ik_Ctrl):
     cmds.connectAttr(vizIK_condition+'.outColorR',pole_vecCtrl[0]+'.v')
     cmds.connectAttr(vizIK_condition+'.outColorR',ik_Ctrl[0]+'.v')
 
+def lean_visibility(switch_control,fkGroups,pole_vecCtrl,ik_Ctrl):
+    # a. One setRange drives both sides: X is 1 unless the switch is at 0 (FK), Y is 1 unless it is at 1 (IK)
+    viz_range=cmds.shadingNode('setRange',name='IKFK_Visibility',asUtility=True)
+    cmds.connectAttr(switch_control[0]+'.ikFkSwitch',viz_range+'.valueX')
+    cmds.connectAttr(switch_control[0]+'.ikFkSwitch',viz_range+'.valueY')
+    for attr,value in (('minX',0),('maxX',1),('oldMinX',0),('oldMaxX',0.001),
+                       ('minY',1),('maxY',0),('oldMinY',0.999),('oldMaxY',1)):
+        cmds.setAttr(viz_range+'.'+attr,value)
+    # b. The FK control groups are parented along the chain, only the top one needs the connection
+    fkControls=[fkgroup[:-len('Grp')] for fkgroup in fkGroups]
+    for fkgroup in fkGroups:
+        parent=cmds.listRelatives(fkgroup,p=True)
+        if not parent or parent[0] not in fkControls:
+            cmds.connectAttr(viz_range+'.outValueX',fkgroup+'.v')
+    cmds.connectAttr(viz_range+'.outValueY',pole_vecCtrl[0]+'.v')
+    cmds.connectAttr(viz_range+'.outValueY',ik_Ctrl[0]+'.v')
+
 
 #----------------------------------------
 #          Match Ik to FK
 #----------------------------------------
 def ikTofk(): 
     # a.1 To store a selection
-    if cmds.ls(sl=True):
-        selCtrl=cmds.ls(sl=True)
-        # a.2 To prevent multiple items from being selected
-        if len(selCtrl)==1:
-            if selCtrl[0].endswith('_IK_Ctrl') or selCtrl[0].endswith('_IK_PoleVec'):
-                # a.3 If the ik wrist control is selected
-                if selCtrl[0].endswith('_IK_Ctrl'): 
-                    # a.3.1 To match the wrist control to the fk wrist joint
-                    fkWrist=selCtrl[0].replace('_IK_Ctrl','_FK')
-                    cmds.matchTransform(selCtrl,fkWrist)
-                    # a.3.2 Then to match the ik pole vector to the fk pole vector
-                    fkElbow=cmds.listRelatives(fkWrist,p=True)
-                    ikElbowPoleVec=fkElbow[0].replace('_FK','_IK_PoleVec')
-                    fkElbowPoleVec=fkElbow[0]+'_PoleVec'
-                    cmds.matchTransform(ikElbowPoleVec,fkElbowPoleVec)
-                                        
-                # a.4 If the ik pole vector is selected
-                else: 
-                    # a.4.1 To match the pole vectors 
-                    fkElbowPoleVec=selCtrl[0].replace('_IK_PoleVec','_FK_PoleVec')
-                    cmds.matchTransform(selCtrl,fkElbowPoleVec)
-                    # a.4.2 To match the wrist control to the fk wrist joint
-                    ikElbow=selCtrl[0].replace('_PoleVec','')
-                    fkElbow=selCtrl[0].replace('_IK_PoleVec','_FK')
-                    fkWrist=cmds.listRelatives(fkElbow,c=True)
-                    ikWrist=cmds.listRelatives(ikElbow,c=True)
-                    ikWristCtrl=ikWrist[0]+'_Ctrl'
-                    cmds.matchTransform(ikWristCtrl,fkWrist[0])
-            else:
-                cmds.warning('Please select an IK control.')
-        else: 
-            cmds.warning('Please select only one control.')           
-    else:
+    selCtrl=cmds.ls(sl=True)
+    if not selCtrl:
         cmds.warning('Please select a control')
+    # a.2 A single control has to be an IK control
+    elif len(selCtrl)==1 and not (selCtrl[0].endswith('_IK_Ctrl') or selCtrl[0].endswith('_IK_PoleVec')):
+        cmds.warning('Please select an IK control.')
+    # a.3 The IK controls of every selected arm follow the fk chain in one undo chunk, then the ikFkSwitch goes to IK
+    elif not ikfkMatch.match_controls(selCtrl,'ik'):
+        cmds.warning('Please select controls of IK/FK rigs.')
 
 #----------------------------------------
 #          Match FK to IK
@@ -294,40 +303,134 @@ def ikTofk():
 
 def fkToik():
     # a.1 To store a selection
-    if cmds.ls(sl=True):
-        selCtrl=cmds.ls(sl=True)
-        # a.2 To prevent multiple items from being selected
-        if len(selCtrl)==1:
-            if selCtrl[0].endswith('_FK_Ctrl'):                
-                # a.3 To match the fk joints to the corresponding ik joints
-                # a.3.1 To find the root of the control hierarechy              
-                root = cmds.ls(selCtrl,l=True)[0].split("|")[1]
-                # a.3.2 To match the shoulder joints position
-                for ctrl in cmds.listRelatives(root,ad=True):
-                    if 'shoulder' in ctrl.lower():
-                        fkShoulderCtrl=ctrl
-                        ikShoulder=fkShoulderCtrl.replace('_FK_CtrlShape','_IK')
-                        cmds.matchTransform(fkShoulderCtrl,ikShoulder)
-                    # a.3.3 To match the elbow joints position
-                    elif 'elbow' in ctrl.lower():
-                        print ctrl
-                        fkElbowCtrl=ctrl
-                        ikElbow=fkElbowCtrl.replace('_FK_CtrlShape','_IK')
-                        cmds.matchTransform(fkElbowCtrl,ikElbow)
-                    # a.3.4 To match the wrist joints position
-                    elif 'wrist' in ctrl.lower():
-                        fkWristCtrl=ctrl
-                        ikWrist=fkWristCtrl.replace('_FK_CtrlShape','_IK')
-                        cmds.matchTransform(fkWristCtrl,ikWrist)
-                    else:
-                        return               
-                        
+    selCtrl=cmds.ls(sl=True)
+    if not selCtrl:
+        cmds.warning('Please select a control.')
+    # a.2 A single control has to be an FK control
+    elif len(selCtrl)==1 and not selCtrl[0].endswith('_FK_Ctrl'):
+        cmds.warning('Please select a FK control.')
+    # a.3 The FK controls of every selected arm follow the ik chain in one undo chunk, then the ikFkSwitch goes to FK
+    elif not ikfkMatch.match_controls(selCtrl,'fk'):
+        cmds.warning('Please select controls of IK/FK rigs.')
+
+#----------------------------------------
+#     Extract the IK & FK Joint Chains
+#----------------------------------------
+
+def chain_values(roles,names=JOINT_ATTRS):
+    # a. The joint attributes of the source shoulder, elbow and wrist as [(joint,[(attr,value),...]),...], getAttr() style
+    values=[]
+    for role in ikfkRoles.ROLES:
+        source=roles.joint(role)
+        attrs=[(attr,cmds.getAttr(source+'.'+attr)) for attr in names if cmds.attributeQuery(attr,node=source,exists=True)]
+        previous=roles.joint(ikfkRoles.ROLES[ikfkRoles.ROLES.index(role)-1]) if role!='shoulder' else None
+        if previous is not None and roles.parent(source)!=previous:
+            # a.1 Joints left out in between (e.g. a twist joint): translate and jointOrient from the world matrices
+            local=np.matmul(np.reshape(cmds.xform(source,q=True,ws=True,m=True),(4,4)),
+                            np.linalg.inv(np.reshape(cmds.xform(previous,q=True,ws=True,m=True),(4,4))))
+            rotation=local[:3,:3]/np.linalg.norm(local[:3,:3],axis=-1,keepdims=True)
+            orient=ikfkBake.matrix_to_euler(np.matmul(np.linalg.inv(ikfkBake.euler_to_matrix(cmds.getAttr(source+'.rotate')[0])),rotation))
+            attrs=[(attr,[tuple(local[3,:3])] if attr=='translate' else [tuple(orient)] if attr=='jointOrient' else value)
+                   for attr,value in attrs]
+        values.append((source,attrs))
+    return values
+
+def extract_chains(roles,chains=('IK','FK')):
+    # a. The shoulder, elbow and wrist joints of each chain, created with their final names under the parent of the
+    #    source shoulder like duplicate() leaves them; nothing is copied only to be deleted again
+    values=chain_values(roles)
+    shoulderParent=cmds.listRelatives(values[0][0],p=True)
+    shoulders=[]
+    for chain in chains:
+        created=[]
+        for source,attrs in values:
+            parent=created[-1] if created else shoulderParent[0] if shoulderParent else None
+            joint=cmds.createNode('joint',name=source+'_'+chain,parent=parent) if parent else cmds.createNode('joint',name=source+'_'+chain)
+            for attr,value in attrs:
+                if isinstance(value,list):
+                    cmds.setAttr(joint+'.'+attr,*value[0])
+                else:
+                    cmds.setAttr(joint+'.'+attr,value)
+            created.append(joint)
+        # b. Registered by full path like the renamed duplicates, deepest first as listRelatives(ad=True) lists them
+        roles.start(chain,created[0])
+        for joint in reversed(created[1:]):
+            roles.add(chain,cmds.ls(joint,l=True)[0],joint)
+        shoulders.append([created[0]])
+    return shoulders
+
+#----------------------------------------
+#       Build the IK & FK Rig of an Arm
+#----------------------------------------
+
+# The whole build is one undo chunk with the refresh suspended, and what it created is deleted again if a stage fails
+@ikfkTransaction.transaction
+def build_arm(shoulder,role_table=None,network='classic',fk_drive='constraint',extract='duplicate'):
+    sel=[shoulder]
+    # a. All the controls of the arm get their channels locked and hidden in one batch
+    channels=ikfkChannels.ChannelBatch()
+    # a.1 The joints of the source, IK and FK chains are indexed by role once, every stage reads from the index
+    roles=ikfkRoles.JointRoleIndex(role_table).scan('original',sel[0])
+    # a.2 To stop before anything is duplicated when the chain has no elbow or no wrist
+    missing=[role for role in ('elbow','wrist') if roles.joint(role) is None]
+    if missing:
+        raise ValueError('%s has no %s joint.' % (shoulder,' or '.join(missing)))
+    # b. Selective: the IK and FK chains are created joint by joint, only the shoulder, elbow and wrist
+    if extract=='selective':
+        ikShoulder,fkShoulder=extract_chains(roles)
+    else:
+        # b.1 To duplicate the shoulder joint as IK
+        ikShoulder=cmds.duplicate(sel[0],rc=True,name=sel[0]+'_IK')       
+        for child in roles.listing('IK',ikShoulder[0]):                
+            role=roles.path_role('IK',child)
+            #b.2 To delete forearm and hand joints, the joints below them go with them
+            if role=='discard':
+                cmds.delete(child)
+            elif role=='discarded':
+                continue
+            #b.3 To properly rename the rest joints
+            else:
+                # To remove the last digit added by maya
+                newName=child.split('|')[-1][:-1]
+                # To add IK to the names
+                cmds.joint(child,e=True,name=newName+'_IK')
+                roles.add('IK',child,newName+'_IK')
+                                   
+        #c.1 To duplicate the shoulder joint as FK       
+        fkShoulder=cmds.duplicate(sel[0],rc=True,name=sel[0]+'_FK')            
+        for child in roles.listing('FK',fkShoulder[0]):                
+            role=roles.path_role('FK',child)
+            #c.2 To delete forearm and hand joints
+            if role=='discard':
+                cmds.delete(child)
+            elif role=='discarded':
+                continue
+            #c.3 To properly rename the rest joints properly
             else:
-                cmds.warning('Please select a FK control.')               
-        else:            
-            cmds.warning('Please select only one control.')
-    else: 
-        cmds.warning('Please select a control.')    
+                newName=child.split('|')[-1][:-1]
+                cmds.joint(child,e=True,name=newName+'_FK')
+                roles.add('FK',child,newName+'_FK')
+
+    # d. To call the ik generator function and store the returned controls into variables
+    control_shapes=ik_generator(ikShoulder,channels,roles)   
+    pole_vecCtrl=control_shapes[0]
+    ik_Ctrl=control_shapes[1]
+    
+    # e. The FK pole vector for IK/FK match is computed from the FK chain at match time
+    # f. To call the fk generator function and store the returned controls into variables
+    fkGroups=fk_generator(fkShoulder,channels,roles,fk_drive)
+   
+    # g. To generate an IK/FK switch and pass variables returned from other functions
+    switch_control=switch_generator(sel,fkShoulder,ikShoulder,fkGroups,pole_vecCtrl,ik_Ctrl,channels,roles,network)
+    # h. To link the controls, joints and switch of the arm, the match functions look them up through these links
+    ikfkLinks.link_rig(switch_control[0],{
+        'ik_control':ik_Ctrl[0],'pole_vector':pole_vecCtrl[0],
+        'ik_joints':dict((role,roles.joint(role,'IK')) for role in ikfkRoles.ROLES),
+        'fk_joints':dict((role,roles.joint(role,'FK')) for role in ikfkRoles.ROLES),
+        'fk_controls':dict((role,roles.joint(role,'FK')+'_Ctrl') for role in ikfkRoles.ROLES)})
+    channels.apply()
+    
+    cmds.select(cl=True)                 
 
 #----------------------------------------
 #       Create IK & FK Joint Chain
@@ -343,82 +446,116 @@ def create_joints():
         # a.2 To check whether the selected joint has any child joint
         elif not cmds.listRelatives(sel[0],c=True,type='joint'):
             cmds.warning('The joint has no child.')       
-        # b. To duplicate the selected shoulder joint, to remove extra joints, and to give proper names;
-        elif 'shoulder' in sel[0].lower():         
-            # b.1 To duplicate the selected shoulder joint as IK
-            ikShoulder=cmds.duplicate(sel[0],rc=True,name=sel[0]+'_IK')       
-            for child in cmds.listRelatives(ikShoulder[0],ad=True,type='joint'):                
-                #b.2 To delete forearm and hand joints
-                if 'forearm' in child.lower():
-                    cmds.delete(child)
-                elif 'palm' in child.lower():
-                    cmds.delete(child) 
-                elif 'thum' in child.lower():
-                    cmds.delete(child)                   
-                #b.3 To properly rename the rest joints
-                else:
-                    # To remove the last digit added by maya
-                    newName=child[:-1]
-                    # To add IK to the names
-                    cmds.joint(child,e=True,name=newName+'_IK')
-                                       
-            #c.1 To duplicate the selected shoulder joint as FK       
-            fkShoulder=cmds.duplicate(sel[0],rc=True,name=sel[0]+'_FK')            
-            for child in cmds.listRelatives(fkShoulder[0],ad=True,type='joint'):                
-                #c.2 To delete forearm and hand joints
-                if 'forearm' in child.lower():
-                    cmds.delete(child)
-                elif 'palm' in child.lower():
-                    cmds.delete(child)
-                elif 'thum' in child.lower():
-                    cmds.delete(child)                       
-                #c.3 To properly rename the rest joints properly
-                else:
-                    newName=child[:-1]
-                    cmds.joint(child,e=True,name=newName+'_FK')
-        		
-    		   # d. To call the ik generator function and store the returned controls into variables
-            control_shapes=ik_generator(ikShoulder)   
-            pole_vecCtrl=control_shapes[0]
-            ik_Ctrl=control_shapes[1]
-            
-            # e. To set up a locator for IK/FK match, it will be further modified in the fk_generator[] function
-            fk_locator=cmds.spaceLocator(name=pole_vecCtrl[0].replace('_IK_PoleVec','')+'_FK_PoleVec')
-            cmds.matchTransform(fk_locator,pole_vecCtrl)
-            cmds.setAttr(fk_locator[0]+'.v',False)
-            # f. To call the fk generator function and store the returned controls into variables
-            fkGroups=fk_generator(fkShoulder,fk_locator)
-           
-            # g. To generate an IK/FK switch and pass variables returned from other functions
-            switch_generator(sel,fkShoulder,ikShoulder,fkGroups,pole_vecCtrl,ik_Ctrl)
-            
-            cmds.select(cl=True)                 
-    
+        # b. To build the IK/FK rig on the selected shoulder joint
+        elif ikfkRoles.role_of(sel[0])=='shoulder':         
+            try:
+                build_arm(sel[0])
+            # b.1 A failed build has been rolled back already
+            except Exception as error:
+                cmds.warning('The IK/FK build failed and was undone: %s' % error)
         else:
             cmds.warning('Please select a shoulder joint.')
     else:
         cmds.warning('Please select a joint.')    
 
+#----------------------------------------
+#     Update the Rig of a Changed Arm
+#----------------------------------------
+
+def update_joints():
+    # a. The selected shoulder joint of an arm rigged before, after its skeleton has been changed
+    sel=cmds.ls(sl=True,type='joint')
+    if not sel or len(sel)!=1:
+        cmds.warning('Please select only one shoulder joint.')
+        return None
+    try:
+        report=ikfkUpdate.update_arm(sel[0])
+    except ValueError as error:
+        cmds.warning(str(error))
+        return None
+    if not report['joints']:
+        cmds.warning('The rig of %s is up to date.' % sel[0])
+    return report
+
+#----------------------------------------
+#     Mirror the Rig to the Other Arm
+#----------------------------------------
+
+def mirror_joints():
+    # a. The selected shoulder joint of a rigged arm, the other arm (L_ -> R_) gets the mirrored rig
+    sel=cmds.ls(sl=True,type='joint')
+    if not sel or len(sel)!=1:
+        cmds.warning('Please select only one shoulder joint.')
+        return None
+    try:
+        return ikfkMirror.mirror_arm(sel[0])
+    except ValueError as error:
+        cmds.warning(str(error))
+        return None
+
+#----------------------------------------
+#     Stamp the Rig onto Other Arms
+#----------------------------------------
+
+def capture_joints():
+    # a. The selected shoulder joint is built and its rig becomes the template the other arms are stamped from
+    try:
+        return ikfkTemplate.capture_selected()
+    except Exception as error:
+        cmds.warning('The IK/FK build failed and was undone: %s' % error)
+        return None
+
+def stamp_joints():
+    # a. Every selected shoulder joint gets the rig of the template, in one call
+    try:
+        report=ikfkTemplate.stamp_selected()
+    except ValueError as error:
+        cmds.warning(str(error))
+        return None
+    if report:
+        print('%d arms stamped in %.2f seconds, %.1f arms per second.' % (report['arms'],report['seconds'],report['arms_per_second']))
+    return report
+
 #----------------------------------------
 #           Create Window
 #----------------------------------------
 
-if cmds.window('IKFKBuilder',exists=True):
-    cmds.deleteUI('IKFKBuilder')
-    
-ui_window=cmds.window('IKFKBuilder',title = "IK & FK BUILDER", w=400,h=150)
-cmds.rowColumnLayout(nc=1,cw=[1,400])
-cmds.showWindow(ui_window)
-cmds.text(l='',h=10)
-cmds.text(l='STEP 1: Please select a shoulder joint then hit Create',h=15)
-cmds.text(l='',h=5)
-cmds.button(l='Create',command='create_joints()')
-cmds.text(l='',h=10)
-cmds.text(l='STEP 2: Please select any one of the IK or FK controls',h=15)
-cmds.text(l='',h=5)
-cmds.rowLayout(nc=2,cw=[2,400],w=400) 
-
-cmds.button(l='IK to FK',w=200,command='ikTofk()')
-cmds.button(l='FK to IK',w=200,command='fkToik()')
-    
+def show_window():
+    if cmds.window('IKFKBuilder',exists=True):
+        cmds.deleteUI('IKFKBuilder')
+        
+    ui_window=cmds.window('IKFKBuilder',title = "IK & FK BUILDER", w=400,h=150)
+    cmds.rowColumnLayout(nc=1,cw=[1,400])
+    cmds.showWindow(ui_window)
+    cmds.text(l='',h=10)
+    cmds.text(l='STEP 1: Please select a shoulder joint then hit Create',h=15)
+    cmds.text(l='',h=5)
+    cmds.button(l='Create',command=lambda *args: create_joints())
+    cmds.button(l='Update Rig',command=lambda *args: update_joints())
+    cmds.button(l='Mirror Rig',command=lambda *args: mirror_joints())
+    cmds.rowLayout(nc=2,cw=[2,400],w=400)
+    cmds.button(l='Build Template',w=200,command=lambda *args: capture_joints())
+    cmds.button(l='Stamp Template',w=200,command=lambda *args: stamp_joints())
+    cmds.setParent('..')
+    cmds.text(l='',h=10)
+    cmds.text(l='STEP 2: Please select any one of the IK or FK controls',h=15)
+    cmds.text(l='',h=5)
+    cmds.rowLayout(nc=2,cw=[2,400],w=400) 
     
+    cmds.button(l='IK to FK',w=200,command=lambda *args: ikTofk())
+    cmds.button(l='FK to IK',w=200,command=lambda *args: fkToik())
+    cmds.setParent('..')
+    cmds.checkBox(l='Auto match when the IK/FK switch reaches 0 or 1',v=ikfkLive.enabled(),
+                  onCommand=lambda *args: ikfkLive.enable(),offCommand=lambda *args: ikfkLive.disable())
+    cmds.text(l='',h=10)
+    cmds.text(l='OPTIONAL: Bake the match of the selected control over a frame range',h=15)
+    cmds.text(l='',h=5)
+    cmds.rowLayout(nc=3,cw3=[130,130,140],w=400)
+    start_field=cmds.intField(w=130,v=int(cmds.playbackOptions(q=True,min=True)))
+    end_field=cmds.intField(w=130,v=int(cmds.playbackOptions(q=True,max=True)))
+    cmds.button(l='Bake Match',w=140,command=lambda *args: ikfkBake.bake_selected(cmds.intField(start_field,q=True,v=True),cmds.intField(end_field,q=True,v=True)))
+
+# The window is only shown when the script is run from the Script Editor,
+# importing the module (e.g. from mayapy or ikfkBatch) builds no UI.
+if __name__=='__main__':
+    show_window()
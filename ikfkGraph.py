@@ -0,0 +1,301 @@
+'''
+The following script will analyze the dependency graph of a built IK/FK rig without evaluating it. Starting from the
+shoulder joint and the nodes ikfkLinks.rig_of() finds for its rig, it collects the nodes of the rig (the source, IK and
+FK chains, controls, constraints, the switch network and the ikHandle) through their connections and DAG hierarchy, up
+to the rig's own control groups, and reports:
+
+- the number of nodes and of dependencies between them,
+- the critical path: the longest chain of nodes that have to evaluate one after the other,
+- the width of every level, the nodes a parallel evaluator could run at the same time,
+- any cycles.
+
+In Maya:
+    import ikfkGraph
+    report=ikfkGraph.analyze_rig('L_shoulder')
+    ikfkGraph.print_report(report)
+
+Without Maya (one arm built in the in-memory scene of ikfkFakeScene.py):
+    python ikfkGraph.py --network lean --fk-drive direct --json graph.json
+'''
+
+import argparse
+import collections
+import json
+
+import ikfkLinks
+from ikfkBackend import cmds
+
+# The rig is not followed into these nodes: deformers, sets and the scene-wide bookkeeping nodes
+BOUNDARY_TYPES=('skinCluster','dagPose','objectSet','shadingEngine','mesh','time','renderLayer','displayLayer',
+                'nodeGraphEditorInfo','hyperLayout','defaultRenderUtilityList')
+# A node reading these from another node depends on that node's parent, not on the node itself
+PARENT_SOURCES=('parentMatrix','parentInverseMatrix')
+# Pivots are plain values, reading them is no evaluation dependency
+PIVOT_SOURCES=('rotatePivot','rotatePivotTranslate','scalePivot','scalePivotTranslate')
+# The joints an ikHandle solves are found through these message connections
+IK_MESSAGES=('startJoint','endEffector')
+
+#----------------------------------------
+#         Collecting the Rig
+#----------------------------------------
+
+def attr_name(plug):
+    # a. 'L_wrist.worldMatrix[0]' -> 'worldMatrix', 'con.target[0].targetWorldMatrix' -> 'target'
+    return plug.split('.',1)[1].split('.')[0].split('[')[0]
+
+def parent_of(node):
+    parent=cmds.listRelatives(node,p=True)
+    return parent[0] if parent else None
+
+def connections(node,source=True):
+    # a. (plug on this node, plug on the other node) pairs of the incoming or the outgoing connections
+    found=cmds.listConnections(node,s=source,d=not source,c=True,p=True) or []
+    return list(zip(found[0::2],found[1::2]))
+
+def is_ik_message(plug,other):
+    return cmds.nodeType(plug.split('.')[0])=='ikHandle' and attr_name(plug) in IK_MESSAGES and attr_name(other)=='message'
+
+def rig_of_shoulder(shoulder):
+    # a. The rig blending a source shoulder: its switch drives the blender of the blendColors on the shoulder's rotate,
+    #    the FK shoulder its color1; a rig built before the links is found through the FK shoulder's control
+    for blend in cmds.listConnections(shoulder+'.rotate',s=True,d=False,type='blendColors') or []:
+        switch=cmds.listConnections(blend+'.blender',s=True,d=False)
+        fk_shoulder=cmds.listConnections(blend+'.color1',s=True,d=False)
+        rig=ikfkLinks.rig_of(switch[0]) if switch else None
+        if rig is None and fk_shoulder:
+            rig=ikfkLinks.rig_of(fk_shoulder[0]+'_Ctrl')
+        if rig is not None:
+            rig['switch']=rig['switch'] or (switch[0] if switch else None)
+            return rig
+    return None
+
+def rig_nodes(shoulder):
+    # a. Everything reachable from the source shoulder and the nodes of its rig through connections and children.
+    #    Parents are followed only into the rig's own control groups, so a group shared with other arms ends the walk.
+    rig=rig_of_shoulder(shoulder) or ikfkLinks.empty_rig()
+    controls=[rig['ik_control'],rig['pole_vector']]+[rig['fk_controls'][role] for role in sorted(rig['fk_controls'])]
+    controls=[control for control in controls if control and cmds.objExists(control)]
+    groups=set(parent_of(control) for control in controls)-set(controls)
+    start=[shoulder,rig['switch']]+[rig[key][role] for key in ('ik_joints','fk_joints') for role in sorted(rig[key])]+controls
+    found=[]
+    queue=collections.deque()
+    seen=set()
+    for node in start:
+        if node and node not in seen and cmds.objExists(node):
+            seen.add(node)
+            queue.append(node)
+    while queue:
+        node=queue.popleft()
+        if cmds.nodeType(node) in BOUNDARY_TYPES:
+            continue
+        found.append(node)
+        neighbours=list(cmds.listRelatives(node,c=True) or [])
+        parent=parent_of(node)
+        if parent in groups:
+            neighbours.append(parent)
+        for source in (True,False):
+            for plug,other in connections(node,source):
+                # a.1 Message connections are bookkeeping, except the ones telling the ikHandle which joints it solves
+                if attr_name(other)=='message' and not is_ik_message(plug,other):
+                    continue
+                if attr_name(plug)=='message' and not is_ik_message(other,plug):
+                    continue
+                neighbours.append(other.split('.')[0])
+        for neighbour in neighbours:
+            if neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return found
+
+def dependencies(nodes):
+    # a. For each node the nodes it has to wait for: its DAG parent, its connected sources and, for the joints an
+    #    ikHandle solves, the handle
+    nodes=list(nodes)
+    members=set(nodes)
+    inputs=dict((node,set()) for node in nodes)
+    for node in nodes:
+        # a.1 A constraint sits below the node it drives but reads its parent space through connections
+        parent=parent_of(node)
+        if parent in members and not cmds.nodeType(node).endswith('Constraint'):
+            inputs[node].add(parent)
+        for plug,other in connections(node,True):
+            source=other.split('.')[0]
+            attr=attr_name(other)
+            if is_ik_message(plug,other):
+                # a.2 The handle solves the chain from its start joint to the parent of its end effector
+                solved=source if attr_name(plug)=='startJoint' else parent_of(source)
+                if solved in members:
+                    inputs[solved].add(node)
+                continue
+            if attr=='message' or attr in PIVOT_SOURCES:
+                continue
+            if attr in PARENT_SOURCES:
+                source=parent_of(source)
+            if source in members and source!=node:
+                inputs[node].add(source)
+    return inputs
+
+#----------------------------------------
+#          Graph Analysis
+#----------------------------------------
+
+def find_cycles(inputs):
+    # a. Strongly connected components with more than one node (Tarjan's algorithm, without recursion)
+    index={}
+    lowlink={}
+    stack=[]
+    on_stack=set()
+    cycles=[]
+    counter=[0]
+    for root in inputs:
+        if root in index:
+            continue
+        work=[(root,iter(sorted(inputs[root])))]
+        index[root]=lowlink[root]=counter[0]
+        counter[0]+=1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node,successors=work[-1]
+            advanced=False
+            for successor in successors:
+                if successor not in index:
+                    index[successor]=lowlink[successor]=counter[0]
+                    counter[0]+=1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor,iter(sorted(inputs[successor]))))
+                    advanced=True
+                    break
+                elif successor in on_stack:
+                    lowlink[node]=min(lowlink[node],index[successor])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                lowlink[work[-1][0]]=min(lowlink[work[-1][0]],lowlink[node])
+            if lowlink[node]==index[node]:
+                component=[]
+                while True:
+                    member=stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member==node:
+                        break
+                if len(component)>1:
+                    cycles.append(sorted(component))
+    return cycles
+
+def cycle_loop(inputs,cycle):
+    # a. The shortest loop through the first node of a cycle, in evaluation order, e.g. [a, b, c, a]
+    start=cycle[0]
+    members=set(cycle)
+    previous={start:None}
+    queue=[start]
+    while queue:
+        node=queue.pop(0)
+        for source in sorted(inputs[node]):
+            if source==start:
+                loop=[node]
+                while previous[loop[-1]] is not None:
+                    loop.append(previous[loop[-1]])
+                return [start]+loop
+            if source in members and source not in previous:
+                previous[source]=node
+                queue.append(source)
+    return [start]
+
+def evaluation_levels(inputs,cycles=()):
+    # a. Level of every node: 0 without inputs, otherwise one more than its latest input. The nodes of a cycle
+    #    evaluate together, at one level.
+    group=dict((node,node) for node in inputs)
+    for cycle in cycles:
+        for node in cycle:
+            group[node]=cycle[0]
+    group_inputs={}
+    for node,sources in inputs.items():
+        group_inputs.setdefault(group[node],set()).update(group[source] for source in sources if group[source]!=group[node])
+    levels={}
+    for start in group_inputs:
+        work=[start]
+        while work:
+            node=work[-1]
+            if node in levels:
+                work.pop()
+                continue
+            pending=[source for source in group_inputs[node] if source not in levels]
+            if pending:
+                work.extend(pending)
+                continue
+            levels[node]=1+max([levels[source] for source in group_inputs[node]] or [-1])
+            work.pop()
+    return dict((node,levels[group[node]]) for node in inputs)
+
+def critical_path(inputs,levels,cycles=()):
+    # a. One longest chain, walked back from a node of the deepest level through inputs one level up; the inputs of a
+    #    cycle are those of all its nodes
+    if not levels:
+        return []
+    members=dict((node,[node]) for node in inputs)
+    for cycle in cycles:
+        for node in cycle:
+            members[node]=cycle
+    node=max(sorted(levels),key=lambda name: levels[name])
+    path=[node]
+    while levels[node]>0:
+        sources=set()
+        for member in members[node]:
+            sources.update(inputs[member])
+        node=sorted(source for source in sources if levels[source]==levels[node]-1)[0]
+        path.append(node)
+    return list(reversed(path))
+
+def analyze(nodes):
+    inputs=dependencies(nodes)
+    cycles=find_cycles(inputs)
+    levels=evaluation_levels(inputs,cycles)
+    depth=max(levels.values())+1 if levels else 0
+    widths=[0]*depth
+    for level in levels.values():
+        widths[level]+=1
+    return {'nodes':len(inputs),'dependencies':sum(len(sources) for sources in inputs.values()),'depth':depth,
+            'widths':widths,'max_width':max(widths or [0]),'parallelism':float(len(inputs))/depth if depth else 0.0,
+            'critical_path':critical_path(inputs,levels,cycles),'cycles':cycles,
+            'loops':[cycle_loop(inputs,cycle) for cycle in cycles]}
+
+def analyze_rig(shoulder):
+    return analyze(rig_nodes(shoulder))
+
+def print_report(report):
+    print('%d nodes, %d dependencies' % (report['nodes'],report['dependencies']))
+    print('critical path: %d levels, %.1f nodes per level on average, %d at most' % (report['depth'],report['parallelism'],report['max_width']))
+    print('  '+' -> '.join(report['critical_path']))
+    print('width per level: '+' '.join(str(width) for width in report['widths']))
+    if report['cycles']:
+        for cycle,loop in zip(report['cycles'],report['loops']):
+            print('cycle of %d nodes, e.g. %s' % (len(cycle),' -> '.join(loop)))
+    else:
+        print('no cycles')
+
+def main(argv=None):
+    import ikfkBackend
+    import ikfkBench
+    import ikfkGen
+    parser=argparse.ArgumentParser(description='Analyze the dependency graph of an arm built on the in-memory scene.')
+    parser.add_argument('--network',choices=('classic','lean'),default='classic',help='switch network style, see ikfkGen.NETWORKS')
+    parser.add_argument('--fk-drive',choices=('constraint','direct'),default='constraint',help='how the FK controls drive the FK joints, see ikfkGen.FK_DRIVES')
+    parser.add_argument('--json',default=None,help='write the report to a JSON file')
+    args=parser.parse_args(argv)
+
+    scene,shoulders=ikfkBench.arm_scene(1)
+    with ikfkBackend.use_backend(scene):
+        ikfkGen.build_arm(shoulders[0],network=args.network,fk_drive=args.fk_drive)
+        report=analyze_rig(shoulders[0])
+    print_report(report)
+    if args.json:
+        with open(args.json,'w') as handle:
+            json.dump(report,handle,indent=2)
+    return report
+
+if __name__=='__main__':
+    main()
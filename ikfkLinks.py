@@ -0,0 +1,121 @@
+'''
+The following script will link the nodes of an IK/FK rig to each other with message attributes at build time, so the
+match functions find the nodes they work on with a fixed number of queries, whatever the size of the scene, instead of
+rebuilding names and walking the hierarchy below the selected control.
+
+The switch control holds the links of its arm, every other control links to the switch:
+
+    L_wrist_IK_Ctrl.ikfkRigSwitch      <- IK_FK_Switch_Ctrl.message
+    IK_FK_Switch_Ctrl.ikfkIkControl    <- L_wrist_IK_Ctrl.message
+    IK_FK_Switch_Ctrl.ikfkElbowFkJoint <- L_elbow_FK.message
+    ...
+
+    import ikfkLinks
+    rig=ikfkLinks.rig_of('L_elbow_FK_Ctrl')    # {'switch':...,'ik_control':...,'fk_joints':{'elbow':...},...}
+'''
+
+import ikfkRoles
+from ikfkBackend import cmds
+
+# The attribute on every control connected from the message of its switch; not to be mistaken for the ikFkSwitch
+# blend attribute of the switch control
+SWITCH_LINK='ikfkRigSwitch'
+# Links on the switch to the single nodes of the arm
+RIG_LINKS=(('ik_control','ikfkIkControl'),('pole_vector','ikfkPoleVector'))
+# Links on the switch to a node per role, e.g. ikfkElbowFkJoint
+CHAIN_LINKS=(('ik_joints','IkJoint'),('fk_joints','FkJoint'),('fk_controls','FkControl'))
+
+def chain_link(role,suffix):
+    return 'ikfk'+role[0].upper()+role[1:]+suffix
+
+#----------------------------------------
+#           Linking at Build
+#----------------------------------------
+
+def link(node,attr,target):
+    # a. A message attribute on node, connected from the message of target
+    if not cmds.attributeQuery(attr,node=node,exists=True):
+        cmds.addAttr(node,ln=attr,at='message')
+    cmds.connectAttr(target+'.message',node+'.'+attr,f=True)
+
+def link_rig(switch,rig):
+    # a. rig is laid out like the result of rig_of(): single nodes and {role: node} dictionaries, None is skipped
+    for key,attr in RIG_LINKS:
+        if rig.get(key):
+            link(switch,attr,rig[key])
+    for key,suffix in CHAIN_LINKS:
+        for role,node in rig.get(key,{}).items():
+            if node:
+                link(switch,chain_link(role,suffix),node)
+    # b. Every control points back to the switch
+    for control in [rig.get('ik_control'),rig.get('pole_vector')]+list(rig.get('fk_controls',{}).values()):
+        if control:
+            link(control,SWITCH_LINK,switch)
+
+#----------------------------------------
+#           Lookup at Match
+#----------------------------------------
+
+def empty_rig(switch=None):
+    rig={'switch':switch}
+    rig.update((key,None) for key,attr in RIG_LINKS)
+    rig.update((key,dict((role,None) for role in ikfkRoles.ROLES)) for key,suffix in CHAIN_LINKS)
+    return rig
+
+def switch_of(control):
+    # a. The switch itself, or the switch the control links to; None for a control built before the links
+    if cmds.attributeQuery(RIG_LINKS[0][1],node=control,exists=True):
+        return control
+    if not cmds.attributeQuery(SWITCH_LINK,node=control,exists=True):
+        return None
+    found=cmds.listConnections(control+'.'+SWITCH_LINK,s=True,d=False)
+    return found[0] if found else None
+
+def rig_of(control):
+    # a. Every linked node of the arm from one query on its switch
+    switch=switch_of(control)
+    if switch is None:
+        return named_rig(control)
+    rig=empty_rig(switch)
+    keys=dict((attr,key) for key,attr in RIG_LINKS)
+    for key,suffix in CHAIN_LINKS:
+        for role in ikfkRoles.ROLES:
+            keys[chain_link(role,suffix)]=(key,role)
+    found=cmds.listConnections(switch,s=True,d=False,c=True) or []
+    for plug,node in zip(found[0::2],found[1::2]):
+        key=keys.get(plug.split('.')[-1])
+        if isinstance(key,tuple):
+            rig[key[0]][key[1]]=node
+        elif key:
+            rig[key]=node
+    return rig
+
+def named_rig(control):
+    # a. Rigs built before the links: the nodes are found by the names the build gives them, along the FK chain
+    for suffix in ('_IK_Ctrl','_IK_PoleVec','_FK_Ctrl'):
+        if control.endswith(suffix):
+            fk_joint=control[:-len(suffix)]+'_FK'
+            break
+    else:
+        return None
+    if not cmds.objExists(fk_joint):
+        return None
+    while True:
+        parent=cmds.listRelatives(fk_joint,p=True)
+        if not parent or not parent[0].endswith('_FK'):
+            break
+        fk_joint=parent[0]
+    rig=empty_rig()
+    while fk_joint:
+        role=ikfkRoles.role_of(fk_joint[:-len('_FK')])
+        if role in ikfkRoles.ROLES:
+            rig['fk_joints'][role]=fk_joint
+            rig['ik_joints'][role]=fk_joint[:-len('_FK')]+'_IK'
+            rig['fk_controls'][role]=fk_joint+'_Ctrl'
+        children=[child for child in cmds.listRelatives(fk_joint,c=True,type='joint') or [] if child.endswith('_FK')]
+        fk_joint=children[0] if children else None
+    if rig['ik_joints']['wrist']:
+        rig['ik_control']=rig['ik_joints']['wrist']+'_Ctrl'
+    if rig['ik_joints']['elbow']:
+        rig['pole_vector']=rig['ik_joints']['elbow']+'_PoleVec'
+    return rig
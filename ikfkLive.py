@@ -0,0 +1,125 @@
+'''
+The following script will match the IK/FK controls automatically when the ikFkSwitch of a rig is changed by hand, so
+the pose does not pop. An attribute-changed callback on every switch control notes each change; when the value
+reaches 0 (IK) or 1 (FK) from the other side, the rig is queued and a single flush is scheduled for the next idle
+event. A burst of changes (dragging the slider, setting keys) therefore ends in one batched match per idle event,
+with ikfkMatch.py, for every rig that crossed.
+
+The callback itself only compares two values and updates a dictionary; it never reads or writes the scene. Keyed
+playback drives the switch without setting it and fires no callback at all.
+
+    import ikfkLive
+    ikfkLive.enable()      # every rig of the scene, or enable(['IK_FK_Switch_Ctrl'])
+    ikfkLive.disable()
+    ikfkLive.stats         # changes seen, matches run and the seconds spent in callbacks and flushes
+'''
+
+import time
+
+import ikfkLinks
+import ikfkMatch
+from ikfkBackend import cmds
+
+SWITCH_ATTR='ikFkSwitch'
+# A switch value this close to 0 or 1 has reached that side
+EPSILON=1e-4
+# Totals of this session, callback_seconds / changes is the overhead of one attribute change
+stats={'changes':0,'crossings':0,'flushes':0,'matches':0,'callback_seconds':0.0,'flush_seconds':0.0}
+
+def side(value):
+    # a. The direction to match when the switch sits at one end: 'ik' at 0, 'fk' at 1, None in between
+    if value is None:
+        return None
+    if value<=EPSILON:
+        return 'ik'
+    if value>=1.0-EPSILON:
+        return 'fk'
+    return None
+
+def reset_stats():
+    for key in stats:
+        stats[key]=0.0 if key.endswith('seconds') else 0
+
+#----------------------------------------
+#         Debounced Auto Match
+#----------------------------------------
+
+class AutoMatch(object):
+    # schedule(function) runs function once at the next idle event (maya.utils.executeDeferred in Maya)
+    def __init__(self,schedule):
+        self.schedule=schedule
+        self.values={}
+        self.pending=set()
+        self.scheduled=False
+        self.matching=False
+
+    def track(self,switch):
+        self.values[switch]=cmds.getAttr(switch+'.'+SWITCH_ATTR)
+
+    def changed(self,switch,value):
+        # a. The callback body: no scene access, at most one flush scheduled per burst
+        start=time.time()
+        stats['changes']+=1
+        previous=self.values.get(switch)
+        self.values[switch]=value
+        # a.1 The switches the flush sets itself are no change by hand
+        if not self.matching and side(value) is not None and side(value)!=side(previous):
+            stats['crossings']+=1
+            self.pending.add(switch)
+            if not self.scheduled:
+                self.scheduled=True
+                self.schedule(self.flush)
+        stats['callback_seconds']+=time.time()-start
+
+    def flush(self):
+        # a. One batched match per direction, for the side each queued switch is on now, after the burst
+        start=time.time()
+        pending,self.pending=self.pending,set()
+        self.scheduled=False
+        self.matching=True
+        try:
+            for direction in ikfkMatch.DIRECTIONS:
+                switches=[switch for switch in sorted(pending) if side(self.values.get(switch))==direction]
+                if switches:
+                    stats['matches']+=ikfkMatch.match_controls(switches,direction)
+        finally:
+            self.matching=False
+        stats['flushes']+=1
+        stats['flush_seconds']+=time.time()-start
+
+#----------------------------------------
+#           Maya Callbacks
+#----------------------------------------
+
+# The AutoMatch and the callback ids of the running live mode
+_session={'auto':None,'callbacks':[]}
+
+def rig_switches():
+    # a. Every switch control holding the links of a rig
+    return sorted(set(cmds.ls('*.'+ikfkLinks.RIG_LINKS[0][1],o=True,r=True) or []))
+
+def enable(switches=None):
+    import maya.api.OpenMaya as om
+    import maya.utils
+    disable()
+    auto=AutoMatch(maya.utils.executeDeferred)
+
+    def attribute_changed(message,plug,other_plug,client_data):
+        if message & om.MNodeMessage.kAttributeSet and plug.partialName(useLongNames=True)==SWITCH_ATTR:
+            auto.changed(om.MFnDependencyNode(plug.node()).name(),plug.asDouble())
+    for switch in (switches if switches is not None else rig_switches()):
+        auto.track(switch)
+        node=om.MSelectionList().add(switch).getDependNode(0)
+        _session['callbacks'].append(om.MNodeMessage.addAttributeChangedCallback(node,attribute_changed))
+    _session['auto']=auto
+    return len(_session['callbacks'])
+
+def disable():
+    if _session['callbacks']:
+        import maya.api.OpenMaya as om
+        om.MMessage.removeCallbacks(_session['callbacks'])
+    _session['callbacks']=[]
+    _session['auto']=None
+
+def enabled():
+    return _session['auto'] is not None
@@ -0,0 +1,144 @@
+'''
+The following script will match the IK/FK controls of many arms in one pass. Any number of controls of any number of
+rigs are grouped by rig (through the rig links of ikfkLinks.py), the world matrices of every source chain are read in a
+single sampling pass, the targets of all the arms are computed at once with NumPy and the results are written in one
+undo chunk. The ikFkSwitch of each matched
+rig is flipped to the side that was matched: 0 (IK) after an IK match, 1 (FK) after an FK match.
+
+    import ikfkMatch
+    ikfkMatch.match_controls(cmds.ls(sl=True),'ik')    # IK controls of every selected arm follow the FK chain
+    ikfkMatch.match_controls(cmds.ls(sl=True),'fk')    # FK controls of every selected arm follow the IK chain
+
+ikTofk() and fkToik() hand every selection over to match_controls(), one control or many, so a match is always one
+undo chunk and always sets the switch. python ikfkBench.py batch compares the batch with matching the same rigs one at
+a time.
+'''
+
+import numpy as np
+
+import ikfkBake
+import ikfkLinks
+import ikfkPoleVector
+import ikfkRoles
+from ikfkBackend import cmds
+
+# 'ik' matches the IK controls to the FK chain like ikTofk(), 'fk' the FK controls to the IK chain like fkToik()
+DIRECTIONS=('ik','fk')
+# The ikFkSwitch value of each direction once it is matched
+SWITCH_VALUES={'ik':0.0,'fk':1.0}
+
+#----------------------------------------
+#           Grouping by Rig
+#----------------------------------------
+
+def group_by_rig(controls):
+    # a. One rig per arm, in selection order, however many of its controls are selected
+    rigs=[]
+    seen=set()
+    for control in controls:
+        rig=ikfkLinks.rig_of(control)
+        if rig is None:
+            continue
+        key=rig['switch'] or rig['ik_control']
+        if key in seen:
+            continue
+        seen.add(key)
+        rigs.append(rig)
+    return rigs
+
+#----------------------------------------
+#          Batched Targets
+#----------------------------------------
+
+def ik_targets(rigs,world,nodes):
+    # a. The wrist controls take the FK wrists, the pole vectors sit off the FK elbows in the plane of each FK chain
+    index=dict((node,i) for i,node in enumerate(nodes))
+    identity=np.identity(4)
+
+    def matrices(names):
+        return np.array([world[0,index[name]] if name else identity for name in names])[None]
+    fk=[matrices([rig['fk_joints'][role] for rig in rigs]) for role in ikfkRoles.ROLES]
+    ctrl_parents=matrices([ikfkBake.parent_of(rig['ik_control']) for rig in rigs])
+    pole_parents=matrices([ikfkBake.parent_of(rig['pole_vector']) for rig in rigs])
+    translate,rotate=ikfkBake.local_channels(fk[2],ctrl_parents)
+    poles=ikfkPoleVector.pole_vector_positions(fk[0][0,:,3,:3],fk[1][0,:,3,:3],fk[2][0,:,3,:3])
+    pole_world=np.broadcast_to(identity,pole_parents.shape).copy()
+    pole_world[0,:,3,:3]=poles
+    pole_translate=ikfkBake.local_channels(pole_world,pole_parents)[0]
+    values=[]
+    for i,rig in enumerate(rigs):
+        values.append((rig['ik_control']+'.translate',translate[0,i]))
+        values.append((rig['ik_control']+'.rotate',rotate[0,i]))
+        values.append((rig['pole_vector']+'.translate',pole_translate[0,i]))
+    return values
+
+def fk_targets(rigs,world,nodes):
+    # a. Parents first: a control group below the FK control of the role before it moves with that control's target
+    index=dict((node,i) for i,node in enumerate(nodes))
+    values=[]
+    previous=None
+    for role in ikfkRoles.ROLES:
+        ctrls=[rig['fk_controls'][role] for rig in rigs]
+        joints=np.array([world[0,index[rig['ik_joints'][role]]] for rig in rigs])[None]
+        groups=np.array([world[0,index[ikfkBake.parent_of(ctrl)]] for ctrl in ctrls])[None]
+        parent_world=groups
+        if previous is not None:
+            ctrl_world=np.array([world[0,index[ctrl]] for ctrl in previous[0]])[None]
+            # a.1 Only where the group hangs directly below that control
+            below=np.array([ikfkBake.parent_of(ikfkBake.parent_of(ctrl))==parent for ctrl,parent in zip(ctrls,previous[0])])
+            moved=np.matmul(np.matmul(groups,np.linalg.inv(ctrl_world)),previous[1])
+            parent_world=np.where(below[None,:,None,None],moved,groups)
+        # a.2 FK controls only rotate, they keep the position of their group
+        target=ikfkBake.with_translation(joints,parent_world[...,3,:3])
+        rotate=ikfkBake.local_channels(target,parent_world)[1]
+        values.extend((ctrl+'.rotate',rotate[0,i]) for i,ctrl in enumerate(ctrls))
+        previous=(ctrls,target)
+    return values
+
+def sampled_nodes(rigs,direction):
+    # a. Every node whose world matrix a direction reads, each once
+    nodes=[]
+    for rig in rigs:
+        if direction=='ik':
+            names=[rig['fk_joints'][role] for role in ikfkRoles.ROLES]+[ikfkBake.parent_of(rig['ik_control']),ikfkBake.parent_of(rig['pole_vector'])]
+        else:
+            ctrls=[rig['fk_controls'][role] for role in ikfkRoles.ROLES]
+            names=[rig['ik_joints'][role] for role in ikfkRoles.ROLES]+[ikfkBake.parent_of(ctrl) for ctrl in ctrls]+ctrls
+        nodes.extend(name for name in names if name and name not in nodes)
+    return nodes
+
+#----------------------------------------
+#             Batch Match
+#----------------------------------------
+
+def complete(rig,direction):
+    # a. A rig missing a node the direction needs is left out
+    if direction=='ik':
+        return rig['ik_control'] and rig['pole_vector'] and all(rig['fk_joints'].values())
+    return all(rig['fk_controls'].values()) and all(rig['ik_joints'].values())
+
+def match_rigs(rigs,direction):
+    if direction not in DIRECTIONS:
+        raise ValueError('Unknown match direction %s, expected one of %s.' % (direction,', '.join(DIRECTIONS)))
+    rigs=[rig for rig in rigs if complete(rig,direction)]
+    if not rigs:
+        return 0
+    # a. One sampling pass at the current frame for every arm
+    nodes=sampled_nodes(rigs,direction)
+    world=ikfkBake.sample_world_matrices(nodes,[cmds.currentTime(q=True)])
+    values=ik_targets(rigs,world,nodes) if direction=='ik' else fk_targets(rigs,world,nodes)
+    # b. Every result in one undo chunk, then the switches
+    cmds.undoInfo(openChunk=True,chunkName='ikfkMatch')
+    try:
+        for plug,value in values:
+            cmds.setAttr(plug,*[float(item) for item in value])
+        for rig in rigs:
+            if rig['switch']:
+                cmds.setAttr(rig['switch']+'.ikFkSwitch',SWITCH_VALUES[direction])
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return len(rigs)
+
+def match_controls(controls,direction):
+    # a. The rigs of the given controls, each matched once; returns how many were matched
+    return match_rigs(group_by_rig(controls),direction)
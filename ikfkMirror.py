@@ -0,0 +1,244 @@
+'''
+The following script will build the IK/FK rig of the other arm of a symmetric character from the rig of the first arm,
+instead of running create_joints() a second time. The transforms the first build computed (control groups, the IK pole
+vector group, the offset of the switch control) are read from its rig as local values and reflected across a plane;
+the controls are created at their final size and placed directly below their final parents, so nothing is matched,
+measured or moved into place again. The IK/FK chains, controls, pole vector, blendColors/condition (or setRange)
+network, switch control, channel locks and rig links come out as a build of the other arm would make them.
+
+The other arm has to be a mirror of the first: its joints at the reflected positions, with their axes flipped the way a
+behavior or orientation mirror flips them. Anything else raises a ValueError and the arm is built with create_joints().
+
+    import ikfkMirror
+    ikfkMirror.mirror_arm('L_shoulder')                         # R_shoulder gets the mirrored rig
+    ikfkMirror.mirror_arm('L_shoulder','Rt_shoulder',plane='YZ')
+
+python ikfkBench.py mirror compares a mirrored arm with a full build of the same arm.
+'''
+
+import numpy as np
+
+import ikfkBake
+import ikfkChannels
+import ikfkLinks
+import ikfkRoles
+import ikfkShapes
+import ikfkTransaction
+import ikfkUpdate
+from ikfkBackend import cmds
+
+# The mirror planes by the axis they reflect
+PLANES={'YZ':0,'XZ':1,'XY':2}
+# Side markers swapped at the start (L_shoulder) or at the end (shoulder_L) of a name, longest first
+SIDES=(('Left','Right'),('left','right'),('L','R'),('l','r'))
+# The offset a parentConstraint keeps from its first target, in the space of that target
+OFFSET_ATTRS=('target[0].targetOffsetTranslate','target[0].targetOffsetRotate')
+# Position differences below this fraction of the arm's length, and axis differences below this, are still a mirror
+TOLERANCE=1e-3
+
+#----------------------------------------
+#             Side Names
+#----------------------------------------
+
+def mirrored_name(name):
+    # a. L_shoulder -> R_shoulder, Left_arm -> Right_arm, shoulder_L -> shoulder_R; a name without a side is kept
+    for left,right in SIDES:
+        for side,other in ((left,right),(right,left)):
+            rest=name[len(side):]
+            if name.startswith(side) and rest and not rest[0].islower():
+                return other+rest
+            if name.endswith('_'+side):
+                return name[:-len(side)]+other
+    return name
+
+#----------------------------------------
+#             Reflection
+#----------------------------------------
+
+def reflection(plane):
+    if plane not in PLANES:
+        raise ValueError('Unknown mirror plane %s, expected one of %s.' % (plane,', '.join(sorted(PLANES))))
+    matrix=np.identity(4)
+    matrix[PLANES[plane],PLANES[plane]]=-1.0
+    return matrix
+
+def axis_flip(source,target,reflect):
+    # a. The flip F of the joint axes, target = F * source * reflect for every joint (F = -1 on every axis for a
+    #    behavior mirror), from (N,4,4) frames. None when the target is no mirror of the source.
+    length=np.linalg.norm(source[1:,3,:3]-source[:-1,3,:3],axis=-1).sum() or 1.0
+    if np.linalg.norm(np.matmul(source,reflect)[:,3,:3]-target[:,3,:3],axis=-1).max()>TOLERANCE*length:
+        return None
+    rotations=[frames[:,:3,:3]/np.linalg.norm(frames[:,:3,:3],axis=-1,keepdims=True) for frames in (source,target)]
+    # a.1 Rotations are orthogonal, the transpose is the inverse
+    flips=np.matmul(np.matmul(rotations[1],reflect[:3,:3]),np.swapaxes(rotations[0],-1,-2))
+    matrix=np.identity(4)
+    matrix[:3,:3]=np.diag(np.sign(np.diag(flips[0])))
+    if not np.allclose(flips,matrix[:3,:3],atol=TOLERANCE):
+        return None
+    return matrix
+
+def local_values(node,translate='translate',rotate='rotate'):
+    return [cmds.getAttr(node+'.'+translate)[0],cmds.getAttr(node+'.'+rotate)[0]]
+
+def local_matrices(values):
+    # a. [translate, rotate] values of transforms (XYZ rotate order, unscaled) as row-vector matrices, in one call
+    matrices=np.tile(np.identity(4),(len(values),1,1))
+    matrices[:,:3,:3]=ikfkBake.euler_to_matrix([rotate for translate,rotate in values])
+    matrices[:,3,:3]=[translate for translate,rotate in values]
+    return matrices
+
+def set_values(node,values,translate='translate',rotate='rotate'):
+    cmds.setAttr(node+'.'+translate,*values[0])
+    cmds.setAttr(node+'.'+rotate,*values[1])
+
+#----------------------------------------
+#           Rig of the First Arm
+#----------------------------------------
+
+def source_rig(shoulder):
+    # a. The linked rig of a built arm, with the groups of its controls
+    rig=ikfkLinks.rig_of(shoulder+'_FK_Ctrl') if cmds.objExists(shoulder+'_FK_Ctrl') else None
+    if rig is None or not (rig['switch'] and rig['ik_control'] and rig['pole_vector'] and all(rig['fk_controls'].values())
+                           and all(rig['ik_joints'].values()) and all(rig['fk_joints'].values())):
+        raise ValueError('%s has no complete IK/FK rig to mirror.' % shoulder)
+    groups=[ikfkBake.parent_of(rig['fk_controls'][role]) for role in ikfkRoles.ROLES]
+    # a.1 Every FK control group below the control of the role before it, as the build parents them
+    for role,group,previous in zip(ikfkRoles.ROLES[1:],groups[1:],ikfkRoles.ROLES):
+        if ikfkBake.parent_of(group)!=rig['fk_controls'][previous]:
+            raise ValueError('The FK control of %s is not below the one of %s, the rig cannot be mirrored.' % (rig['fk_controls'][role],previous))
+    # a.2 The values of the groups, the build gave each its place once
+    rig['values']=dict((role,local_values(group)) for role,group in zip(ikfkRoles.ROLES,groups))
+    rig['values']['ik_group']=local_values(ikfkBake.parent_of(rig['ik_control']))
+    rig['values']['pole_group']=local_values(ikfkBake.parent_of(rig['pole_vector']))
+    # b. The build options it was made with: a classic switch follows the wrist through a constraint, a lean one holds
+    #    its values below the shoulder's parent; a direct FK drive connects the control's rotate to the joint (the
+    #    shoulder's too when it has no parent)
+    constraint=(cmds.listConnections(rig['switch']+'.translate',s=True,d=False) or [None])[0]
+    rig['network']='classic' if constraint else 'lean'
+    drivers=cmds.listConnections(rig['fk_joints']['elbow']+'.rotate',s=True,d=False) or []
+    rig['fk_drive']='direct' if rig['fk_controls']['elbow'] in drivers else 'constraint'
+    drivers=cmds.listConnections(rig['fk_joints']['shoulder']+'.rotate',s=True,d=False) or []
+    rig['direct']=[role for role in ikfkRoles.ROLES if role!='shoulder' or rig['fk_controls']['shoulder'] in drivers]
+    # c. The place of the switch: its own values below the shoulder's parent for a lean switch, the target offset of
+    #    its constraint from the wrist otherwise
+    if rig['network']=='lean':
+        rig['values']['switch']=local_values(rig['switch'])
+    else:
+        rig['values']['switch']=local_values(constraint,*OFFSET_ATTRS)
+    return rig
+
+#----------------------------------------
+#            Mirrored Build
+#----------------------------------------
+
+def mirror_arm(shoulder,target=None,plane='YZ',role_table=None):
+    import ikfkGen
+    reflect=reflection(plane)
+    target=target or mirrored_name(shoulder)
+    if target==shoulder or not cmds.objExists(target):
+        raise ValueError('%s has no other arm %s to mirror to.' % (shoulder,target))
+    if cmds.objExists(target+'_IK') or cmds.objExists(target+'_FK'):
+        raise ValueError('%s has an IK/FK rig already.' % target)
+    rig=source_rig(shoulder)
+    roles=ikfkRoles.JointRoleIndex(role_table).scan('original',target)
+    missing=[role for role in ('elbow','wrist') if roles.joint(role) is None]
+    if missing:
+        raise ValueError('%s has no %s joint.' % (target,' or '.join(missing)))
+    # a. The rest frames of both arms from their joint values, only the parents of the shoulders are sampled; the
+    #    rigged arm itself is never evaluated
+    sources=[rig['ik_joints'][role][:-len('_IK')] for role in ikfkRoles.ROLES]
+    targets=[roles.joint(role) for role in ikfkRoles.ROLES]
+    parents=[ikfkBake.parent_of(sources[0]),ikfkBake.parent_of(targets[0])]
+    nodes=[parent for parent in parents if parent]
+    world=dict(zip(nodes,ikfkBake.sample_world_matrices(nodes,[cmds.currentTime(q=True)])[0])) if nodes else {}
+    rest=local_matrices([ikfkUpdate.joint_values(joint) for joint in sources+targets]).reshape(2,len(sources),4,4)
+    frames=np.empty_like(rest)
+    for i,parent in enumerate(parents):
+        frames[i,0]=np.matmul(rest[i,0],world[parent] if parent else np.identity(4))
+        for j in range(1,len(sources)):
+            frames[i,j]=np.matmul(rest[i,j],frames[i,j-1])
+    flip=axis_flip(frames[0],frames[1],reflect)
+    if flip is None:
+        raise ValueError('%s is not a mirror of %s across the %s plane.' % (target,shoulder,plane))
+
+    # b. Every value of the first arm to the other arm in one call: F * local * F below a mirrored parent,
+    #    F * world * reflect at the top of the scene
+    keys=('ik_group','pole_group')+ikfkRoles.ROLES+('switch',)
+    matrices=local_matrices([rig['values'][key] for key in keys])
+    lean=rig['network']=='lean'
+    top=np.array([key in ('ik_group','pole_group','shoulder') or (lean and key=='switch') for key in keys])
+    # b.1 A lean switch is mirrored in world space, from below the parent of one shoulder to below the other's
+    if lean and parents[0]:
+        matrices[-1]=np.matmul(matrices[-1],world[parents[0]])
+    mirrored=np.where(top[:,None,None],np.matmul(np.matmul(flip,matrices),reflect),np.matmul(np.matmul(flip,matrices),flip))
+    if lean and parents[1]:
+        mirrored[-1]=np.matmul(mirrored[-1],np.linalg.inv(world[parents[1]]))
+    translate,rotate=ikfkBake.local_channels(mirrored[None],np.identity(4)[None])
+    values=dict((key,[[float(value) for value in translate[0,i]],[float(value) for value in rotate[0,i]]]) for i,key in enumerate(keys))
+    lengths=ikfkShapes.bone_lengths(*[frame[3,:3] for frame in frames[1]])
+    channels=ikfkChannels.ChannelBatch()
+    with ikfkTransaction.BuildTransaction('ikfkMirror '+target):
+        # c. The IK and FK chains from the joints of the other arm, like a selective extraction
+        ikShoulder,fkShoulder=ikfkGen.extract_chains(roles)
+        ik_joints=[roles.joint(role,'IK') for role in ikfkRoles.ROLES]
+        fk_joints=[roles.joint(role,'FK') for role in ikfkRoles.ROLES]
+
+        # d. IK control and pole vector in their mirrored groups
+        ik_handle=cmds.ikHandle(sj=ik_joints[0],ee=ik_joints[2],sol='ikRPsolver',n=ik_joints[2]+'_Handle')
+        ik_group=cmds.createNode('transform',name=ik_joints[2]+'_CtrlGrp')
+        set_values(ik_group,values['ik_group'])
+        ik_control=ikfkShapes.create(ik_joints[2]+'_Ctrl','square',ikfkShapes.control_size('ik',lengths))
+        cmds.parent(ik_control,ik_group,r=True)
+        cmds.orientConstraint(ik_control,ik_joints[2],weight=1)
+        cmds.parent(ik_handle[0],ik_control[0])
+        cmds.setAttr(ik_handle[0]+'.v',False)
+        channels.add(ik_control,ikfkChannels.IK_CONTROL)
+        pole_group=cmds.createNode('transform',name=ik_joints[1]+'_PoleVectorGrp')
+        set_values(pole_group,values['pole_group'])
+        pole_vector=cmds.spaceLocator(name=ik_joints[1]+'_PoleVec')
+        cmds.parent(pole_vector,pole_group,r=True)
+        cmds.poleVectorConstraint(pole_vector,ik_handle[0])
+        cmds.setAttr(ikShoulder[0]+'.v',False)
+        channels.add(pole_vector,ikfkChannels.POLE_VECTOR)
+
+        # e. FK controls, parents first, each group below the control of the role before it
+        fkGroups=[]
+        fk_controls=[]
+        for role,joint in zip(ikfkRoles.ROLES,fk_joints):
+            group_name=joint+'_CtrlGrp'
+            group=cmds.createNode('transform',name=group_name,parent=fk_controls[-1]) if fk_controls else cmds.createNode('transform',name=group_name)
+            set_values(group,values[role])
+            fk_control=ikfkShapes.create(joint+'_Ctrl','circle',ikfkShapes.control_size(role,lengths))
+            cmds.parent(fk_control,group,r=True)
+            if rig['fk_drive']=='direct' and role in rig['direct']:
+                cmds.setAttr(fk_control[0]+'.rotate',*cmds.getAttr(joint+'.rotate')[0])
+                cmds.connectAttr(fk_control[0]+'.rotate',joint+'.rotate')
+            else:
+                cmds.parentConstraint(fk_control[0],joint)
+            channels.add(fk_control,ikfkChannels.FK_CONTROL)
+            fkGroups.append(group)
+            fk_controls.append(fk_control[0])
+        cmds.setAttr(fkShoulder[0]+'.v',False)
+
+        # f. The switch control keeps the mirrored offset from the wrist, set on its constraint instead of measured
+        switch_control=ikfkShapes.create('IK/FK_Switch_Ctrl','switch',ikfkShapes.control_size('switch',lengths))
+        if lean:
+            set_values(switch_control[0],values['switch'])
+            if parents[1]:
+                cmds.connectAttr(parents[1]+'.worldMatrix[0]',switch_control[0]+'.offsetParentMatrix')
+        else:
+            constraint=cmds.parentConstraint(targets[2],switch_control)
+            set_values(constraint[0],values['switch'],*OFFSET_ATTRS)
+        cmds.addAttr(switch_control[0],ln='ikFkSwitch',at='float',min=0,max=1,dv=0.5)
+        cmds.setAttr(switch_control[0]+'.ikFkSwitch',keyable=True)
+        channels.add(switch_control,ikfkChannels.SWITCH_CONTROL)
+        ikfkGen.switch_network(switch_control,targets,fk_joints,ik_joints,fkGroups,pole_vector,ik_control,rig['network'])
+
+        # g. Links and channel locks like a build
+        ikfkLinks.link_rig(switch_control[0],{
+            'ik_control':ik_control[0],'pole_vector':pole_vector[0],
+            'ik_joints':dict(zip(ikfkRoles.ROLES,ik_joints)),'fk_joints':dict(zip(ikfkRoles.ROLES,fk_joints)),
+            'fk_controls':dict(zip(ikfkRoles.ROLES,fk_controls))})
+        channels.apply()
+        cmds.select(cl=True)
+    return switch_control[0]
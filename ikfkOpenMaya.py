@@ -0,0 +1,430 @@
+'''
+The following script is a second build engine for the IK/FK arm rig of ikfkGen.py, written against OpenMaya API 2.0.
+Every transform of the rig is computed up front from the world matrices of the source chain, then all nodes, plug
+values and connections (IK/FK chains, circle controls, constraints, the blendColors switch network and the condition
+visibility nodes) are queued on one MDagModifier and committed with a single doIt(). Node names and connections are
+the same as create_joints() produces.
+
+Only the ikHandle and its pole vector constraint go through MEL (queued with commandToExecute, still inside the same
+doIt()), since the IK solver wiring has no modifier equivalent. Channel locking is applied on the plugs afterwards.
+
+    import ikfkOpenMaya
+    rig=ikfkOpenMaya.build_arm('L_shoulder')
+    rig.undo()        # one call removes the whole arm again
+
+    ikfkOpenMaya.benchmark(arms=50)
+'''
+
+import time
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+import ikfkChannels
+import ikfkLinks
+import ikfkPoleVector
+import ikfkRoles
+import ikfkShapes
+
+#----------------------------------------
+#             Scene Queries
+#----------------------------------------
+
+def dag_path(name):
+    sel=om.MSelectionList()
+    sel.add(name)
+    return sel.getDagPath(0)
+
+def find_plug(node,path):
+    # a. Resolves 'target[0].targetTranslate' style paths on a node, also before the modifier has run
+    fn=om.MFnDependencyNode(node)
+    plug=None
+    for part in path.split('.'):
+        name,_,index=part.partition('[')
+        if plug is None:
+            plug=fn.findPlug(name,False)
+        else:
+            plug=plug.child(fn.attribute(name))
+        if index:
+            plug=plug.elementByLogicalIndex(int(index.rstrip(']')))
+    return plug
+
+def duplicate_name(name):
+    # a. The name duplicate(rc=True) gives a child: the trailing number is increased until the name is free
+    base=name.rstrip('0123456789')
+    index=int(name[len(base):])+1 if len(base)<len(name) else 1
+    while cmds.objExists(base+str(index)):
+        index+=1
+    return base+str(index)
+
+def joint_children(path):
+    fn=om.MFnDagNode(path)
+    children=[]
+    for i in range(fn.childCount()):
+        child=fn.child(i)
+        if child.hasFn(om.MFn.kJoint):
+            children.append(om.MDagPath.getAPathTo(child))
+    return children
+
+#----------------------------------------
+#              Matrix Math
+#----------------------------------------
+
+def decompose(matrix):
+    # a. translate, rotate (radians, XYZ) and scale of a matrix
+    tm=om.MTransformationMatrix(matrix)
+    rotation=tm.rotation()
+    return list(tm.translation(om.MSpace.kTransform)),[rotation.x,rotation.y,rotation.z],tm.scale(om.MSpace.kTransform)
+
+def compose(translate,rotate,scale=(1.0,1.0,1.0)):
+    tm=om.MTransformationMatrix()
+    tm.setScale(scale,om.MSpace.kTransform)
+    tm.setRotation(om.MEulerRotation(*rotate))
+    tm.setTranslation(om.MVector(*translate),om.MSpace.kTransform)
+    return tm.asMatrix()
+
+def without_scale(matrix):
+    translate,rotate,scale=decompose(matrix)
+    return compose(translate,rotate)
+
+def shape_points(shape,size):
+    # a. The CVs of a library shape with the repeated CVs of its form, as curve() takes them
+    return [om.MVector(*point) for point in ikfkShapes.curve_args(shape,size)['p']]
+
+#----------------------------------------
+#          Modifier-based Build
+#----------------------------------------
+
+class ArmBuild(object):
+    def __init__(self):
+        self.modifier=om.MDagModifier()
+        self.nodes={}
+        self.channels=[]
+
+    #-------------- nodes --------------------
+
+    def create(self,node_type,name,parent=None):
+        node=self.modifier.createNode(node_type,parent if parent is not None else om.MObject.kNullObj)
+        self.modifier.renameNode(node,name)
+        self.nodes[name]=node
+        return node
+
+    def create_dg(self,node_type,name):
+        # a. MDagModifier.createNode only takes DAG types, the base class version creates utility nodes on the same modifier
+        node=om.MDGModifier.createNode(self.modifier,node_type)
+        self.modifier.renameNode(node,name)
+        self.nodes[name]=node
+        return node
+
+    def set(self,node,path,value):
+        plug=find_plug(node,path)
+        if isinstance(value,bool):
+            self.modifier.newPlugValueBool(plug,value)
+        elif isinstance(value,int):
+            self.modifier.newPlugValueInt(plug,value)
+        else:
+            self.modifier.newPlugValueDouble(plug,value)
+
+    def set3(self,node,path,values):
+        for suffix,value in zip('XYZ',values):
+            self.set(node,path+suffix,float(value))
+
+    def set_angles(self,node,path,radians):
+        for suffix,value in zip('XYZ',radians):
+            self.modifier.newPlugValueMAngle(find_plug(node,path+suffix),om.MAngle(value))
+
+    def set_transform(self,node,matrix):
+        translate,rotate,scale=decompose(matrix)
+        self.set3(node,'translate',translate)
+        self.set_angles(node,'rotate',rotate)
+        self.set3(node,'scale',scale)
+
+    def connect(self,source,source_path,target,target_path):
+        self.modifier.connect(find_plug(source,source_path),find_plug(target,target_path))
+
+    def add_float(self,node,name,default,minimum=None,maximum=None,keyable=True):
+        fn=om.MFnNumericAttribute()
+        attr=fn.create(name,name,om.MFnNumericData.kFloat if minimum is not None else om.MFnNumericData.kDouble,default)
+        if minimum is not None:
+            fn.setMin(minimum)
+        if maximum is not None:
+            fn.setMax(maximum)
+        fn.keyable=keyable
+        self.modifier.addAttribute(node,attr)
+
+    def link(self,node,name,target):
+        # a. Like ikfkLinks.link(): a message attribute connected from the message of target
+        self.modifier.addAttribute(node,om.MFnMessageAttribute().create(name,name))
+        self.connect(target,'message',node,name)
+
+    def curve(self,name,points,degree):
+        transform=self.create('transform',name)
+        shape=self.create('nurbsCurve',name+'Shape',transform)
+        data=om.MFnNurbsCurveData().create()
+        if degree==1:
+            knots=[float(i) for i in range(len(points))]
+            form=om.MFnNurbsCurve.kClosed
+        else:
+            spans=len(points)-degree
+            knots=[float(i) for i in range(-degree+1,spans+degree)]
+            form=om.MFnNurbsCurve.kPeriodic
+        om.MFnNurbsCurve().create(om.MPointArray([om.MPoint(p) for p in points]),knots,degree,form,False,True,data)
+        self.modifier.newPlugValue(find_plug(shape,'cached'),data)
+        return transform
+
+    #-------------- constraints --------------
+
+    def constraint(self,node_type,driver,driver_name,driven,driven_name,driver_is_joint,driven_is_joint,offset=None):
+        con=self.create(node_type,driven_name+'_'+node_type+'1',driven)
+        # a. Target side: one target, with its weight attribute named after the driver like Maya does
+        self.add_float(con,driver_name+'W0',1.0)
+        self.connect(con,driver_name+'W0',con,'target[0].targetWeight')
+        self.connect(driver,'parentMatrix[0]',con,'target[0].targetParentMatrix')
+        self.connect(driver,'rotate',con,'target[0].targetRotate')
+        self.connect(driver,'rotateOrder',con,'target[0].targetRotateOrder')
+        if driver_is_joint:
+            self.connect(driver,'jointOrient',con,'target[0].targetJointOrient')
+        if node_type=='parentConstraint':
+            self.connect(driver,'translate',con,'target[0].targetTranslate')
+            self.connect(driver,'rotatePivot',con,'target[0].targetRotatePivot')
+            self.connect(driver,'rotatePivotTranslate',con,'target[0].targetRotateTranslate')
+            self.connect(driver,'scale',con,'target[0].targetScale')
+            # a.1 A joint driver also gives its scale compensation, as parentConstraint connects it
+            if driver_is_joint:
+                self.connect(driver,'segmentScaleCompensate',con,'target[0].targetScaleCompensate')
+                self.connect(driver,'inverseScale',con,'target[0].targetInverseScale')
+        # b. Constrained side
+        self.connect(driven,'parentInverseMatrix[0]',con,'constraintParentInverseMatrix')
+        self.connect(driven,'rotateOrder',con,'constraintRotateOrder')
+        if driven_is_joint:
+            self.connect(driven,'jointOrient',con,'constraintJointOrient')
+        if node_type=='parentConstraint':
+            self.connect(driven,'rotatePivot',con,'constraintRotatePivot')
+            self.connect(driven,'rotatePivotTranslate',con,'constraintRotateTranslate')
+            for axis in 'XYZ':
+                self.connect(con,'constraintTranslate'+axis,driven,'translate'+axis)
+        for axis in 'XYZ':
+            self.connect(con,'constraintRotate'+axis,driven,'rotate'+axis)
+        # c. maintainOffset: the offset in the space of the driver
+        if offset is not None:
+            translate,rotate,scale=decompose(offset)
+            self.set3(con,'target[0].targetOffsetTranslate',translate)
+            self.set_angles(con,'target[0].targetOffsetRotate',rotate)
+        return con
+
+    #-------------- commit -------------------
+
+    def commit(self):
+        self.modifier.doIt()
+        # a. Lock and hide the channels on the plugs, no command is issued
+        for name,policy in self.channels:
+            node=self.nodes[name]
+            for channel in policy:
+                plug=om.MFnDependencyNode(node).findPlug(channel,False)
+                plug.isLocked=True
+                plug.isKeyable=False
+                plug.isChannelBox=False
+
+    def undo(self):
+        self.modifier.undoIt()
+
+#----------------------------------------
+#        Build the Arm Rig (API)
+#----------------------------------------
+
+def chain(shoulder,extra_ok,table=None):
+    # a. The joints create_joints() keeps from the duplicate: no forearm/palm/thumb branches
+    result=[]
+
+    def walk(path,parent_index):
+        name=path.partialPathName()
+        if ikfkRoles.role_of(name,table)=='discard':
+            return
+        if parent_index is not None and not extra_ok(name):
+            return
+        result.append((path,name,parent_index))
+        index=len(result)-1
+        for child in joint_children(path):
+            walk(child,index)
+    walk(dag_path(shoulder),None)
+    return result
+
+def copy_joint(build,source_path,name,parent):
+    joint=build.create('joint',name,parent)
+    source=source_path.node()
+    for attr in ('translate','rotate','scale','jointOrient','rotateAxis','preferredAngle'):
+        for axis in 'XYZ':
+            plug=find_plug(source,attr+axis)
+            if attr in ('rotate','jointOrient','rotateAxis','preferredAngle'):
+                build.modifier.newPlugValueMAngle(find_plug(joint,attr+axis),plug.asMAngle())
+            else:
+                build.set(joint,attr+axis,plug.asDouble())
+    build.set(joint,'rotateOrder',find_plug(source,'rotateOrder').asInt())
+    build.set(joint,'radius',find_plug(source,'radius').asDouble())
+    return joint
+
+def build_arm(shoulder,role_table=None):
+    build=ArmBuild()
+    # a.1 The duplicated chains stay under the parent of the source shoulder, like duplicate() leaves them
+    parent=om.MFnDagNode(dag_path(shoulder)).parent(0)
+    parent=None if parent.hasFn(om.MFn.kWorld) else parent
+
+    # a.2 Source chain: the kept joints, with their world matrices
+    role=lambda name: ikfkRoles.role_of(name,role_table)
+    fk_chain=chain(shoulder,lambda name: True,role_table)
+    ik_chain=chain(shoulder,lambda name: role(name) in ('wrist','elbow'),role_table)
+    world={}
+    for path,name,parent_index in fk_chain:
+        world[name]=path.inclusiveMatrix()
+    # a.3 To stop before anything is created when the chain has no elbow or no wrist, like ikfkGen.build_arm()
+    found=dict((role(name),name) for path,name,index in ik_chain if role(name) in ('elbow','wrist'))
+    missing=[joint_role for joint_role in ('elbow','wrist') if joint_role not in found]
+    if missing:
+        raise ValueError('%s has no %s joint.' % (shoulder,' or '.join(missing)))
+    elbow,wrist=found['elbow'],found['wrist']
+
+    # b. IK and FK chains, named the way the rename loops of create_joints() name them
+    def duplicate_chain(joints,suffix):
+        created=[]
+        names={}
+        for path,name,parent_index in joints:
+            names[name]=name+suffix if parent_index is None else duplicate_name(name)[:-1]+suffix
+            created.append(copy_joint(build,path,names[name],parent if parent_index is None else created[parent_index]))
+        return dict((name,node) for (path,name,parent_index),node in zip(joints,created)),names
+    ik,ik_names=duplicate_chain(ik_chain,'_IK')
+    fk,fk_names=duplicate_chain(fk_chain,'_FK')
+
+    # c. IK control, handle and pole vector; the controls are sized by the bones of the arm
+    positions=[list(om.MTransformationMatrix(world[name]).translation(om.MSpace.kWorld)) for name in (shoulder,elbow,wrist)]
+    lengths=ikfkShapes.bone_lengths(*positions)
+    ik_ctrl_name=wrist+'_IK_Ctrl'
+    ik_group=build.create('transform',ik_ctrl_name+'Grp')
+    build.set_transform(ik_group,world[wrist])
+    ik_ctrl=build.curve(ik_ctrl_name,shape_points('square',ikfkShapes.control_size('ik',lengths)),1)
+    build.modifier.reparentNode(ik_ctrl,ik_group)
+    build.constraint('orientConstraint',ik_ctrl,ik_ctrl_name,ik[wrist],ik_names[wrist],False,True)
+    build.channels.append((ik_ctrl_name,ikfkChannels.IK_CONTROL))
+
+    pole_matrix=om.MMatrix(ikfkPoleVector.pole_vector_matrix(*positions))
+    pole_name=elbow+'_IK_PoleVec'
+    pole_group=build.create('transform',elbow+'_IK_PoleVectorGrp')
+    build.set_transform(pole_group,pole_matrix)
+    pole_vec=build.create('transform',pole_name,pole_group)
+    build.create('locator',pole_name+'Shape',pole_vec)
+    build.channels.append((pole_name,ikfkChannels.POLE_VECTOR))
+    build.set(ik[shoulder],'visibility',False)
+
+    handle=wrist+'_IK_Handle'
+    build.modifier.commandToExecute('ikHandle -sol ikRPsolver -sj "%s" -ee "%s" -n "%s"' % (ik_names[shoulder],ik_names[wrist],handle))
+    build.modifier.commandToExecute('parent "%s" "%s"' % (handle,ik_ctrl_name))
+    build.modifier.commandToExecute('setAttr "%s.v" 0' % handle)
+    build.modifier.commandToExecute('poleVectorConstraint "%s" "%s"' % (pole_name,handle))
+
+    # d. FK controls, parented along the chain, each driving its joint through a parentConstraint
+    fk_groups=[]
+    fk_ctrls={}
+    for path,name,parent_index in fk_chain:
+        ctrl_name=name+'_FK_Ctrl'
+        size=ikfkShapes.control_size('shoulder' if parent_index is None else role(name),lengths)
+        group=build.create('transform',ctrl_name+'Grp')
+        ctrl=build.curve(ctrl_name,shape_points('circle',size),3)
+        build.modifier.reparentNode(ctrl,group)
+        if parent_index is None:
+            build.set_transform(group,world[name])
+        else:
+            parent_name=fk_chain[parent_index][1]
+            build.modifier.reparentNode(group,fk_ctrls[parent_name])
+            build.set_transform(group,without_scale(world[name])*without_scale(world[parent_name]).inverse())
+        build.constraint('parentConstraint',ctrl,ctrl_name,fk[name],fk_names[name],False,True)
+        build.channels.append((ctrl_name,ikfkChannels.FK_CONTROL))
+        fk_groups.append(group)
+        fk_ctrls[name]=ctrl
+
+    # e. No FK pole vector rig, ikTofk() computes it from the FK chain
+    build.set(fk[shoulder],'visibility',False)
+
+    # f. Switch control above the original wrist
+    switch_name='IK_FK_Switch_Ctrl'
+    wrist_matrix=without_scale(world[wrist])
+    lifted=om.MVector(0.0,2.0,0.0)*wrist_matrix
+    translate,rotate,scale=decompose(world[wrist])
+    switch_matrix=compose(om.MVector(*translate)+lifted,rotate,scale)
+    switch=build.curve(switch_name,shape_points('switch',ikfkShapes.control_size('switch',lengths)),1)
+    build.set_transform(switch,switch_matrix)
+    build.add_float(switch,'ikFkSwitch',0.5,0.0,1.0)
+    wrist_node=dag_path(wrist).node()
+    build.constraint('parentConstraint',wrist_node,wrist,switch,switch_name,True,False,
+                     without_scale(switch_matrix)*wrist_matrix.inverse())
+    build.channels.append((switch_name,ikfkChannels.SWITCH_CONTROL))
+
+    # g. blendColors between the FK and IK rotations, driven by the switch
+    for name in (shoulder,elbow,wrist):
+        blend=build.create_dg('blendColors',name+'Blend')
+        build.connect(fk[name],'rotate',blend,'color1')
+        build.connect(ik[name],'rotate',blend,'color2')
+        build.connect(switch,'ikFkSwitch',blend,'blender')
+        build.connect(blend,'output',dag_path(name).node(),'rotate')
+
+    # h. Visibility of the FK and IK controls
+    fk_condition=build.create_dg('condition','FK_Condition')
+    ik_condition=build.create_dg('condition','IK_Condition')
+    for group in fk_groups:
+        build.connect(fk_condition,'outColorR',group,'visibility')
+    build.connect(switch,'ikFkSwitch',fk_condition,'firstTerm')
+    build.connect(switch,'ikFkSwitch',ik_condition,'firstTerm')
+    build.set(fk_condition,'secondTerm',0.0)
+    build.set(ik_condition,'secondTerm',1.0)
+    build.connect(ik_condition,'outColorR',pole_vec,'visibility')
+    build.connect(ik_condition,'outColorR',ik_ctrl,'visibility')
+
+    # i. Message links of the controls, joints and switch used by the match functions
+    for key,node in (('ik_control',ik_ctrl),('pole_vector',pole_vec)):
+        build.link(switch,dict(ikfkLinks.RIG_LINKS)[key],node)
+    for role,name in (('shoulder',shoulder),('elbow',elbow),('wrist',wrist)):
+        for suffix,node in (('IkJoint',ik[name]),('FkJoint',fk[name]),('FkControl',fk_ctrls[name])):
+            build.link(switch,ikfkLinks.chain_link(role,suffix),node)
+    for control in [ik_ctrl,pole_vec]+[fk_ctrls[name] for name in (shoulder,elbow,wrist)]:
+        build.link(control,ikfkLinks.SWITCH_LINK,switch)
+
+    # j. One doIt() for the whole arm
+    build.commit()
+    return build
+
+#----------------------------------------
+#        Comparison with cmds Build
+#----------------------------------------
+
+def rig_connections(nodes):
+    connections=set()
+    for node in nodes:
+        plugs=cmds.listConnections(node,c=True,p=True,s=False) or []
+        for source,target in zip(plugs[::2],plugs[1::2]):
+            connections.add((source,target))
+    return connections
+
+def benchmark(arms=50):
+    import ikfkBackend
+    import ikfkFakeScene
+    import ikfkGen
+    results={}
+    connections={}
+    for engine in ('cmds','api'):
+        # a. A fresh scene with the same skeletons for each engine
+        cmds.file(new=True,force=True)
+        shoulders=[ikfkFakeScene.create_arm_skeleton(ikfkBackend.cmds,'L'+str(i),offset=(0.0,0.0,200.0*i)) for i in range(arms)]
+        before=set(cmds.ls())
+        start=time.time()
+        for shoulder in shoulders:
+            if engine=='cmds':
+                ikfkGen.build_arm(shoulder)
+            else:
+                build_arm(shoulder)
+        results[engine]=time.time()-start
+        created=set(cmds.ls())-before
+        connections[engine]=(created,rig_connections(created))
+    same_nodes=connections['cmds'][0]==connections['api'][0]
+    print('cmds build: %.3fs for %d arms' % (results['cmds'],arms))
+    print('API build:  %.3fs for %d arms (%.1fx faster)' % (results['api'],arms,results['cmds']/max(results['api'],1e-9)))
+    print('same node names: %s, connections only in cmds build: %d, only in API build: %d' % (
+        same_nodes,len(connections['cmds'][1]-connections['api'][1]),len(connections['api'][1]-connections['cmds'][1])))
+    return results
@@ -0,0 +1,477 @@
+'''
+The following script will split the IK/FK build into a plan and an apply phase. The plan phase runs the build once and
+resolves what it made into a build spec, a plain JSON document of records: the nodes the build left in the scene (type,
+name, parent), the attributes it added, the final local values of their transforms and of every attribute the build
+set, the IK handles and constraints, the connections and the channel locks. Every decision (which joints to keep,
+names, control sizes, the pole vector placement, where matchTransform or xform put a node) is already resolved in it.
+The apply phase creates the records as they are: nothing is selected, matched, measured or moved into place.
+
+Specs are cached by a hash of what the build reads from the source chain: its role listing, the joint values of the
+shoulder, elbow and wrist (and of the extra joints the chains keep), the world matrix of the shoulder's parent and the
+build options. When an arm is rebuilt and its hash is in the cache, only the apply phase runs.
+
+    import ikfkPlan
+    cache=ikfkPlan.PlanCache('plans')                      # JSON files on disk, or PlanCache() in memory only
+    ikfkPlan.build_arm('L_shoulder',cache=cache)           # planned and applied, the spec goes into the cache
+    ikfkPlan.build_arm('L_shoulder',cache=cache)           # later, on the unchanged arm: applied from the cache
+
+plan_arm(shoulder) returns the spec of an arm without changing the scene, apply_plan(spec) applies one.
+python ikfkBench.py plan compares applying a spec with a plain build of the same arms.
+'''
+
+import hashlib
+import json
+import os
+import time
+
+import ikfkBackend
+import ikfkChannels
+import ikfkTransaction
+from ikfkBackend import cmds
+
+VERSION=2
+# The commands that edit the scene; queries (and any command run with q=True) are left out of a recording
+EDITS=('addAttr','aimConstraint','circle','connectAttr','createNode','curve','delete','disconnectAttr','duplicate',
+       'group','ikHandle','joint','lockHideAttrs','makeIdentity','matchTransform','move','orientConstraint','parent',
+       'parentConstraint','pointConstraint','poleVectorConstraint','rename','rotate','scale','select','setAttr',
+       'shadingNode','spaceLocator','xform')
+# Commands creating plain nodes: a spec creates what they made with createNode (shadingNode for utilities)
+NODE_COMMANDS=('createNode','duplicate','group','joint','shadingNode')
+# Commands creating a transform with its shape; their flags (the CVs of a curve) are kept as the record of the shape
+SHAPE_COMMANDS=('circle','curve','spaceLocator')
+CONSTRAINTS=('aimConstraint','orientConstraint','parentConstraint','pointConstraint','poleVectorConstraint')
+# Flags of ikHandle naming joints, and of setAttr changing the state of a channel instead of its value
+JOINT_FLAGS=('sj','startJoint','ee','endEffector')
+CHANNEL_FLAGS=('lock','l','keyable','k','channelBox','cb')
+# Transform values of created nodes kept in a spec when they differ from these; joints keep all of ikfkGen.JOINT_ATTRS
+TRANSFORM_DEFAULTS=(('translate',[0.0,0.0,0.0]),('rotate',[0.0,0.0,0.0]),('scale',[1.0,1.0,1.0]))
+# Hits and misses of every cached build of this session
+stats={'hits':0,'misses':0,'plan_seconds':0.0,'apply_seconds':0.0}
+
+#----------------------------------------
+#            Build Recording
+#----------------------------------------
+
+def plain(value):
+    # a. JSON friendly copies of command arguments: tuples to lists, NumPy numbers to floats
+    if isinstance(value,(list,tuple)):
+        return [plain(item) for item in value]
+    if isinstance(value,dict):
+        return dict((key,plain(item)) for key,item in value.items())
+    if isinstance(value,(bool,int,float,str)) or value is None:
+        return value
+    if hasattr(value,'item'):
+        return value.item()
+    return str(value)
+
+class RecordingBackend(object):
+    # Forwards every command to the wrapped backend and appends the scene edits to a list of operations
+    def __init__(self,backend):
+        self._backend=backend
+        self.operations=[]
+
+    def __getattr__(self,name):
+        command=getattr(self._backend,name)
+        if name not in EDITS or not callable(command):
+            return command
+
+        def record(*args,**kwargs):
+            result=command(*args,**kwargs)
+            if not kwargs.get('q',kwargs.get('query',False)):
+                self.operations.append([name,plain(args),plain(kwargs),plain(result)])
+            return result
+        return record
+
+    def lockHideAttrs(self,plugs,lock=True,keyable=False,channelBox=False):
+        # a. The channel batch goes through MPlug in Maya, not through a command, so it is recorded here for every backend
+        self.operations.append(['lockHideAttrs',[plain(plugs)],{},None])
+        with ikfkBackend.use_backend(self._backend):
+            ikfkChannels.lock_hide(plugs)
+
+def record_operations(shoulder,**options):
+    # a. Builds the arm for real through a recording backend and returns the edits it made, in order
+    import ikfkGen
+    recorder=RecordingBackend(ikfkBackend.get_backend())
+    with ikfkBackend.use_backend(recorder):
+        ikfkGen.build_arm(shoulder,**options)
+    return recorder.operations
+
+#----------------------------------------
+#            Spec Records
+#----------------------------------------
+
+def flat_names(args):
+    names=[]
+    for arg in args:
+        if isinstance(arg,list):
+            names.extend(flat_names(arg))
+        elif isinstance(arg,str):
+            names.append(arg)
+    return names
+
+class BuildLog(object):
+    # The nodes a recorded build created, by id in the order of creation, followed through renames and deletes
+    def __init__(self):
+        self.names=[]
+        self.kinds=[]
+        self.current={}
+        self.deleted=set()
+        self.selection=[]
+
+    def create(self,name,command,flags):
+        self.names.append(name)
+        self.kinds.append([command,flags])
+        self.current[name]=len(self.names)-1
+        self.selection=[len(self.names)-1]
+        return len(self.names)-1
+
+    def ref(self,name):
+        # a. A node ('node', '|parent|node') as the id of a created node, or as its name when it was there before
+        short=name.split('|')[-1]
+        return self.current.get(short,short)
+
+    def plug(self,plug):
+        node,dot,attr=plug.partition('.')
+        return [self.ref(node),attr]
+
+    def rename(self,name,new):
+        ref=self.ref(name)
+        if isinstance(ref,int):
+            del self.current[self.names[ref]]
+            self.names[ref]=new
+            self.current[new]=ref
+
+    def delete(self,names):
+        for ref in [self.ref(name) for name in names]:
+            if isinstance(ref,int):
+                self.deleted.add(ref)
+                del self.current[self.names[ref]]
+
+def read_log(operations):
+    # a. What the recorded edits created and set, with created nodes as ids; moves and matches are left to the values
+    log=BuildLog()
+    attributes,plugs,channels,connections,locks=[],[],[],[],[]
+    for command,args,kwargs,result in operations:
+        created=result if isinstance(result,list) else [result] if isinstance(result,str) else []
+        edit=kwargs.get('e',kwargs.get('edit',False))
+        flags=dict((key,value) for key,value in kwargs.items() if key not in ('n','name'))
+        if command=='rename' or command=='joint' and edit:
+            new=result if command=='rename' else kwargs.get('name',kwargs.get('n'))
+            if new:
+                log.rename(args[0],new)
+        elif command in NODE_COMMANDS:
+            for name in created:
+                log.create(name,'shadingNode' if command=='shadingNode' else 'createNode',{'asUtility':True} if command=='shadingNode' else {})
+        elif command in SHAPE_COMMANDS:
+            log.create(created[0],command,flags)
+        elif command=='ikHandle':
+            flags=dict((key,log.ref(value) if key in JOINT_FLAGS else value) for key,value in flags.items())
+            log.create(created[0],'ikHandle',flags)
+            log.create(created[1],'effector',{})
+        elif command in CONSTRAINTS:
+            names=flat_names(args) or [log.names[ref] if isinstance(ref,int) else ref for ref in log.selection]
+            # a.1 Without a name the constraint is named after the node it drives, as when it was recorded
+            log.create(created[0],command,{'targets':[log.ref(name) for name in names[:-1]],'driven':log.ref(names[-1]),'flags':kwargs})
+        elif command=='select':
+            selected=[log.ref(name) for name in flat_names(args)]
+            log.selection=[] if kwargs.get('cl',kwargs.get('clear')) else log.selection+selected if kwargs.get('add') else selected
+        elif command=='delete':
+            log.delete(flat_names(args) or [log.names[ref] if isinstance(ref,int) else ref for ref in log.selection])
+        elif command=='addAttr':
+            for ref in [log.ref(name) for name in flat_names(args)] or log.selection:
+                attributes.append([ref,kwargs])
+        elif command=='setAttr':
+            if len(args)>1:
+                plugs.append([log.plug(args[0]),kwargs.get('type')])
+            state=dict((key,value) for key,value in kwargs.items() if key in CHANNEL_FLAGS)
+            if state:
+                channels.append([log.plug(args[0]),state])
+        elif command=='connectAttr':
+            connections.append([log.plug(args[0]),log.plug(args[1]),kwargs])
+        elif command=='disconnectAttr':
+            source,target=log.plug(args[0]),log.plug(args[1])
+            connections=[item for item in connections if item[:2]!=[source,target]]
+        elif command=='lockHideAttrs':
+            locks.extend(log.plug(plug) for plug in args[0])
+        # a.1 The CVs of a shape are recorded when it is created, so an edit of them afterwards has no record
+        elif command=='makeIdentity' or command=='scale' and any('.' in name for name in flat_names(args)):
+            raise ValueError('%s changes the CVs of a control after its creation, the build cannot be planned.' % command)
+    return log,attributes,plugs,channels,connections,locks
+
+def plug_values(plugs):
+    # a. Values as setAttr takes them back, compounds as a flat list
+    backend=ikfkBackend.get_backend()
+    # a.1 Backends with a native batch (the in-memory scene) evaluate the rig once for all of them
+    if hasattr(backend,'getAttrs'):
+        return plain(backend.getAttrs(plugs,[cmds.currentTime(q=True)])[0])
+    values=[cmds.getAttr(plug) for plug in plugs]
+    return plain([list(value[0]) if isinstance(value,list) and value and isinstance(value[0],tuple) else value for value in values])
+
+
+def resolve(operations):
+    # a. The records of the nodes a recorded build left in the scene, with their final names, parents and values
+    import ikfkGen
+    log,attributes,plugs,channels,connections,locks=read_log(operations)
+    alive=dict((name,ref) for ref,name in enumerate(log.names) if ref not in log.deleted and cmds.objExists(name))
+    alive=set(alive.values())
+    external=set()
+
+    def name_of(ref):
+        if isinstance(ref,int):
+            return log.names[ref]
+        external.add(ref)
+        return ref
+
+    def kept(*refs):
+        return all(ref in alive for ref in refs if isinstance(ref,int))
+
+    def parent_of(ref):
+        parent=cmds.listRelatives(log.names[ref],p=True)
+        return log.ref(parent[0]) if parent else None
+
+    # b. Plain and shape nodes below their parents, so each one is created in place
+    order=[]
+
+    def place(ref):
+        if ref in order:
+            return
+        parent=parent_of(ref)
+        if parent in alive and log.kinds[parent][0] in ('createNode','shadingNode')+SHAPE_COMMANDS:
+            place(parent)
+        order.append(ref)
+
+    for ref in sorted(alive):
+        if log.kinds[ref][0] in ('createNode','shadingNode')+SHAPE_COMMANDS:
+            place(ref)
+    # c. The values to keep, read in one pass: (node, attr, setAttr type, default it is left out at)
+    wanted=[]
+    for ref in sorted(alive):
+        name=log.names[ref]
+        if log.kinds[ref][0] in ('effector',)+CONSTRAINTS or not cmds.attributeQuery('translate',node=name,exists=True):
+            continue
+        if cmds.nodeType(name)=='joint':
+            wanted.extend((ref,attr,None,None) for attr in ikfkGen.JOINT_ATTRS if cmds.attributeQuery(attr,node=name,exists=True))
+        else:
+            wanted.extend((ref,attr,None,default) for attr,default in TRANSFORM_DEFAULTS)
+    wanted.extend((ref,attr,value_type,None) for (ref,attr),value_type in plugs if kept(ref))
+    # c.1 Each by the record that sets it: handles and constraints get theirs once they exist, all others before
+    values=dict((ref,[]) for ref in alive)
+    values[None]=[]
+    seen=set()
+    for (ref,attr,value_type,default),value in zip(wanted,plug_values([name_of(ref)+'.'+attr for ref,attr,value_type,default in wanted])):
+        plug=name_of(ref)+'.'+attr
+        if plug in seen or default is not None and all(abs(a-b)<=1e-9 for a,b in zip(value,default)):
+            continue
+        seen.add(plug)
+        if ref in alive and log.kinds[ref][0] in ('ikHandle',)+CONSTRAINTS:
+            values[ref].append([attr,value,value_type])
+        else:
+            values[None].append([plug,value,value_type])
+    # d. The records, by the order they are applied in
+    spec={'nodes':[],'attributes':[],'values':values[None],'handles':[],'constraints':[],'connections':[],'channels':[]}
+    for ref in order:
+        command,flags=log.kinds[ref]
+        node_type=cmds.nodeType(log.names[ref]) if command in ('createNode','shadingNode') else None
+        parent=parent_of(ref)
+        spec['nodes'].append([log.names[ref],command,node_type,flags,None if parent is None else name_of(parent)])
+    for ref in sorted(alive):
+        command,flags=log.kinds[ref]
+        # d.1 ikHandle creates its effector right after the handle
+        if command=='ikHandle':
+            parent=parent_of(ref)
+            flags=dict((key,name_of(value) if key in JOINT_FLAGS else value) for key,value in flags.items())
+            spec['handles'].append([log.names[ref],log.names[ref+1],flags,None if parent is None else name_of(parent),values[ref]])
+        elif command in CONSTRAINTS:
+            spec['constraints'].append([log.names[ref],command,[name_of(target) for target in flags['targets']],
+                                        name_of(flags['driven']),flags['flags'],values[ref]])
+    spec['attributes']=[[name_of(ref),flags] for ref,flags in attributes if kept(ref)]
+    spec['connections']=[[name_of(source)+'.'+source_attr,name_of(target)+'.'+target_attr,flags]
+                         for (source,source_attr),(target,target_attr),flags in connections if kept(source,target)]
+    spec['channels']=[[name_of(ref)+'.'+attr,state] for (ref,attr),state in channels if kept(ref)]
+    spec['locks']=[name_of(ref)+'.'+attr for ref,attr in locks if kept(ref)]
+    spec['external']=sorted(external)
+    return spec
+
+#----------------------------------------
+#              Spec Keys
+#----------------------------------------
+
+def rounded(value):
+    # a. Float noise gives the same key
+    if isinstance(value,list):
+        return [rounded(item) for item in value]
+    return round(value,6) if isinstance(value,float) else value
+
+def source_key(shoulder,**options):
+    # a. What the build reads from the source chain: the role listing of its joints (one hierarchy query, as in the
+    #    build), the joint values of the shoulder, elbow and wrist and of the extra joints the chains keep, the world
+    #    matrix of the shoulder's parent the controls are placed below, and the options
+    import ikfkGen
+    import ikfkRoles
+    roles=ikfkRoles.JointRoleIndex(options.get('role_table')).scan('original',shoulder)
+    listing=[[joint,roles.role(joint),roles.parent(joint)] for joint in roles.joints()]
+    values=ikfkGen.chain_values(roles) if all(roles.joint(role) for role in ikfkRoles.ROLES) else []
+    values+=[(extra,[(attr,cmds.getAttr(extra+'.'+attr)) for attr in ('translate','rotate','jointOrient')]) for extra in roles.extras()]
+    parent=cmds.listRelatives(shoulder,p=True,f=True)
+    parent_matrix=cmds.xform(parent[0],q=True,ws=True,m=True) if parent else None
+    text=json.dumps([VERSION,shoulder,listing,rounded(plain(values)),parent,rounded(plain(parent_matrix)),plain(options)],sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+#----------------------------------------
+#          Plan and Apply
+#----------------------------------------
+
+def record_build(shoulder,**options):
+    # a. Builds the arm for real and returns the spec of what the build left in the scene
+    key=source_key(shoulder,**options)
+    start=time.time()
+    spec=resolve(record_operations(shoulder,**options))
+    spec.update({'version':VERSION,'key':key,'shoulder':shoulder,'options':plain(options)})
+    stats['plan_seconds']+=time.time()-start
+    return spec
+
+def plan_arm(shoulder,**options):
+    # a. The spec of an arm, with the build rolled back again so the scene is left as it was
+    with ikfkTransaction.BuildTransaction('ikfkPlan '+shoulder) as transaction:
+        spec=record_build(shoulder,**options)
+    transaction.rollback()
+    return spec
+
+def renamed(value,names):
+    # a. Names in an argument ('node', 'node.attr', '|parent|node') replaced by what the apply actually created
+    if isinstance(value,list):
+        return [renamed(item,names) for item in value]
+    if isinstance(value,dict):
+        return dict((key,renamed(item,names)) for key,item in value.items())
+    if not names or not isinstance(value,str):
+        return value
+    node,dot,attr=value.partition('.')
+    return '|'.join(names.get(part,part) for part in node.split('|'))+dot+attr
+
+def replay(operations):
+    # a. Runs recorded edits in order; nodes that get another name than when they were recorded are followed
+    names={}
+    for command,args,kwargs,result in operations:
+        args,kwargs=renamed(args,names),renamed(kwargs,names)
+        if command=='lockHideAttrs':
+            ikfkChannels.lock_hide(args[0])
+            continue
+        actual=getattr(cmds,command)(*args,**kwargs)
+        # a.1 A command creating nodes has to create as many as it did when the edits were recorded
+        if isinstance(result,list) and result and isinstance(result[0],str):
+            actual=actual if isinstance(actual,list) else [actual]
+            if len(actual)!=len(result):
+                raise RuntimeError('%s created %d node(s) instead of %d, the edits do not fit this scene.' % (command,len(actual),len(result)))
+            names.update((old,new) for old,new in zip(result,actual) if old!=new)
+        elif isinstance(result,str) and isinstance(actual,str) and actual!=result:
+            names[result]=actual
+    return names
+
+def set_value(plug,value,value_type=None):
+    if value_type=='matrix' or not isinstance(value,list):
+        cmds.setAttr(plug,value,**({'type':value_type} if value_type else {}))
+    else:
+        cmds.setAttr(plug,*value,**({'type':value_type} if value_type else {}))
+
+def create_records(spec):
+    # a. Creates the records of a spec in order; nodes that get another name than in the spec are followed
+    names={}
+
+    def follow(name,actual):
+        actual=actual[0] if isinstance(actual,list) else actual
+        if actual!=name:
+            names[name]=actual
+        return actual
+
+    for name,command,node_type,flags,parent in spec['nodes']:
+        if command in ('createNode','shadingNode'):
+            kwargs=dict(flags,name=name)
+            if parent:
+                kwargs['parent']=renamed(parent,names)
+            follow(name,getattr(cmds,command)(node_type,**kwargs))
+        else:
+            node=follow(name,getattr(cmds,command)(n=name,**flags))
+            if parent:
+                cmds.parent(node,renamed(parent,names),r=True)
+    for node,flags in spec['attributes']:
+        cmds.addAttr(renamed(node,names),**flags)
+    for plug,value,value_type in spec['values']:
+        set_value(renamed(plug,names),value,value_type)
+    for name,effector,flags,parent,values in spec['handles']:
+        handle,actual=cmds.ikHandle(n=name,**renamed(flags,names))
+        follow(effector,actual)
+        handle=follow(name,handle)
+        if parent:
+            cmds.parent(handle,renamed(parent,names))
+        for attr,value,value_type in values:
+            set_value(handle+'.'+attr,value,value_type)
+    for name,command,targets,driven,flags,values in spec['constraints']:
+        constraint=follow(name,getattr(cmds,command)(renamed(targets,names),renamed(driven,names),**flags))
+        for attr,value,value_type in values:
+            set_value(constraint+'.'+attr,value,value_type)
+    for source,target,flags in spec['connections']:
+        cmds.connectAttr(renamed(source,names),renamed(target,names),**flags)
+    for plug,state in spec['channels']:
+        cmds.setAttr(renamed(plug,names),**state)
+    if spec['locks']:
+        ikfkChannels.lock_hide(renamed(spec['locks'],names))
+    return names
+
+def apply_plan(spec):
+    # a. Creates the records of a spec in one transaction
+    if spec.get('version')!=VERSION:
+        raise ValueError('Build spec version %s is not supported.' % spec.get('version'))
+    missing=[node for node in spec['external'] if not cmds.objExists(node)]
+    if missing:
+        raise RuntimeError('The spec of %s needs %s, it does not fit this scene.' % (spec['shoulder'],', '.join(missing)))
+    start=time.time()
+    with ikfkTransaction.BuildTransaction('ikfkApply '+spec['shoulder']):
+        create_records(spec)
+    stats['apply_seconds']+=time.time()-start
+    return len(spec['nodes'])+len(spec['handles'])+len(spec['constraints'])
+
+#----------------------------------------
+#             Spec Cache
+#----------------------------------------
+
+class PlanCache(object):
+    # Specs by key in memory and, with a directory, as <key>.json files shared between sessions and batch workers
+    def __init__(self,directory=None):
+        self.directory=directory
+        self.specs={}
+
+    def path(self,key):
+        return os.path.join(self.directory,key+'.json')
+
+    def get(self,key):
+        if key not in self.specs and self.directory and os.path.exists(self.path(key)):
+            with open(self.path(key)) as handle:
+                self.specs[key]=json.load(handle)
+        return self.specs.get(key)
+
+    def put(self,spec):
+        self.specs[spec['key']]=spec
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(self.path(spec['key']),'w') as handle:
+                json.dump(spec,handle,separators=(',',':'))
+
+CACHE=PlanCache()
+
+def build_arm(shoulder,cache=None,**options):
+    # a. Applies the cached spec of an unchanged arm, otherwise builds it and caches the spec of that build
+    cache=CACHE if cache is None else cache
+    spec=cache.get(source_key(shoulder,**options))
+    if spec is not None:
+        try:
+            apply_plan(spec)
+            stats['hits']+=1
+            return spec
+        # a.1 A spec that no longer fits the scene has been rolled back, the arm is planned again
+        except RuntimeError:
+            pass
+    stats['misses']+=1
+    spec=record_build(shoulder,**options)
+    cache.put(spec)
+    return spec
@@ -0,0 +1,74 @@
+'''
+The following script will place the pole vectors of IK arms in closed form. The pole vector sits off the elbow in the
+plane of the chain, on the side the elbow bends to, at a distance proportional to the length of the chain; its Z axis
+looks back at the elbow and its Y axis follows world up, the orientation the aimConstraint used to give the locator.
+
+Every function takes arrays of N chains, so one call places the pole vectors of a whole batch of arms:
+
+    matrices=ikfkPoleVector.pole_vector_matrices(shoulders,elbows,wrists)    # (N,3) positions -> (N,4,4)
+'''
+
+import numpy as np
+
+# Distance between the elbow and the pole vector, as a fraction of the chain length (upper arm + forearm)
+DISTANCE=0.5
+# Direction the pole vector goes to when the chain is straight and has no bend to follow: behind the arm
+STRAIGHT_CHAIN_HINT=(0.0,0.0,-1.0)
+WORLD_UP=(0.0,1.0,0.0)
+EPSILON=1e-8
+
+#----------------------------------------
+#            Vector Helpers
+#----------------------------------------
+
+def _normalize(vectors):
+    lengths=np.linalg.norm(vectors,axis=-1,keepdims=True)
+    return vectors/np.maximum(lengths,EPSILON)
+
+def _reject(vectors,axes):
+    # a. The part of each vector perpendicular to its (unit) axis
+    return vectors-axes*np.sum(vectors*axes,axis=-1,keepdims=True)
+
+#----------------------------------------
+#        Pole Vector Placement
+#----------------------------------------
+
+def bend_directions(shoulders,elbows,wrists,hint=STRAIGHT_CHAIN_HINT):
+    # a. From the shoulder - wrist line to the elbow: the direction the arm bends to, in the plane of the chain
+    shoulders,elbows,wrists=[np.asarray(points,dtype=float).reshape(-1,3) for points in (shoulders,elbows,wrists)]
+    axes=_normalize(wrists-shoulders)
+    bend=_reject(elbows-shoulders,axes)
+    # b. A straight chain has no bend, the hint (perpendicular to the chain) is used instead
+    lengths=np.linalg.norm(bend,axis=-1,keepdims=True)
+    fallback=_reject(np.broadcast_to(np.asarray(hint,dtype=float),bend.shape),axes)
+    fallback=np.where(np.linalg.norm(fallback,axis=-1,keepdims=True)>EPSILON,fallback,_reject(np.broadcast_to(np.asarray(WORLD_UP,dtype=float),bend.shape),axes))
+    return _normalize(np.where(lengths>EPSILON*np.linalg.norm(wrists-shoulders,axis=-1,keepdims=True),bend,fallback))
+
+def pole_vector_positions(shoulders,elbows,wrists,distance=DISTANCE):
+    shoulders,elbows,wrists=[np.asarray(points,dtype=float).reshape(-1,3) for points in (shoulders,elbows,wrists)]
+    chain_lengths=np.linalg.norm(elbows-shoulders,axis=-1,keepdims=True)+np.linalg.norm(wrists-elbows,axis=-1,keepdims=True)
+    return elbows+bend_directions(shoulders,elbows,wrists)*chain_lengths*distance
+
+def pole_vector_matrices(shoulders,elbows,wrists,distance=DISTANCE):
+    # a. World matrices (row vectors, translation in the last row, like xform(q=True,m=True)) of N pole vectors
+    shoulders,elbows,wrists=[np.asarray(points,dtype=float).reshape(-1,3) for points in (shoulders,elbows,wrists)]
+    positions=pole_vector_positions(shoulders,elbows,wrists,distance)
+    # b. Z looks back at the elbow, Y towards world up, X completes the frame
+    z=_normalize(elbows-positions)
+    up=np.broadcast_to(np.asarray(WORLD_UP,dtype=float),z.shape)
+    y=_reject(up,z)
+    # b.1 A pole vector straight above or below the elbow keeps world Z as its up
+    y=np.where(np.linalg.norm(y,axis=-1,keepdims=True)>EPSILON,y,_reject(np.broadcast_to(np.array([0.0,0.0,1.0]),z.shape),z))
+    y=_normalize(y)
+    x=np.cross(y,z)
+    matrices=np.zeros((len(positions),4,4))
+    matrices[:,0,:3]=x
+    matrices[:,1,:3]=y
+    matrices[:,2,:3]=z
+    matrices[:,3,:3]=positions
+    matrices[:,3,3]=1.0
+    return matrices
+
+def pole_vector_matrix(shoulder,elbow,wrist,distance=DISTANCE):
+    # a. One chain: the flat 16 values xform(m=...) takes
+    return [float(value) for value in pole_vector_matrices(shoulder,elbow,wrist,distance)[0].ravel()]
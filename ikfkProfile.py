@@ -0,0 +1,191 @@
+'''
+The following script will profile an IK/FK build command by command. While profiling, every scene command ikfkGen.py
+issues goes through a recording backend, and the build stages (ik_generator, fk_generator, switch_generator, ...) are
+tracked, so each command is counted and timed against the stage that issued it. The result can be written as a JSON
+summary and as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+
+In Maya:
+    import ikfkProfile
+    with ikfkProfile.profile() as prof:
+        ikfkGen.create_joints()
+    prof.write_json('build_profile.json')
+    prof.write_trace('build_trace.json')
+
+Without Maya:
+    python ikfkProfile.py --arms 10 --json build_profile.json --trace build_trace.json
+'''
+
+import argparse
+import contextlib
+import functools
+import json
+import time
+
+import ikfkBackend
+
+STAGES=('create_joints','build_arm','ik_generator','fk_generator','switch_generator','ikTofk','fkToik')
+
+#----------------------------------------
+#          Recording Backend
+#----------------------------------------
+
+class RecordingBackend(object):
+    # Forwards every command to the wrapped backend and reports its duration to the profiler
+    def __init__(self,backend,profiler):
+        self._backend=backend
+        self._profiler=profiler
+        self._commands={}
+
+    def __getattr__(self,name):
+        command=getattr(self._backend,name)
+        if not callable(command):
+            return command
+        if name not in self._commands:
+            profiler=self._profiler
+
+            @functools.wraps(command)
+            def record(*args,**kwargs):
+                start=time.time()
+                try:
+                    return command(*args,**kwargs)
+                finally:
+                    profiler.record(name,kwargs,start,time.time()-start)
+            self._commands[name]=record
+        return self._commands[name]
+
+#----------------------------------------
+#               Profiler
+#----------------------------------------
+
+class Profiler(object):
+    def __init__(self):
+        self.origin=time.time()
+        self.calls=[]
+        self.spans=[]
+        self.stack=[]
+
+    def record(self,command,kwargs,start,seconds):
+        stage=self.stack[-1] if self.stack else '<none>'
+        flags=' '.join('-'+flag for flag in sorted(kwargs))
+        self.calls.append((command,flags,stage,start-self.origin,seconds))
+
+    @contextlib.contextmanager
+    def stage(self,name):
+        self.stack.append(name)
+        start=time.time()
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            self.spans.append((name,len(self.stack),start-self.origin,time.time()-start))
+
+    def wrap_stage(self,name,function):
+        @functools.wraps(function)
+        def staged(*args,**kwargs):
+            with self.stage(name):
+                return function(*args,**kwargs)
+        return staged
+
+    #-------------- reports ------------------
+
+    def summary(self):
+        # a. Totals per stage, per command within each stage and per command overall
+        stages={}
+        commands={}
+        for command,flags,stage,start,seconds in self.calls:
+            entry=stages.setdefault(stage,{'calls':0,'seconds':0.0,'commands':{}})
+            entry['calls']+=1
+            entry['seconds']+=seconds
+            item=entry['commands'].setdefault(command,{'calls':0,'seconds':0.0,'variants':{}})
+            item['calls']+=1
+            item['seconds']+=seconds
+            # a.1 Calls are also split by the flags they were given, e.g. setAttr -lock -keyable -channelBox
+            item['variants'][flags]=item['variants'].get(flags,0)+1
+            item=commands.setdefault(command,{'calls':0,'seconds':0.0})
+            item['calls']+=1
+            item['seconds']+=seconds
+        wall={}
+        for name,depth,start,seconds in self.spans:
+            wall[name]=wall.get(name,0.0)+seconds
+        for name,entry in stages.items():
+            entry['wall_seconds']=wall.get(name,0.0)
+        return {'total_calls':len(self.calls),
+                'command_seconds':sum(call[4] for call in self.calls),
+                'stages':stages,
+                'commands':commands}
+
+    def chrome_trace(self):
+        # a. Complete ('X') events in microseconds, stages on one track and commands nested below them
+        events=[]
+        for name,depth,start,seconds in self.spans:
+            events.append({'name':name,'cat':'stage','ph':'X','pid':1,'tid':1,
+                           'ts':start*1e6,'dur':seconds*1e6})
+        for command,flags,stage,start,seconds in self.calls:
+            events.append({'name':command,'cat':stage,'ph':'X','pid':1,'tid':1,
+                           'ts':start*1e6,'dur':seconds*1e6,'args':{'stage':stage,'flags':flags}})
+        events.sort(key=lambda event: (event['ts'],-event['dur']))
+        return {'traceEvents':events,'displayTimeUnit':'ms'}
+
+    def write_json(self,path):
+        with open(path,'w') as f:
+            json.dump(self.summary(),f,indent=2,sort_keys=True)
+
+    def write_trace(self,path):
+        with open(path,'w') as f:
+            json.dump(self.chrome_trace(),f)
+
+    def print_summary(self):
+        summary=self.summary()
+        print('%d scene commands, %.4fs spent in them' % (summary['total_calls'],summary['command_seconds']))
+        for stage,entry in sorted(summary['stages'].items(),key=lambda item: -item[1]['seconds']):
+            print('  %-18s %5d calls %9.4fs' % (stage,entry['calls'],entry['seconds']))
+            for command,item in sorted(entry['commands'].items(),key=lambda item: -item[1]['calls']):
+                print('      %-22s %5d calls %9.4fs' % (command,item['calls'],item['seconds']))
+
+#----------------------------------------
+#         Opt-in Instrumentation
+#----------------------------------------
+
+@contextlib.contextmanager
+def profile(module=None,stages=STAGES):
+    # a. The builder module, ikfkGen unless the functions live elsewhere (e.g. __main__ in the Script Editor)
+    if module is None:
+        import ikfkGen as module
+    profiler=Profiler()
+    originals={}
+    for name in stages:
+        if hasattr(module,name):
+            originals[name]=getattr(module,name)
+            setattr(module,name,profiler.wrap_stage(name,originals[name]))
+    previous=ikfkBackend.set_backend(RecordingBackend(ikfkBackend.get_backend(),profiler))
+    try:
+        yield profiler
+    finally:
+        ikfkBackend.set_backend(previous)
+        for name,function in originals.items():
+            setattr(module,name,function)
+
+def main(argv=None):
+    import ikfkBench
+    import ikfkGen
+    parser=argparse.ArgumentParser(description='Profile the IK/FK build on the in-memory scene.')
+    parser.add_argument('--arms',type=int,default=1,help='number of arms to build')
+    parser.add_argument('--json',default=None,help='write the JSON summary here')
+    parser.add_argument('--trace',default=None,help='write the Chrome trace here')
+    args=parser.parse_args(argv)
+
+    scene,shoulders=ikfkBench.arm_scene(args.arms)
+    with ikfkBackend.use_backend(scene):
+        with profile(ikfkGen) as profiler:
+            for shoulder in shoulders:
+                scene.select(shoulder)
+                ikfkGen.create_joints()
+    profiler.print_summary()
+    if args.json:
+        profiler.write_json(args.json)
+    if args.trace:
+        profiler.write_trace(args.trace)
+    return profiler
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,149 @@
+'''
+The following script will index the joints of an arm by role (shoulder, elbow, wrist, extra joints) so the build
+stages read the joints they need from the index instead of walking the hierarchy again with listRelatives and
+substring tests. The source chain is scanned once; the IK and FK chains are registered while create_joints()
+renames their duplicates, so every stage can look up a joint's original, IK and FK counterpart directly.
+
+The keywords that decide a joint's role come from a role table, so other naming conventions work too:
+
+    ikfkRoles.ROLE_TABLE=ikfkRoles.role_table(shoulder=('upperarm',),elbow=('lowerarm',),wrist=('hand',),discard=('twist','finger','thumb'))
+'''
+
+from ikfkBackend import cmds
+
+ROLES=('shoulder','elbow','wrist')
+
+#----------------------------------------
+#              Role Tables
+#----------------------------------------
+
+def role_table(shoulder=('shoulder',),elbow=('elbow',),wrist=('wrist',),discard=('forearm','palm','thum')):
+    # a. Checked in this order: discarded joints first, like the delete loops of create_joints()
+    return [('discard',tuple(discard)),('wrist',tuple(wrist)),('elbow',tuple(elbow)),('shoulder',tuple(shoulder))]
+
+ROLE_TABLE=role_table()
+
+def role_of(name,table=None):
+    # a. 'shoulder', 'elbow', 'wrist', 'discard' or 'extra' for any other joint
+    short=name.split('|')[-1].lower()
+    for role,keywords in (table or ROLE_TABLE):
+        if any(keyword.lower() in short for keyword in keywords):
+            return role
+    return 'extra'
+
+#----------------------------------------
+#           Joint Role Index
+#----------------------------------------
+
+class JointRoleIndex(object):
+    def __init__(self,table=None):
+        self.table=table or ROLE_TABLE
+        self.chains={}
+        self.queries=0
+
+    #-------------- registering --------------
+
+    def start(self,chain,root):
+        self.chains[chain]={'root':root,'root_path':None,'paths':{},'order':[],'cache':None}
+
+    def path_role(self,chain,path):
+        # a. A joint below a discarded joint goes away with it: 'discarded'
+        data=self.chains[chain]
+        names=path.split('|')
+        if data['root'] in names:
+            names=names[names.index(data['root'])+1:]
+        for name in names[:-1]:
+            if role_of(name,self.table)=='discard':
+                return 'discarded'
+        return role_of(names[-1],self.table)
+
+    def add(self,chain,path,name):
+        # a. Registers a joint of a chain by its full path at listing time and its final name
+        data=self.chains[chain]
+        data['paths'][path]=name
+        data['order'].append(path)
+        data['cache']=None
+
+    def remove(self,chain,name):
+        data=self.chains[chain]
+        for path,joint in list(data['paths'].items()):
+            if joint==name:
+                del data['paths'][path]
+                data['order'].remove(path)
+        data['cache']=None
+
+    def listing(self,chain,root):
+        # a. The one hierarchy query per chain: full paths, deepest first
+        self.start(chain,root)
+        self.queries+=1
+        return cmds.listRelatives(root,ad=True,type='joint',f=True) or []
+
+    def scan(self,chain,root):
+        # a. Indexes an existing chain as it is, e.g. the source arm
+        for path in self.listing(chain,root):
+            if self.path_role(chain,path) not in ('discard','discarded'):
+                self.add(chain,path,path.split('|')[-1])
+        return self
+
+    #-------------- lookups ------------------
+
+    def root_parent(self,chain='original'):
+        # a. Full path of the parent of the root, from the paths of the listing: no hierarchy query of its own
+        data=self.chains[chain]
+        for path in data['order']:
+            names=path.split('|')
+            if data['root'] in names:
+                return '|'.join(names[:names.index(data['root'])]) or None
+        return None
+
+    def data(self,chain):
+        data=self.chains[chain]
+        if data['cache'] is None:
+            # a. Parents and children from the registered paths, by final name
+            root=data['root']
+            parents={}
+            children={root:[]}
+            for path in data['order']:
+                name=data['paths'][path]
+                parent_path=path.rsplit('|',1)[0]
+                parent=data['paths'].get(parent_path,root)
+                parents[name]=parent
+                children.setdefault(parent,[]).append(name)
+                children.setdefault(name,[])
+            roles={'shoulder':root}
+            extras=[]
+            for path in data['order']:
+                role=self.path_role(chain,path)
+                if role in ROLES:
+                    roles[role]=data['paths'][path]
+                elif role=='extra':
+                    extras.append(data['paths'][path])
+            joints=[root]+[data['paths'][path] for path in data['order']]
+            data['cache']={'parents':parents,'children':children,'roles':roles,'extras':extras,'joints':joints}
+        return data['cache']
+
+    def joint(self,role,chain='original'):
+        return self.data(chain)['roles'].get(role)
+
+    def joints(self,chain='original'):
+        # a. The root first, then its descendants deepest first, the order listRelatives(ad=True) gives
+        return list(self.data(chain)['joints'])
+
+    def extras(self,chain='original'):
+        return list(self.data(chain)['extras'])
+
+    def role(self,name,chain='original'):
+        for role,joint in self.data(chain)['roles'].items():
+            if joint==name:
+                return role
+        return 'extra'
+
+    def parent(self,name,chain='original'):
+        return self.data(chain)['parents'].get(name)
+
+    def children(self,name,chain='original'):
+        return list(self.data(chain)['children'].get(name,[]))
+
+    def counterparts(self,role):
+        # a. e.g. {'original':'L_elbow','IK':'L_elbow_IK','FK':'L_elbow_FK'}
+        return dict((chain,self.joint(role,chain)) for chain in self.chains)
@@ -0,0 +1,80 @@
+'''
+The following script is the library of control shapes of the IK/FK rig. Every shape is stored as precomputed CVs of a
+unit size, and a control is created in one curve() call with its final CVs: no circle(), no selecting CVs to scale
+them, no makeIdentity(). Control sizes follow the bones of the arm, so a smaller or a bigger skeleton gets controls to
+match.
+
+    lengths=ikfkShapes.bone_lengths(shoulder_position,elbow_position,wrist_position)
+    ikfkShapes.create('L_elbow_FK_Ctrl','circle',ikfkShapes.control_size('elbow',lengths))
+'''
+
+import numpy as np
+
+from ikfkBackend import cmds
+
+# The CVs of an 8-section cubic circle sit at 1.108194 times its radius
+CUBIC_CIRCLE_SCALE=1.108194
+
+#----------------------------------------
+#             Unit Shapes
+#----------------------------------------
+
+def circle_points(normal,sections,degree):
+    # a. The CVs cmds.circle(nr=normal,sections=sections,degree=degree) creates with a radius of 1
+    normal=np.asarray(normal,dtype=float)/np.linalg.norm(normal)
+    helper=np.array([0.0,0.0,1.0]) if abs(normal[2])<0.9 else np.array([1.0,0.0,0.0])
+    u=np.cross(normal,helper)
+    u/=np.linalg.norm(u)
+    w=np.cross(normal,u)
+    angles=2.0*np.pi*np.arange(sections)/sections
+    scale=1.0 if degree==1 else CUBIC_CIRCLE_SCALE
+    return scale*(np.cos(angles)[:,None]*u+np.sin(angles)[:,None]*w)
+
+# name: (degree, periodic, CVs of the unit shape). A periodic curve repeats its first CVs, a closed linear curve its first.
+SHAPES={
+    'circle':(3,True,circle_points((1,0,0),8,3)),
+    'square':(1,False,circle_points((1,0,0),4,1)),
+    'switch':(1,False,circle_points((0,1,0),4,1)*np.array([1.5,1.0,0.5])),
+}
+
+# Control sizes as a fraction of a bone: the upper arm for the shoulder control, the forearm for the others. On the
+# sample arm (bones of 27.2 and 26.2 units) they give the sizes the controls have always had: 10, 7, 3.8, 4 and 1.
+SIZES={
+    'shoulder':('upper',0.3681),
+    'elbow':('lower',0.2675),
+    'wrist':('lower',0.1452),
+    'ik':('lower',0.1528),
+    'switch':('lower',0.0382),
+}
+
+#----------------------------------------
+#            Control Sizes
+#----------------------------------------
+
+def bone_lengths(shoulder,elbow,wrist):
+    shoulder,elbow,wrist=[np.asarray(point,dtype=float) for point in (shoulder,elbow,wrist)]
+    return {'upper':float(np.linalg.norm(elbow-shoulder)),'lower':float(np.linalg.norm(wrist-elbow))}
+
+def control_size(control,lengths):
+    # a. Any other control (an extra FK joint) gets the size of the wrist control
+    bone,fraction=SIZES.get(control,SIZES['wrist'])
+    return fraction*lengths[bone]
+
+#----------------------------------------
+#           Control Creation
+#----------------------------------------
+
+def points(shape,size):
+    return [[float(value) for value in point] for point in SHAPES[shape][2]*size]
+
+def curve_args(shape,size):
+    # a. The flags of curve() creating the shape in one call, with the knots Maya expects for its form
+    degree,periodic,unit=SHAPES[shape]
+    cvs=points(shape,size)
+    cvs=cvs+cvs[:degree] if periodic else cvs+cvs[:1]
+    knots=list(range(-degree+1,len(cvs))) if periodic else list(range(len(cvs)))
+    return {'d':degree,'p':cvs,'k':knots,'per':periodic}
+
+def create(name,shape,size):
+    # a. Like circle(ch=0): the control transform and its shape, returned as [name]
+    return [cmds.curve(n=name,**curve_args(shape,size))]
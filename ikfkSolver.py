@@ -0,0 +1,131 @@
+'''
+The following script is an analytic two-bone rotate-plane IK solver for the shoulder - elbow - wrist chain, the kind of
+solve an ikRPsolver handle does, written with NumPy and vectorized over batches of poses. It needs no Maya and no DG evaluation, so poses
+can be computed offline and IK/FK matching does not have to wait for the ikHandle to evaluate.
+
+The chain bends in the plane through the shoulder, the wrist target and the pole vector, on the side of the pole
+vector, keeping its bone lengths; a target out of reach straightens the chain towards it in that plane. The twist of the handle turns
+that plane about the shoulder - wrist axis. Each joint turns by the rotation taking its bone (and the plane of the
+chain) from the rest pose to the solved pose. python ikfkBench.py solver checks the result against
+ikfkFakeScene.rotate_plane(), the separate solve the in-memory scene evaluates its handles with, built from an aim, a
+twist about the handle vector and a bend, and the chain an offline bake solves against the chain that scene evaluates.
+
+    shoulder_rot,elbow_rot=ikfkSolver.solve(shoulder,elbow,wrist,targets,poles)    # (N,3) targets -> (N,3,3) world
+    shoulder_rotate,elbow_rotate=ikfkSolver.solve_rotates(parents,translates,orients,rotates,targets,poles,twist)
+
+solve_rotates() returns the rotate values of the shoulder and elbow joints, (N,3) in degrees, from the local values of
+the chain in any one pose. ikfkBake.bake_fk_to_ik(...,solver=True) uses it to solve the IK chain of every frame of an
+offline bake from the handle and the pole vector instead of sampling the evaluated IK joints.
+'''
+
+import numpy as np
+
+import ikfkBake
+
+EPSILON=1e-8
+
+#----------------------------------------
+#            Vector Helpers
+#----------------------------------------
+
+def _points(values):
+    return np.asarray(values,dtype=float).reshape(-1,3)
+
+def _normalize(vectors):
+    return vectors/np.maximum(np.linalg.norm(vectors,axis=-1,keepdims=True),EPSILON)
+
+def _reject(vectors,axes):
+    return vectors-axes*np.sum(vectors*axes,axis=-1,keepdims=True)
+
+def _bend(axes,hints):
+    # a. The part of the hints perpendicular to the chain axes; a hint along the axis falls back to any perpendicular
+    bend=_reject(hints,axes)
+    fallback=np.where(np.abs(axes[:,:1])<0.9,np.array([[1.0,0.0,0.0]]),np.array([[0.0,1.0,0.0]]))
+    fallback=_reject(fallback,axes)
+    return _normalize(np.where(np.linalg.norm(bend,axis=-1,keepdims=True)>EPSILON,bend,fallback))
+
+def _frames(bones,normals):
+    # a. Rows: the bone direction, the in-plane perpendicular and the normal of the chain plane
+    x=_normalize(bones)
+    return np.stack([x,np.cross(normals,x),normals],axis=1)
+
+#----------------------------------------
+#                Solver
+#----------------------------------------
+
+def _matrices(rotations,translates):
+    matrices=np.zeros(np.shape(rotations)[:-2]+(4,4))
+    matrices[...,:3,:3]=rotations
+    matrices[...,3,:3]=translates
+    matrices[...,3,3]=1.0
+    return matrices
+
+def _solve_plane(shoulders,upper,lower,targets,poles,twist):
+    # a. Elbows, wrists and the unit bend direction of the plane of each chain; the plane is kept for a straight arm
+    shoulders,targets,poles=_points(shoulders),_points(targets),_points(poles)
+    upper=np.asarray(upper,dtype=float).reshape(-1,1)
+    lower=np.asarray(lower,dtype=float).reshape(-1,1)
+    reach=targets-shoulders
+    distance=np.linalg.norm(reach,axis=-1,keepdims=True)
+    axes=_normalize(reach)
+    # b. The law of cosines gives the angle between the upper arm and the shoulder - wrist line
+    distance=np.clip(distance,np.abs(upper-lower)+EPSILON,upper+lower)
+    cos_angle=np.clip((upper*upper+distance*distance-lower*lower)/(2.0*upper*distance),-1.0,1.0)
+    sin_angle=np.sqrt(1.0-cos_angle*cos_angle)
+    bend=_bend(axes,poles-shoulders)
+    # b.1 The twist turns the plane of the chain about the shoulder - wrist axis
+    angles=np.radians(np.asarray(twist,dtype=float)).reshape(-1,1)
+    bend=np.cos(angles)*bend+np.sin(angles)*np.cross(axes,bend)
+    elbows=shoulders+upper*(cos_angle*axes+sin_angle*bend)
+    wrists=shoulders+distance*axes
+    return elbows,wrists,bend
+
+def solve_positions(shoulders,upper,lower,targets,poles,twist=0.0):
+    # a. Elbow and wrist positions of N chains, bone lengths given per chain or once for all, twist in degrees
+    return _solve_plane(shoulders,upper,lower,targets,poles,twist)[:2]
+
+def solve(shoulder,elbow,wrist,targets,poles,shoulder_rest=None,elbow_rest=None,twist=0.0):
+    # a. Rest pose: world positions of one chain (or one per pose) and, optionally, the world rotations (3x3) of the
+    #    shoulder and elbow joints in that pose. Returns their solved world rotations, (N,3,3) each.
+    targets,poles=_points(targets),_points(poles)
+    count=max(len(targets),len(poles))
+    shoulder,elbow,wrist=[np.broadcast_to(_points(point),(count,3)) for point in (shoulder,elbow,wrist)]
+    upper=np.linalg.norm(elbow-shoulder,axis=-1)
+    lower=np.linalg.norm(wrist-elbow,axis=-1)
+    elbows,wrists,bend=_solve_plane(shoulder,upper,lower,targets,poles,twist)
+    # b. The plane of the chain in the rest and in the solved pose, with the same orientation towards the bend
+    rest_axes=_normalize(wrist-shoulder)
+    rest_normals=_normalize(np.cross(rest_axes,_bend(rest_axes,elbow-shoulder)))
+    axes=_normalize(wrists-shoulder)
+    normals=_normalize(np.cross(axes,bend))
+    # c. Rotation taking each rest bone frame onto its solved frame: rest_frame * delta = solved_frame (row vectors)
+    shoulder_delta=np.matmul(np.swapaxes(_frames(elbow-shoulder,rest_normals),1,2),_frames(elbows-shoulder,normals))
+    elbow_delta=np.matmul(np.swapaxes(_frames(wrist-elbow,rest_normals),1,2),_frames(wrists-elbows,normals))
+    if shoulder_rest is not None:
+        shoulder_delta=np.matmul(np.asarray(shoulder_rest,dtype=float),shoulder_delta)
+    if elbow_rest is not None:
+        elbow_delta=np.matmul(np.asarray(elbow_rest,dtype=float),elbow_delta)
+    return shoulder_delta,elbow_delta
+
+def solve_rotates(parents,translates,orients,rotates,targets,poles,twist=0.0):
+    # a. parents: world matrices of the parent of the shoulder, one (4,4) or one per pose; translates and orients: the
+    #    translate and jointOrient values of the shoulder, elbow and wrist joints; rotates: the rotate values of the
+    #    shoulder and elbow in any pose of the chain, its rest pose or the pose it is solved in now. Returns the rotate
+    #    values of the shoulder and elbow solved for every target, (N,3) each in degrees (XYZ rotate order).
+    targets,poles=_points(targets),_points(poles)
+    count=max(len(targets),len(poles))
+    parents=np.broadcast_to(np.asarray(parents,dtype=float).reshape(-1,4,4),(count,4,4))
+    translates=np.asarray(translates,dtype=float).reshape(3,3)
+    joint_orients=ikfkBake.euler_to_matrix(np.asarray(orients,dtype=float).reshape(3,3))
+    rest=ikfkBake.euler_to_matrix(np.asarray(rotates,dtype=float).reshape(2,3))
+    # b. The chain in the given pose below the parent of each pose: world = rotate * jointOrient * translate * parent
+    shoulder=np.matmul(_matrices(np.matmul(rest[0],joint_orients[0]),translates[0]),parents)
+    elbow=np.matmul(_matrices(np.matmul(rest[1],joint_orients[1]),translates[1]),shoulder)
+    wrist=np.matmul(_matrices(joint_orients[2],translates[2]),elbow)
+    shoulder_rot,elbow_rot=solve(shoulder[:,3,:3],elbow[:,3,:3],wrist[:,3,:3],targets,poles,
+                                 _normalize(shoulder[:,:3,:3]),_normalize(elbow[:,:3,:3]),twist)
+    # c. Back to rotate values below the parent, and below the solved shoulder
+    parent_rot=_normalize(parents[:,:3,:3])
+    shoulder_local=np.matmul(np.matmul(shoulder_rot,np.swapaxes(parent_rot,1,2)),joint_orients[0].T)
+    elbow_local=np.matmul(np.matmul(elbow_rot,np.swapaxes(shoulder_rot,1,2)),joint_orients[1].T)
+    return ikfkBake.matrix_to_euler(shoulder_local),ikfkBake.matrix_to_euler(elbow_local)
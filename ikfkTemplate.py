@@ -0,0 +1,330 @@
+'''
+The following script will rig many arms that share a topology from one build, instead of running create_joints() on
+each of them. capture_template() builds the first arm through the recording backend of ikfkPlan.py and keeps the node
+and connection graph the build made as a template: every name derived from the shoulder, elbow and wrist joints (and
+the parent of the shoulder) is written in terms of those joints, and every value that depends on the skeleton is
+tagged with the rule that computes it again:
+
+    joint   an attribute the IK/FK chains (or a direct drive FK control) copy from a source joint
+    shape   the CVs of a control, sized by the upper arm or the forearm
+    match   a group matched to a joint, set to the joint's world matrix instead
+    pole    the IK pole vector group, placed off the elbow in the plane of the chain
+    frame   any other world matrix, kept relative to the nearest joint (or its frame without rotate values)
+
+stamp_template() then rigs any number of shoulder chains with other proportions in one call: the roles of each chain
+are looked up, the world matrices of all their joints are read in one sampling pass, the poles, frames and control
+sizes of all the arms are computed together with NumPy, and the graph is replayed once per arm with its names and
+values filled in. Nothing is analysed, measured or matched again.
+
+    import ikfkTemplate
+    template=ikfkTemplate.capture_template('C01_L_shoulder')                  # builds C01, keeps its graph
+    report=ikfkTemplate.stamp_template(template,['C02_L_shoulder','C03_L_shoulder'])
+    report['arms_per_second']
+    ikfkTemplate.stamp_selected(template)                                     # every selected shoulder joint
+
+Templates are plain JSON like build specs, save_template()/load_template() keep them on disk. python ikfkBench.py
+stamp compares stamping with building every arm.
+'''
+
+import json
+import re
+import time
+
+import numpy as np
+
+import ikfkBake
+import ikfkLinks
+import ikfkPlan
+import ikfkPoleVector
+import ikfkRoles
+import ikfkShapes
+import ikfkTransaction
+from ikfkBackend import cmds
+
+VERSION=1
+# The template of this session, captured and stamped from the window
+_session={'template':None}
+# The joints the names of a template are written in, as {shoulder}_IK, {elbow}Blend, {parent}.worldMatrix[0]
+PLACEHOLDERS=ikfkRoles.ROLES+('parent',)
+# What the build adds to the name of a joint for the nodes it makes from it, and to those for their constraints; the
+# parent of the shoulder is only ever named as it is
+SUFFIXES=('_IK','_FK','Blend','_FK_Ctrl','_FK_CtrlGrp','_FK_CtrlShape','_IK_Ctrl','_IK_CtrlGrp','_IK_CtrlShape',
+          '_IK_Handle','_IK_PoleVec','_IK_PoleVecShape','_IK_PoleVectorGrp')
+BUILD_NAME=re.compile('(%s)?(_[a-z][A-Za-z]*Constraint[0-9]+)?$' % '|'.join(re.escape(suffix) for suffix in SUFFIXES))
+# Joint values this close to what the template recorded are copied from the joints, frames this close are the same
+TOLERANCE=1e-6
+
+#----------------------------------------
+#           Generic Names
+#----------------------------------------
+
+def arm_names(roles):
+    # a. The shoulder, elbow and wrist joints of a scanned arm and the parent of its shoulder (None at the top)
+    names=dict((role,roles.joint(role)) for role in ikfkRoles.ROLES)
+    parent=cmds.listRelatives(names['shoulder'],p=True)
+    names['parent']=parent[0] if parent else None
+    return names
+
+def generic(value,names):
+    # a. Node names the build derives from one of the arm's joints, written in terms of that joint: L_elbow_FK ->
+    #    {elbow}_FK. Only a joint name followed by one of the build's suffixes counts, so rootIKFK_grp stays as it is.
+    if isinstance(value,list):
+        return [generic(item,names) for item in value]
+    if isinstance(value,dict):
+        return dict((key,generic(item,names)) for key,item in value.items())
+    if not isinstance(value,str):
+        return value
+    prefixes=sorted(((name,key) for key,name in names.items() if name),key=lambda item:-len(item[0]))
+    node,dot,attr=value.partition('.')
+    parts=[]
+    for part in node.split('|'):
+        for name,key in prefixes:
+            rest=part[len(name):]
+            if part.startswith(name) and (not rest or key!='parent' and BUILD_NAME.match(rest)):
+                part='{'+key+'}'+rest
+                break
+        parts.append(part)
+    return '|'.join(parts)+dot+attr
+
+def specific(value,names):
+    # a. The other way round, for the names of the arm a template is stamped onto
+    if isinstance(value,list):
+        return [specific(item,names) for item in value]
+    if isinstance(value,dict):
+        return dict((key,specific(item,names)) for key,item in value.items())
+    if isinstance(value,str) and '{' in value:
+        return value.format(**names)
+    return value
+
+def placeholder(name):
+    # a. The joint a generic name starts with: '{wrist}_IK' -> 'wrist'
+    for key in PLACEHOLDERS:
+        if isinstance(name,str) and name.startswith('{'+key+'}'):
+            return key
+    return None
+
+#----------------------------------------
+#          Skeleton Values
+#----------------------------------------
+
+def flat(value):
+    # a. A getAttr() value as setAttr() arguments: [(x,y,z)] -> [x,y,z]
+    if isinstance(value,list):
+        return [float(item) for item in value[0]]
+    return [value]
+
+def joint_values(roles):
+    # a. {(role,attr): setAttr arguments} of the IK/FK chains, joints in between already folded in
+    import ikfkGen
+    values={}
+    for role,(source,attrs) in zip(ikfkRoles.ROLES,ikfkGen.chain_values(roles)):
+        values.update(((role,attr),flat(value)) for attr,value in attrs)
+    return values
+
+def arm_frames(world,values):
+    # a. World matrices of the shoulder, elbow and wrist, (N,3,4,4), and the same frames without their rotate values
+    rotations=np.broadcast_to(np.identity(4),world.shape).copy()
+    rotations[...,:3,:3]=ikfkBake.euler_to_matrix(np.array([[arm[(role,'rotate')] for role in ikfkRoles.ROLES] for arm in values]))
+    return {'world':world,'rest':np.matmul(np.linalg.inv(rotations),world)}
+
+def lengths_of(world):
+    return {'upper':np.linalg.norm(world[:,1,3,:3]-world[:,0,3,:3],axis=-1),
+            'lower':np.linalg.norm(world[:,2,3,:3]-world[:,1,3,:3],axis=-1)}
+
+def sampled(arms):
+    # a. The world matrices of the shoulder, elbow and wrist of every arm in one sampling pass, (N,3,4,4)
+    nodes=[names[role] for names in arms for role in ikfkRoles.ROLES]
+    world=ikfkBake.sample_world_matrices(nodes,[cmds.currentTime(q=True)])[0]
+    return world.reshape(len(arms),len(ikfkRoles.ROLES),4,4)
+
+#----------------------------------------
+#           Template Capture
+#----------------------------------------
+
+def shape_bone(name):
+    # a. The bone a control is sized by, from its name: FK controls by their joint, the IK control and the switch
+    role=placeholder(name)
+    if name.endswith('_FK_Ctrl') and role in ikfkRoles.ROLES:
+        key=role
+    elif name.endswith('_IK_Ctrl'):
+        key='ik'
+    else:
+        key='switch'
+    return ikfkShapes.SIZES.get(key,ikfkShapes.SIZES['wrist'])[0]
+
+def nearest_frame(matrix,frames):
+    # a. The joint frame a world matrix is closest to, and the matrix relative to it
+    best=None
+    for kind in ('world','rest'):
+        for i,role in enumerate(ikfkRoles.ROLES):
+            relative=np.matmul(matrix,np.linalg.inv(frames[kind][0,i]))
+            error=np.abs(relative-np.identity(4)).sum()
+            if best is None or error<best[0]-TOLERANCE:
+                best=(error,role,kind,relative)
+    return best[1:]
+
+def retarget_rule(command,args,kwargs,values,frames,pole):
+    # a. How a recorded edit changes with the skeleton; None for an edit that only depends on names
+    if command=='setAttr' and len(args)>1:
+        node,dot,attr=args[0].partition('.')
+        role=placeholder(node)
+        recorded=values.get((role,attr))
+        if recorded is not None and np.allclose(args[1:],recorded,atol=TOLERANCE):
+            return ['joint',role,attr]
+    elif command=='curve' and 'p' in kwargs:
+        return ['shape',shape_bone(kwargs.get('n',kwargs.get('name','')))]
+    elif command=='matchTransform' and placeholder(args[-1]) in ikfkRoles.ROLES:
+        return ['match',placeholder(args[-1])]
+    elif command=='xform' and kwargs.get('ws') and 'm' in kwargs:
+        matrix=np.reshape(kwargs['m'],(4,4))
+        if np.allclose(matrix,pole,atol=TOLERANCE):
+            return ['pole']
+        role,kind,relative=nearest_frame(matrix,frames)
+        return ['frame',role,kind,[float(value) for value in relative.ravel()]]
+    return None
+
+def capture_template(shoulder,role_table=None,network='classic',fk_drive='constraint'):
+    # a. The arm is built for real, with a selective extraction so the graph holds the shoulder, elbow and wrist only
+    roles=ikfkRoles.JointRoleIndex(role_table).scan('original',shoulder)
+    missing=[role for role in ('elbow','wrist') if roles.joint(role) is None]
+    if missing:
+        raise ValueError('%s has no %s joint.' % (shoulder,' or '.join(missing)))
+    names=arm_names(roles)
+    values=joint_values(roles)
+    world=sampled([names])
+    frames=arm_frames(world,[values])
+    pole=ikfkPoleVector.pole_vector_matrices(world[:,0,3,:3],world[:,1,3,:3],world[:,2,3,:3])[0]
+    options={'role_table':role_table,'network':network,'fk_drive':fk_drive,'extract':'selective'}
+    # b. Names in terms of the arm's joints, and the rule of every edit that depends on the skeleton
+    operations=generic(ikfkPlan.record_operations(shoulder,**options),names)
+    rules=[]
+    for i,(command,args,kwargs,result) in enumerate(operations):
+        rule=retarget_rule(command,args,kwargs,values,frames,pole)
+        if rule is not None:
+            rules.append([i]+rule)
+    # c. The switch is the node the build links the rig to
+    switch=[args[0] for command,args,kwargs,result in operations if command=='addAttr' and kwargs.get('ln')==ikfkLinks.RIG_LINKS[0][1]]
+    lengths=lengths_of(world)
+    return {'version':VERSION,'shoulder':shoulder,'options':ikfkPlan.plain(options),'operations':operations,'rules':rules,
+            'switch':switch[-1] if switch else None,'parent':names['parent'] is not None,
+            'lengths':dict((bone,float(length[0])) for bone,length in lengths.items()),
+            'rotated':[bool(np.any(values[(role,'rotate')])) for role in ikfkRoles.ROLES]}
+
+def save_template(template,path):
+    with open(path,'w') as handle:
+        json.dump(template,handle,separators=(',',':'))
+
+def load_template(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+#----------------------------------------
+#           Template Stamping
+#----------------------------------------
+
+def check_fit(template,shoulder,names,values):
+    # a. The same topology as the template: a parent where it had one, the joint attributes its rules copy and, with a
+    #    direct FK drive, rotate values on the same joints
+    if cmds.objExists(shoulder+'_IK') or cmds.objExists(shoulder+'_FK'):
+        raise ValueError('%s has an IK/FK rig already.' % shoulder)
+    problems=[]
+    if (names['parent'] is not None)!=template['parent']:
+        problems.append('a shoulder parent' if template['parent'] else 'no shoulder parent')
+    copied=set((rule[2],rule[3]) for rule in template['rules'] if rule[1]=='joint')
+    if not copied.issubset(values):
+        problems.append('the joint attributes %s' % ', '.join(sorted('%s.%s' % key for key in copied-set(values))))
+    if template['options'].get('fk_drive')=='direct':
+        rotated=[bool(np.any(values[(role,'rotate')])) for role in ikfkRoles.ROLES]
+        if rotated!=template['rotated']:
+            problems.append('rotate values on the same joints')
+    if problems:
+        raise ValueError('%s does not fit the template of %s, it needs %s.' % (shoulder,template['shoulder'],' and '.join(problems)))
+
+def filled(text,names):
+    # a. The names of one arm filled into the JSON text of the template's edits, parsed again in one call
+    for key,name in names.items():
+        if name:
+            text=text.replace('{'+key+'}',json.dumps(name)[1:-1])
+    return json.loads(text)
+
+def stamped_operations(template,text,names,values,placed,scales):
+    # a. The template's edits for one arm: names filled in, then every rule's value computed for this arm
+    operations=filled(text,names)
+    for rule in template['rules']:
+        i,kind=rule[0],rule[1]
+        command,args,kwargs,result=operations[i]
+        if kind=='joint':
+            args=[args[0]]+values[(rule[2],rule[3])]
+        elif kind=='shape':
+            kwargs=dict(kwargs,p=[[value*scales[rule[2]] for value in point] for point in kwargs['p']])
+        elif kind=='match':
+            command,args,kwargs=('xform',args[:1],{'ws':True,'m':[float(value) for value in placed['world'][rule[2]].ravel()]})
+        elif kind=='pole':
+            kwargs=dict(kwargs,m=placed['pole'])
+        elif kind=='frame':
+            matrix=np.matmul(np.reshape(rule[4],(4,4)),placed[rule[3]][rule[2]])
+            kwargs=dict(kwargs,m=[float(value) for value in matrix.ravel()])
+        operations[i]=[command,args,kwargs,result]
+    return operations
+
+def stamp_template(template,shoulders):
+    # a. Every arm is checked before anything is created
+    start=time.time()
+    if template.get('version')!=VERSION:
+        raise ValueError('Template version %s is not supported.' % template.get('version'))
+    arms=[]
+    arm_values=[]
+    for shoulder in shoulders:
+        roles=ikfkRoles.JointRoleIndex(template['options'].get('role_table')).scan('original',shoulder)
+        missing=[role for role in ('elbow','wrist') if roles.joint(role) is None]
+        if missing:
+            raise ValueError('%s has no %s joint.' % (shoulder,' or '.join(missing)))
+        names=arm_names(roles)
+        values=joint_values(roles)
+        check_fit(template,shoulder,names,values)
+        arms.append(names)
+        arm_values.append(values)
+    report={'arms':len(arms),'switches':[],'seconds':0.0,'arms_per_second':0.0}
+    if not arms:
+        return report
+    # b. The placement of every arm at once: joint frames, pole vector groups and control sizes
+    world=sampled(arms)
+    frames=arm_frames(world,arm_values)
+    poles=ikfkPoleVector.pole_vector_matrices(world[:,0,3,:3],world[:,1,3,:3],world[:,2,3,:3])
+    lengths=lengths_of(world)
+    scales=dict((bone,length/template['lengths'][bone]) for bone,length in lengths.items())
+    # c. The graph once per arm, all the arms in one transaction
+    text=json.dumps(template['operations'])
+    with ikfkTransaction.BuildTransaction('ikfkTemplate %d arms' % len(arms)):
+        for i,(names,values) in enumerate(zip(arms,arm_values)):
+            placed={'pole':[float(value) for value in poles[i].ravel()]}
+            placed.update((kind,dict((role,frames[kind][i,j]) for j,role in enumerate(ikfkRoles.ROLES))) for kind in ('world','rest'))
+            renamed=ikfkPlan.replay(stamped_operations(template,text,names,values,placed,
+                                                       dict((bone,float(scale[i])) for bone,scale in scales.items())))
+            switch=specific(template['switch'],names)
+            report['switches'].append(renamed.get(switch,switch))
+        cmds.select(cl=True)
+    report['seconds']=time.time()-start
+    report['arms_per_second']=len(arms)/max(report['seconds'],1e-9)
+    return report
+
+def capture_selected():
+    # a. The selected shoulder joint is built and its graph becomes the template of the session
+    sel=cmds.ls(sl=True,type='joint')
+    if not sel or len(sel)!=1:
+        cmds.warning('Please select only one shoulder joint.')
+        return None
+    _session['template']=capture_template(sel[0])
+    return _session['template']
+
+def stamp_selected(template=None):
+    # a. Every selected shoulder joint gets the rig of the template, the one of the session by default
+    template=template or _session['template']
+    if template is None:
+        cmds.warning('Please build a template first.')
+        return None
+    shoulders=[joint for joint in cmds.ls(sl=True,type='joint') or [] if ikfkRoles.role_of(joint)=='shoulder']
+    if not shoulders:
+        cmds.warning('Please select the shoulder joints to stamp the template onto.')
+        return None
+    return stamp_template(template,shoulders)
@@ -0,0 +1,171 @@
+'''
+The following script will run an IK/FK build as one transaction. While the build runs, every change goes into a single
+undo chunk and the viewport refresh and the evaluation manager are suspended. Every node created meanwhile is noted by
+a node added callback, without listing the scene. If any stage raises, the chunk is closed and undone, and whatever the
+build created that is still there is deleted, so a failed build leaves no orphaned _IK/_FK chains behind, and the error
+is raised again.
+
+Transactions nest: build_arm() opens one of its own inside apply_plan(), update_arm() and template stamping. Only the
+outermost opens the undo chunk, suspends and restores the refresh and the evaluation manager, and undoes on failure; a
+nested transaction shares its node list. A failed nested transaction deletes only what it created, inside the chunk
+of the outer one, so a caller that catches the error can go on.
+
+    with ikfkTransaction.BuildTransaction('L_shoulder'):
+        ...
+
+build_arm() in ikfkGen.py runs in a transaction through the @transaction decorator. refresh_savings(shoulder) builds
+an arm once with and once without suspending the refresh, rolls both builds back and reports the time saved.
+rollback() may also be called right after a transaction that succeeded, before anything else goes on the undo queue.
+'''
+
+import functools
+import time
+
+import ikfkBackend
+from ikfkBackend import cmds
+
+# Totals of every transaction of this session
+stats={'builds':0,'rolled_back':0,'seconds':0.0}
+# The transactions open right now, outermost first
+_open=[]
+
+#----------------------------------------
+#            Created Nodes
+#----------------------------------------
+
+def watch_nodes(created):
+    # a. Every node created from now on is appended to created; returns the function that stops watching
+    backend=ikfkBackend.get_backend()
+    # a.1 Backends with their own callback (the in-memory scene) hand over their nodes
+    if hasattr(backend,'addNodeAddedCallback'):
+        callback=backend.addNodeAddedCallback(created.append)
+        return lambda: backend.removeCallback(callback)
+    # b. In Maya, a handle to each node, which still finds it after a rename
+    import maya.api.OpenMaya as om
+    callback=om.MDGMessage.addNodeAddedCallback(lambda node,client_data: created.append(om.MObjectHandle(node)),'dependNode')
+    return lambda: om.MMessage.removeCallback(callback)
+
+def node_names(created):
+    # a. The current names of the noted nodes that still exist
+    backend=ikfkBackend.get_backend()
+    if hasattr(backend,'nodeNames'):
+        return backend.nodeNames(created)
+    import maya.api.OpenMaya as om
+    names=[]
+    for handle in created:
+        if handle.isValid():
+            node=handle.object()
+            names.append(om.MDagPath.getAPathTo(node).fullPathName() if node.hasFn(om.MFn.kDagNode)
+                         else om.MFnDependencyNode(node).name())
+    return names
+
+#----------------------------------------
+#           Build Transaction
+#----------------------------------------
+
+class BuildTransaction(object):
+    def __init__(self,name='ikfkBuild',suspend=True):
+        self.name=name
+        self.suspend=suspend
+        self.created=[]
+        self.seconds=0.0
+        self.nodes=[]
+        self.first=0
+        self.outer=None
+        self.closed=False
+
+    def __enter__(self):
+        self.closed=False
+        # a. Nested: the node list of the outermost transaction, from where it stands now
+        if _open:
+            self.outer=_open[0]
+            self.nodes=self.outer.nodes
+            self.first=len(self.nodes)
+            _open.append(self)
+            self.start=time.time()
+            return self
+        # b. Outermost: the nodes the build creates are noted as they come
+        self.outer=None
+        self.nodes=[]
+        self.first=0
+        self.unwatch=watch_nodes(self.nodes)
+        _open.append(self)
+        cmds.undoInfo(openChunk=True,chunkName=self.name)
+        # c. No viewport redraws and no evaluation graph rebuilds while the build edits the scene
+        self.evaluation=None
+        if self.suspend:
+            cmds.refresh(suspend=True)
+            self.evaluation=cmds.evaluationManager(q=True,mode=True)[0]
+            cmds.evaluationManager(mode='off')
+        self.start=time.time()
+        return self
+
+    def __exit__(self,exc_type,exc_value,tb):
+        self.seconds=time.time()-self.start
+        _open.remove(self)
+        if self.outer is not None:
+            # a. Nested: only what this one created goes, the outer chunk stays open
+            self.closed=True
+            if exc_type is not None:
+                self.rollback()
+            return False
+        try:
+            self.unwatch()
+            if self.suspend:
+                cmds.evaluationManager(mode=self.evaluation)
+                cmds.refresh(suspend=False)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+            self.closed=True
+        # b. The chunk is closed before it is undone
+        if exc_type is not None:
+            self.rollback()
+        stats['builds']+=1
+        stats['seconds']+=self.seconds
+        # c. The error still reaches the caller
+        return False
+
+    def created_nodes(self):
+        return node_names(self.nodes[self.first:])
+
+    def rollback(self):
+        # a. An outermost transaction that is closed is undone as a whole: its chunk is the last on the undo queue, and
+        #    undoing it gives back the selection too
+        if self.outer is None and self.closed and cmds.undoInfo(q=True,state=True):
+            cmds.undo()
+        # b. What is left of the nodes it created is deleted, children go with their parents; with the undo queue
+        #    off (batch sessions, the in-memory scene) and for a nested transaction this is the whole rollback
+        self.created=self.created_nodes()
+        for node in self.created:
+            if cmds.objExists(node):
+                cmds.delete(node)
+        stats['rolled_back']+=1
+        return self.created
+
+def transaction(function):
+    # a. Runs a build function taking the shoulder joint first inside a BuildTransaction
+    @functools.wraps(function)
+    def run(shoulder,*args,**kwargs):
+        with BuildTransaction('ikfkBuild '+shoulder):
+            return function(shoulder,*args,**kwargs)
+    return run
+
+#----------------------------------------
+#       Time Saved by Suspending
+#----------------------------------------
+
+def refresh_savings(shoulder,build=None,repeat=1):
+    # a. The same build with the refresh running and suspended, each rolled back, the fastest run of each kept
+    if build is None:
+        import ikfkGen
+        build=getattr(ikfkGen.build_arm,'__wrapped__',ikfkGen.build_arm)
+    seconds={}
+    for suspend in (False,True):
+        runs=[]
+        for _ in range(repeat):
+            with BuildTransaction('ikfkRefreshSavings',suspend=suspend) as build_transaction:
+                build(shoulder)
+            build_transaction.rollback()
+            runs.append(build_transaction.seconds)
+        seconds[suspend]=min(runs)
+    return {'refresh_seconds':seconds[False],'suspended_seconds':seconds[True],'saved_seconds':seconds[False]-seconds[True]}
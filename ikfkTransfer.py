@@ -0,0 +1,183 @@
+'''
+The following script will move the animation of IK/FK rigs between scenes and rigs in a compact columnar binary file,
+instead of .anim text files or copying the keys one curve at a time. Every keyable channel of the IK wrist control, the
+IK pole vector, the FK controls and the ikFkSwitch of each rig is sampled over a frame range in one pass and stored as
+one column of values per channel:
+
+    IKFKANIM          magic, 8 bytes
+    header length     little-endian uint32
+    header            JSON: version, the switch of every rig and the (rig, control, channel) of every column, padded
+                      with spaces so the blocks start on a 64-byte boundary
+    times block       .npy, (F,) float64
+    values block      .npy, (C,F) float32 by default; each channel is contiguous
+
+    import ikfkTransfer
+    ikfkTransfer.export_animation('shot.ikfk',['IK_FK_Switch_Ctrl','IK_FK_Switch_Ctrl1'],1,240)
+    ikfkTransfer.import_animation('shot.ikfk')                                   # onto the same rigs
+    ikfkTransfer.import_animation('shot.ikfk',['C02_Switch','C02_Switch1'])      # onto other rigs, in file order
+
+load_file() maps the values block read-only with numpy.memmap instead of reading it, so opening a file costs the same
+whatever its size, and import_animation() writes each column as one bulk key write with ikfkBake.write_keys().
+python ikfkBench.py transfer compares the size and load time with .anim files.
+'''
+
+import json
+import struct
+import time
+
+import numpy as np
+
+import ikfkBackend
+import ikfkBake
+import ikfkChannels
+import ikfkLinks
+import ikfkRoles
+from ikfkBackend import cmds
+
+MAGIC=b'IKFKANIM'
+VERSION=1
+# The blocks start on this boundary, so the mapped values are aligned
+ALIGNMENT=64
+SWITCH_ATTR='ikFkSwitch'
+
+def keyable(policy):
+    # a. The channels a control policy leaves to the animator; visibility is driven by the switch network
+    return tuple(channel for channel in ikfkChannels.ALL_CHANNELS
+                 if channel not in policy and channel not in ikfkChannels.VISIBILITY)
+
+# The controls of a rig and their channels, in the order of the columns: (key, role, channels)
+CONTROLS=([('ik_control',None,keyable(ikfkChannels.IK_CONTROL)),('pole_vector',None,keyable(ikfkChannels.POLE_VECTOR))]+
+          [('fk_controls',role,keyable(ikfkChannels.FK_CONTROL)) for role in ikfkRoles.ROLES]+
+          [('switch',None,(SWITCH_ATTR,))])
+
+def control_of(rig,key,role):
+    return rig[key][role] if role else rig[key]
+
+def rig_columns(rig):
+    # a. (control, channel) of every column of a rig; controls a rig does not have are left out
+    columns=[]
+    for key,role,channels in CONTROLS:
+        control=control_of(rig,key,role)
+        if control:
+            columns.extend((key if role is None else key+'.'+role,channel) for channel in channels)
+    return columns
+
+def resolve(rig,control):
+    key,role=(control.split('.',1)+[None])[:2]
+    return control_of(rig,key,role)
+
+#----------------------------------------
+#              File Blocks
+#----------------------------------------
+
+def padded(size):
+    return -size%ALIGNMENT
+
+def write_file(path,header,times,values):
+    # a. Magic, header length, JSON header, then the times and values blocks, each on the alignment boundary
+    text=json.dumps(header,sort_keys=True).encode('utf-8')
+    text+=b' '*padded(len(MAGIC)+4+len(text))
+    with open(path,'wb') as f:
+        f.write(MAGIC+struct.pack('<I',len(text))+text)
+        for block in (np.asarray(times,dtype=np.float64),np.ascontiguousarray(values)):
+            np.lib.format.write_array(f,block,allow_pickle=False)
+            f.write(b'\0'*padded(f.tell()))
+        return f.tell()
+
+def read_block(f,path,mode):
+    # a. The .npy block at the position of f, mapped (mode 'r' or 'c') or read with mode None; f is left after it
+    version=np.lib.format.read_magic(f)
+    read_header=np.lib.format.read_array_header_1_0 if version==(1,0) else np.lib.format.read_array_header_2_0
+    shape,fortran_order,dtype=read_header(f)
+    offset=f.tell()
+    count=int(np.prod(shape))
+    if mode is None:
+        block=np.fromfile(f,dtype=dtype,count=count).reshape(shape,order='F' if fortran_order else 'C')
+    else:
+        block=np.memmap(path,dtype=dtype,mode=mode,offset=offset,shape=shape,order='F' if fortran_order else 'C')
+    f.seek(offset+count*dtype.itemsize)
+    f.seek(padded(f.tell()),1)
+    return block
+
+def load_file(path,mode='r'):
+    # a. header, times, values; the values are mapped without a copy unless mode is None
+    with open(path,'rb') as f:
+        if f.read(len(MAGIC))!=MAGIC:
+            raise ValueError('%s is not an IK/FK animation file.' % path)
+        size=struct.unpack('<I',f.read(4))[0]
+        header=json.loads(f.read(size).decode('utf-8'))
+        if header.get('version')!=VERSION:
+            raise ValueError('%s has version %s, expected %s.' % (path,header.get('version'),VERSION))
+        times=read_block(f,path,None)
+        values=read_block(f,path,mode)
+    return header,times,values
+
+#----------------------------------------
+#              Sampling
+#----------------------------------------
+
+def sample_channels(plugs,frames):
+    # a. The value of every plug at every frame, in the UI units keys are written in: a (C,F) array
+    backend=ikfkBackend.get_backend()
+    # a.1 Backends with a native batch (the in-memory scene) sample everything in a single call
+    if hasattr(backend,'getAttrs'):
+        return np.asarray(backend.getAttrs(plugs,frames),dtype=float).reshape(len(frames),len(plugs)).T.copy()
+    # b. In Maya, one pass over the frames, each plug evaluated in a DG context at that frame
+    import maya.api.OpenMaya as om
+    selection=om.MSelectionList()
+    for plug in plugs:
+        selection.add(plug)
+    plugs=[selection.getPlug(i) for i in range(len(plugs))]
+    angles=[om.MFnUnitAttribute(plug.attribute()).unitType()==om.MFnUnitAttribute.kAngle
+            if plug.attribute().hasFn(om.MFn.kUnitAttribute) else False for plug in plugs]
+    unit=om.MTime.uiUnit()
+    result=np.empty((len(plugs),len(frames)))
+    for j,frame in enumerate(frames):
+        context=om.MDGContext(om.MTime(frame,unit))
+        for i,plug in enumerate(plugs):
+            result[i,j]=plug.asMAngle(context).asUnits(om.MAngle.uiUnit()) if angles[i] else plug.asDouble(context)
+    return result
+
+#----------------------------------------
+#           Export and Import
+#----------------------------------------
+
+def export_animation(path,switches,start,end,step=1,dtype=np.float32):
+    # a. Every channel of the controls of the rigs of switches, sampled over start..end in one pass
+    begin=time.time()
+    frames=ikfkBake.frame_range(start,end,step)
+    rigs=[ikfkLinks.rig_of(switch) for switch in switches]
+    columns,plugs=[],[]
+    for index,rig in enumerate(rigs):
+        for control,channel in rig_columns(rig):
+            columns.append([index,control,channel])
+            plugs.append(resolve(rig,control)+'.'+channel)
+    values=sample_channels(plugs,frames).astype(dtype)
+    header={'version':VERSION,'switches':[rig['switch'] for rig in rigs],'columns':columns}
+    size=write_file(path,header,frames,values)
+    return {'rigs':len(rigs),'channels':len(columns),'frames':len(frames),'bytes':size,'seconds':time.time()-begin}
+
+def import_animation(path,switches=None,offset=0.0):
+    # a. The keys of a file onto the rigs it was exported from, or onto switches in the order of the file
+    begin=time.time()
+    header,times,values=load_file(path)
+    switches=list(header['switches'] if switches is None else switches)
+    if len(switches)!=len(header['switches']):
+        raise ValueError('%s holds %d rigs, %d switches given.' % (path,len(header['switches']),len(switches)))
+    # b. Every plug is resolved before any key is written
+    rigs=[ikfkLinks.rig_of(switch) for switch in switches]
+    plugs=[]
+    for index,control,channel in header['columns']:
+        node=resolve(rigs[index],control)
+        if not node:
+            raise ValueError('%s has no %s for the animation of %s.' % (switches[index],control,header['switches'][index]))
+        plugs.append(node+'.'+channel)
+    frames=[float(frame)+offset for frame in times]
+    # c. One bulk key write per column, in one undo chunk
+    cmds.undoInfo(openChunk=True,chunkName='ikfkTransfer')
+    try:
+        for plug,column in zip(plugs,values):
+            ikfkBake.write_keys(plug,frames,column)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return {'rigs':len(rigs),'channels':len(plugs),'frames':len(frames),'seconds':time.time()-begin}
@@ -0,0 +1,147 @@
+'''
+The following script will update an existing IK/FK rig in place after its source skeleton has changed, instead of
+deleting the rig and running create_joints() again. The joint positions and orientations (translate and jointOrient)
+of the source chain are compared with those of the _IK and _FK chains, and only what changed is moved: the IK and FK
+joints, the FK control groups (*_CtrlGrp), the IK control group and the IK pole vector group. The controls themselves are
+not touched, so their keyed animation stays as it is. A switch control constrained to the wrist follows it on its own;
+the switch of a lean network, held below the shoulder's parent, moves with the wrist's rest frame like the IK group.
+
+    import ikfkUpdate
+    report=ikfkUpdate.update_arm('L_shoulder')    # {'joints':[...],'groups':[...],'seconds':...}
+'''
+
+import time
+
+import numpy as np
+
+import ikfkBake
+import ikfkChannels
+import ikfkLinks
+import ikfkPoleVector
+import ikfkRoles
+import ikfkTransaction
+from ikfkBackend import cmds
+
+# Smaller differences of translate (units) and jointOrient (degrees) values are no change
+TOLERANCE=1e-6
+
+#----------------------------------------
+#          Joint Rest Frames
+#----------------------------------------
+
+def joint_values(joint):
+    return [list(cmds.getAttr(joint+'.translate')[0]),list(cmds.getAttr(joint+'.jointOrient')[0])]
+
+def source_values(roles):
+    # a. translate and jointOrient of the source shoulder, elbow and wrist as the build gives them to the IK and FK
+    #    joints: joints left out in between (e.g. a twist joint) folded in by ikfkGen.chain_values()
+    import ikfkGen
+    values={}
+    for role,(joint,attrs) in zip(ikfkRoles.ROLES,ikfkGen.chain_values(roles,('translate','jointOrient'))):
+        attrs=dict(attrs)
+        values[role]=[list(attrs[attr][0]) for attr in ('translate','jointOrient')]
+    return values
+
+def rest_local(values):
+    # a. The local matrix of a joint with rotate values of 0: jointOrient then translate (row vectors)
+    matrix=np.identity(4)
+    matrix[:3,:3]=ikfkBake.euler_to_matrix(values[1])
+    matrix[3,:3]=values[0]
+    return matrix
+
+def world(node):
+    if node is None:
+        return np.identity(4)
+    return np.reshape(cmds.xform(node,q=True,ws=True,m=True),(4,4))
+
+def set_world(node,matrix):
+    cmds.xform(node,ws=True,m=[float(value) for value in np.ravel(matrix)])
+
+def rest_frames(values,parent_world):
+    # a. World matrices of the shoulder, elbow and wrist with every rotate value at 0, below the shoulder's parent
+    frames=[]
+    for role in ikfkRoles.ROLES:
+        frames.append(np.matmul(rest_local(values[role]),frames[-1] if frames else parent_world))
+    return frames
+
+def changed(old,new):
+    return any(abs(a-b)>TOLERANCE for old_values,new_values in zip(old,new) for a,b in zip(old_values,new_values))
+
+def settable(plug):
+    # a. Channels driven by a constraint (or anything else) follow on their own
+    return not cmds.listConnections(plug,s=True,d=False)
+
+#----------------------------------------
+#             Rig Update
+#----------------------------------------
+
+def update_arm(shoulder,role_table=None):
+    start=time.time()
+    if not (cmds.objExists(shoulder+'_IK') and cmds.objExists(shoulder+'_FK')):
+        raise ValueError('%s has no IK/FK rig to update.' % shoulder)
+    roles=ikfkRoles.JointRoleIndex(role_table)
+    for chain,root in (('original',shoulder),('IK',shoulder+'_IK'),('FK',shoulder+'_FK')):
+        roles.scan(chain,root)
+    # a. The diff: source values against the IK duplicates, which still hold the values of the last build (the
+    #    translate of the FK joints may be driven by their constraints)
+    source=source_values(roles)
+    built=dict((role,joint_values(roles.joint(role,'IK'))) for role in ikfkRoles.ROLES)
+    moved=[role for role in ikfkRoles.ROLES if changed(built[role],source[role])]
+    report={'joints':[],'groups':[],'seconds':0.0}
+    if not moved:
+        report['seconds']=time.time()-start
+        return report
+
+    with ikfkTransaction.BuildTransaction('ikfkUpdate '+shoulder):
+        shoulder_parent=cmds.listRelatives(shoulder,p=True)
+        parent_world=world(shoulder_parent[0] if shoulder_parent else None)
+        old_frames=rest_frames(built,parent_world)
+        new_frames=rest_frames(source,parent_world)
+        # b. FK joints and their control groups, parents first. A group keeps its place relative to the joint frame:
+        #    group = rel * jointOrient/translate * parent joint, only the jointOrient/translate part is swapped.
+        for role in ikfkRoles.ROLES:
+            if role not in moved:
+                continue
+            fk_joint=roles.joint(role,'FK')
+            fk_parent=cmds.listRelatives(fk_joint,p=True)
+            fk_parent_world=world(fk_parent[0] if fk_parent else None)
+            group=fk_joint+'_CtrlGrp'
+            rel=np.matmul(world(group),np.linalg.inv(fk_parent_world)) if cmds.objExists(group) else None
+            for chain in ('IK','FK'):
+                joint=roles.joint(role,chain)
+                for attr,values in zip(('translate','jointOrient'),source[role]):
+                    if settable(joint+'.'+attr):
+                        cmds.setAttr(joint+'.'+attr,*values)
+                report['joints'].append(joint)
+            if rel is not None:
+                local=np.matmul(np.matmul(rel,np.linalg.inv(rest_local(built[role]))),rest_local(source[role]))
+                set_world(group,np.matmul(local,world(fk_parent[0] if fk_parent else None)))
+                report['groups'].append(group)
+        # c. The IK control group moves with the wrist's rest frame
+        ik_wrist=roles.joint('wrist','IK')
+        ik_group=ik_wrist+'_CtrlGrp'
+        if 'wrist' in moved or 'elbow' in moved or 'shoulder' in moved:
+            if cmds.objExists(ik_group):
+                delta=np.matmul(np.linalg.inv(old_frames[2]),new_frames[2])
+                set_world(ik_group,np.matmul(world(ik_group),delta))
+                report['groups'].append(ik_group)
+        # d. The IK pole vector group by the change of its analytic placement
+        pole_group=roles.joint('elbow','IK')+'_PoleVectorGrp'
+        if cmds.objExists(pole_group):
+            old_pole,new_pole=[ikfkPoleVector.pole_vector_matrices(*[frame[3,:3] for frame in frames])[0]
+                               for frames in (old_frames,new_frames)]
+            if not np.allclose(old_pole,new_pole,atol=TOLERANCE):
+                set_world(pole_group,np.matmul(np.matmul(world(pole_group),np.linalg.inv(old_pole)),new_pole))
+                report['groups'].append(pole_group)
+        # e. A lean switch moves with the wrist's rest frame; its channels are locked, so they are opened meanwhile
+        switch=ikfkLinks.switch_of(ik_wrist+'_Ctrl') if cmds.objExists(ik_wrist+'_Ctrl') else None
+        if switch and settable(switch+'.translate') and not np.allclose(old_frames[2],new_frames[2],atol=TOLERANCE):
+            plugs=[switch+'.'+channel for channel in ikfkChannels.TRANSLATE+ikfkChannels.ROTATE]
+            for plug in plugs:
+                cmds.setAttr(plug,lock=False)
+            set_world(switch,np.matmul(world(switch),np.matmul(np.linalg.inv(old_frames[2]),new_frames[2])))
+            for plug in plugs:
+                cmds.setAttr(plug,lock=True)
+            report['groups'].append(switch)
+    report['seconds']=time.time()-start
+    return report
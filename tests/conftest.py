@@ -0,0 +1,44 @@
+'''
+Fixtures of the regression tests: sample arm skeletons in the in-memory scene of ikfkFakeScene.py, with the backend of
+every ikfk module pointed at it. The tests run without Maya: python -m pytest -q
+'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ikfkBackend
+import ikfkFakeScene
+
+# World matrices this close are the same
+TOLERANCE=1e-6
+
+def arm_scene(sides=('L',)):
+    # a. One sample arm per side, a left and a right arm mirrored across YZ, the next pair 200 units further along Z
+    scene=ikfkFakeScene.FakeScene()
+    shoulders=[ikfkFakeScene.create_arm_skeleton(scene,side,offset=(0.0,0.0,200.0*(i//2))) for i,side in enumerate(sides)]
+    return scene,shoulders
+
+def world(scene,node):
+    return np.reshape(scene.xform(node,q=True,ws=True,m=True),(4,4))
+
+def assert_same_world(scene,nodes,others=None,other_scene=None):
+    # a. The nodes against other nodes of the same scene, or against the same nodes of another scene
+    others=nodes if others is None else others
+    other_scene=scene if other_scene is None else other_scene
+    for node,other in zip(nodes,others):
+        with ikfkBackend.use_backend(other_scene):
+            expected=world(other_scene,other)
+        with ikfkBackend.use_backend(scene):
+            assert np.abs(world(scene,node)-expected).max()<TOLERANCE,(node,other)
+
+@pytest.fixture
+def arm():
+    # a. One left arm, the backend on its scene for the whole test
+    scene,shoulders=arm_scene()
+    with ikfkBackend.use_backend(scene):
+        yield scene,shoulders[0]
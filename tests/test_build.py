@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import ikfkBackend
+import ikfkGen
+import ikfkLinks
+import ikfkPoleVector
+import ikfkRoles
+from conftest import arm_scene, assert_same_world, world
+
+RIG_NODES=['L_shoulder_IK','L_elbow_IK','L_wrist_IK','L_shoulder_FK','L_elbow_FK','L_wrist_FK',
+           'L_shoulder_FK_CtrlGrp','L_shoulder_FK_Ctrl','L_elbow_FK_CtrlGrp','L_elbow_FK_Ctrl',
+           'L_wrist_FK_CtrlGrp','L_wrist_FK_Ctrl','L_wrist_IK_CtrlGrp','L_wrist_IK_Ctrl','L_wrist_IK_Handle',
+           'L_elbow_IK_PoleVectorGrp','L_elbow_IK_PoleVec','L_shoulderBlend','L_elbowBlend','L_wristBlend',
+           'IK_FK_Switch_Ctrl']
+
+@pytest.mark.parametrize('network',ikfkGen.NETWORKS)
+@pytest.mark.parametrize('fk_drive',ikfkGen.FK_DRIVES)
+def test_build_names(arm,network,fk_drive):
+    scene,shoulder=arm
+    ikfkGen.build_arm(shoulder,network=network,fk_drive=fk_drive)
+    for node in RIG_NODES:
+        assert scene.objExists(node),node
+    # a. Only the shoulder, elbow and wrist are kept in the IK and FK chains
+    for joint in ('L_forearm','L_palm','L_thumb1','L_index1'):
+        assert not scene.objExists(joint+'_IK') and not scene.objExists(joint+'_FK')
+    rig=ikfkLinks.rig_of('L_elbow_FK_Ctrl')
+    assert rig['switch']=='IK_FK_Switch_Ctrl'
+    assert rig['ik_control']=='L_wrist_IK_Ctrl' and rig['pole_vector']=='L_elbow_IK_PoleVec'
+    assert [rig['fk_controls'][role] for role in ikfkRoles.ROLES]==['L_shoulder_FK_Ctrl','L_elbow_FK_Ctrl','L_wrist_FK_Ctrl']
+
+@pytest.mark.parametrize('network',ikfkGen.NETWORKS)
+@pytest.mark.parametrize('extract',ikfkGen.EXTRACTIONS)
+def test_build_world_matrices(arm,network,extract):
+    scene,shoulder=arm
+    joints=['L_shoulder','L_elbow','L_wrist']
+    rest=[world(scene,joint) for joint in joints]
+    ikfkGen.build_arm(shoulder,network=network,extract=extract)
+    # a. The source chain keeps its rest pose, the IK and FK chains and the FK controls sit on it
+    for chain in ('','_IK','_FK','_FK_Ctrl'):
+        for joint,matrix in zip(joints,rest):
+            assert np.abs(world(scene,joint+chain)-matrix).max()<1e-6,joint+chain
+    assert np.abs(world(scene,'L_wrist_IK_Ctrl')-rest[2]).max()<1e-6
+    # b. The pole vector off the elbow, in the plane of the chain
+    pole=ikfkPoleVector.pole_vector_matrix(*[matrix[3,:3] for matrix in rest])
+    assert np.abs(world(scene,'L_elbow_IK_PoleVec')[3,:3]-np.reshape(pole,(4,4))[3,:3]).max()<1e-6
+    # c. The switch control 2 units above the wrist
+    assert np.abs(world(scene,'IK_FK_Switch_Ctrl')[3,:3]-(rest[2][3,:3]+[0.0,2.0,0.0])).max()<1e-6
+
+@pytest.mark.parametrize('network',ikfkGen.NETWORKS)
+@pytest.mark.parametrize('fk_drive',ikfkGen.FK_DRIVES)
+def test_switch_follows_each_chain(arm,network,fk_drive):
+    scene,shoulder=arm
+    ikfkGen.build_arm(shoulder,network=network,fk_drive=fk_drive)
+    scene.setAttr('L_shoulder_FK_Ctrl.rotateZ',30.0)
+    scene.setAttr('L_elbow_FK_Ctrl.rotateY',-40.0)
+    scene.setAttr('L_wrist_IK_Ctrl.translateX',-5.0)
+    scene.setAttr('L_wrist_IK_Ctrl.translateY',5.0)
+    joints=['L_shoulder','L_elbow','L_wrist']
+    # a. 1 blends the source chain onto the FK chain, 0 onto the IK chain; the other side's controls are hidden
+    scene.setAttr('IK_FK_Switch_Ctrl.ikFkSwitch',1.0)
+    assert_same_world(scene,joints,[joint+'_FK' for joint in joints])
+    assert scene.getAttr('L_shoulder_FK_CtrlGrp.visibility') and not scene.getAttr('L_wrist_IK_Ctrl.visibility')
+    scene.setAttr('IK_FK_Switch_Ctrl.ikFkSwitch',0.0)
+    assert_same_world(scene,joints,[joint+'_IK' for joint in joints])
+    assert not scene.getAttr('L_shoulder_FK_CtrlGrp.visibility') and scene.getAttr('L_wrist_IK_Ctrl.visibility')
+    assert np.abs(world(scene,'L_wrist_IK')[3,:3]-world(scene,'L_wrist_IK_Ctrl')[3,:3]).max()<1e-6
+
+def test_build_matches_on_both_sides():
+    # a. A right arm is rigged like the left one, mirrored across YZ
+    scene,shoulders=arm_scene(('L','R'))
+    with ikfkBackend.use_backend(scene):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder)
+        reflect=np.diag([-1.0,1.0,1.0,1.0])
+        for node in ('L_wrist_IK','L_elbow_FK','L_elbow_IK_PoleVec'):
+            left=world(scene,node)[3,:3]
+            right=world(scene,'R'+node[1:])[3,:3]
+            assert np.abs(np.matmul(np.append(left,1.0),reflect)[:3]-right).max()<1e-6,node
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import ikfkBake
+import ikfkGen
+import ikfkMatch
+from conftest import assert_same_world, world
+
+JOINTS=['L_shoulder','L_elbow','L_wrist']
+
+def pose_fk(scene):
+    scene.setAttr('L_shoulder_FK_Ctrl.rotateZ',30.0)
+    scene.setAttr('L_shoulder_FK_Ctrl.rotateY',-10.0)
+    scene.setAttr('L_elbow_FK_Ctrl.rotateY',-40.0)
+    scene.setAttr('L_wrist_FK_Ctrl.rotateX',20.0)
+
+def pose_ik(scene):
+    scene.setAttr('L_wrist_IK_Ctrl.translateX',-8.0)
+    scene.setAttr('L_wrist_IK_Ctrl.translateY',6.0)
+    scene.setAttr('L_wrist_IK_Ctrl.rotateX',25.0)
+    scene.setAttr('L_elbow_IK_PoleVec.translateZ',-10.0)
+
+@pytest.mark.parametrize('network',ikfkGen.NETWORKS)
+@pytest.mark.parametrize('fk_drive',ikfkGen.FK_DRIVES)
+def test_match_round_trip(arm,network,fk_drive):
+    scene,shoulder=arm
+    ikfkGen.build_arm(shoulder,network=network,fk_drive=fk_drive)
+    # a. IK follows a posed FK chain, then the switch is on IK
+    pose_fk(scene)
+    assert ikfkMatch.match_controls(['L_wrist_IK_Ctrl'],'ik')==1
+    assert scene.getAttr('IK_FK_Switch_Ctrl.ikFkSwitch')==0.0
+    assert_same_world(scene,[joint+'_IK' for joint in JOINTS],[joint+'_FK' for joint in JOINTS])
+    fk_pose=[world(scene,joint+'_FK') for joint in JOINTS]
+    # b. FK follows the matched IK chain back onto the same pose, then the switch is on FK
+    for ctrl in ('L_shoulder_FK_Ctrl','L_elbow_FK_Ctrl','L_wrist_FK_Ctrl'):
+        scene.setAttr(ctrl+'.rotate',0.0,0.0,0.0)
+    assert ikfkMatch.match_controls(['L_elbow_FK_Ctrl'],'fk')==1
+    assert scene.getAttr('IK_FK_Switch_Ctrl.ikFkSwitch')==1.0
+    for joint,matrix in zip(JOINTS,fk_pose):
+        assert np.abs(world(scene,joint+'_FK')-matrix).max()<1e-6,joint
+    assert_same_world(scene,JOINTS,[joint+'_IK' for joint in JOINTS])
+
+def test_match_fk_to_posed_ik(arm):
+    scene,shoulder=arm
+    ikfkGen.build_arm(shoulder)
+    pose_ik(scene)
+    # a. Through the button, with one FK control selected
+    scene.select('L_wrist_FK_Ctrl')
+    ikfkGen.fkToik()
+    assert_same_world(scene,[joint+'_FK' for joint in JOINTS],[joint+'_IK' for joint in JOINTS])
+    assert np.abs(world(scene,'L_wrist_IK')[3,:3]-world(scene,'L_wrist_IK_Ctrl')[3,:3]).max()<1e-6
+
+def animate(scene,side='L'):
+    for frame,value in ((1,0.0),(10,1.0),(20,-1.0)):
+        scene.setKeyframe(side+'_shoulder_FK_Ctrl',at='rotateZ',t=frame,v=30.0*value)
+        scene.setKeyframe(side+'_elbow_FK_Ctrl',at='rotateY',t=frame,v=-20.0-20.0*value)
+        scene.setKeyframe(side+'_wrist_IK_Ctrl',at='translateY',t=frame,v=6.0*value)
+        scene.setKeyframe(side+'_wrist_IK_Ctrl',at='translateX',t=frame,v=-8.0)
+        scene.setKeyframe(side+'_elbow_IK_PoleVec',at='translateZ',t=frame,v=-10.0*value)
+
+@pytest.mark.parametrize('solver',(False,True))
+def test_bake_round_trip(arm,solver):
+    scene,shoulder=arm
+    ikfkGen.build_arm(shoulder)
+    animate(scene)
+    # a. The IK controls baked onto the FK animation, every frame
+    assert ikfkBake.bake_ik_to_fk('L_wrist_IK_Ctrl',1,20)==20
+    for frame in (1,5,10,15,20):
+        scene.currentTime(frame)
+        assert_same_world(scene,['L_wrist_IK'],['L_wrist_FK'])
+    # b. FK baked back onto the IK chain: the FK chain keeps the pose it had
+    fk_pose={}
+    for frame in (1,5,10,15,20):
+        scene.currentTime(frame)
+        fk_pose[frame]=[world(scene,joint+'_FK') for joint in JOINTS]
+    assert ikfkBake.bake_fk_to_ik('L_elbow_FK_Ctrl',1,20,solver=solver)==20
+    for frame in (1,5,10,15,20):
+        scene.currentTime(frame)
+        assert_same_world(scene,[joint+'_FK' for joint in JOINTS],[joint+'_IK' for joint in JOINTS])
+        for joint,matrix in zip(JOINTS,fk_pose[frame]):
+            assert np.abs(world(scene,joint+'_FK')-matrix).max()<1e-6,(joint,frame)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import ikfkBackend
+import ikfkGen
+import ikfkLinks
+import ikfkMirror
+import ikfkRoles
+from conftest import TOLERANCE, arm_scene, world
+from ikfkBackend import cmds
+
+def rig_names(rig):
+    # a. Switch, controls, their groups and the IK/FK joints of a rig, in a fixed order
+    controls=[rig['ik_control'],rig['pole_vector']]+[rig['fk_controls'][role] for role in ikfkRoles.ROLES]
+    names=[rig['switch']]+controls+[rig[key][role] for key in ('ik_joints','fk_joints') for role in ikfkRoles.ROLES]
+    return names+[cmds.listRelatives(control,p=True)[0] for control in controls]
+
+@pytest.mark.parametrize('network',ikfkGen.NETWORKS)
+@pytest.mark.parametrize('fk_drive',ikfkGen.FK_DRIVES)
+def test_mirror_matches_build(network,fk_drive):
+    # a. The right arm mirrored from a rigged left arm, against the right arm built on its own
+    mirrored,shoulders=arm_scene(('L','R'))
+    with ikfkBackend.use_backend(mirrored):
+        ikfkGen.build_arm('L_shoulder',network=network,fk_drive=fk_drive)
+        switch=ikfkMirror.mirror_arm('L_shoulder')
+        mirrored_names=rig_names(ikfkLinks.rig_of(switch))
+        mirrored_world=[world(mirrored,name) for name in mirrored_names]
+    built,shoulders=arm_scene(('L','R'))
+    with ikfkBackend.use_backend(built):
+        ikfkGen.build_arm('R_shoulder',network=network,fk_drive=fk_drive)
+        built_names=rig_names(ikfkLinks.rig_of('R_wrist_IK_Ctrl'))
+        built_world=[world(built,name) for name in built_names]
+    # b. Same names apart from the switch, which the other arm's build names first
+    assert mirrored_names[1:]==built_names[1:]
+    assert all(name.startswith('R_') for name in built_names[1:])
+    for name,matrix,expected in zip(built_names,mirrored_world,built_world):
+        assert np.abs(matrix-expected).max()<TOLERANCE,name
+
+def test_mirror_follows_switch():
+    scene,shoulders=arm_scene(('L','R'))
+    with ikfkBackend.use_backend(scene):
+        ikfkGen.build_arm('L_shoulder')
+        switch=ikfkMirror.mirror_arm('L_shoulder')
+        scene.setAttr('R_elbow_FK_Ctrl.rotateZ',30.0)
+        scene.setAttr(switch+'.ikFkSwitch',1.0)
+        for joint in ('R_shoulder','R_elbow','R_wrist'):
+            assert np.abs(world(scene,joint)-world(scene,joint+'_FK')).max()<TOLERANCE,joint
+        assert not scene.getAttr('R_wrist_IK_Ctrl.visibility')
+        # a. The other arm is left alone
+        assert scene.getAttr('IK_FK_Switch_Ctrl.ikFkSwitch')==pytest.approx(0.5)
+
+def test_mirror_needs_other_arm():
+    scene,shoulders=arm_scene(('L',))
+    with ikfkBackend.use_backend(scene):
+        ikfkGen.build_arm('L_shoulder')
+        with pytest.raises(ValueError):
+            ikfkMirror.mirror_arm('L_shoulder')
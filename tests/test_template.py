@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import ikfkBackend
+import ikfkGen
+import ikfkTemplate
+from conftest import TOLERANCE, arm_scene, world
+
+SIDES=('L','R','L1','R1')
+
+def proportioned_scene():
+    # a. The same arm topology with other bone lengths, joint orients and rest rotations on every arm
+    scene,shoulders=arm_scene(SIDES)
+    with ikfkBackend.use_backend(scene):
+        for i,shoulder in enumerate(shoulders):
+            side=shoulder[:-len('_shoulder')]
+            for joint in ('elbow','wrist'):
+                translate=scene.getAttr(side+'_'+joint+'.translate')[0]
+                scene.setAttr(side+'_'+joint+'.translate',*[value*(1.0+0.15*i) for value in translate])
+            scene.setAttr(side+'_elbow.jointOrient',0.0,5.0*i,3.0)
+            scene.setAttr(side+'_elbow.rotate',0.0,0.0,10.0+i)
+    return scene,shoulders
+
+def rig_worlds(scene):
+    # a. World matrices of every transform the rigs made, by name
+    with ikfkBackend.use_backend(scene):
+        names=[name for name,node in scene.nodes.items() if node.is_dag() and scene.nodeType(name) in ('joint','transform')]
+        return dict((name,world(scene,name)) for name in names)
+
+@pytest.mark.parametrize('network',ikfkGen.NETWORKS)
+@pytest.mark.parametrize('fk_drive',ikfkGen.FK_DRIVES)
+def test_stamp_matches_build(network,fk_drive):
+    # a. One arm captured, the others stamped; against every arm built on its own
+    stamped,shoulders=proportioned_scene()
+    with ikfkBackend.use_backend(stamped):
+        template=ikfkTemplate.capture_template(shoulders[0],network=network,fk_drive=fk_drive)
+        report=ikfkTemplate.stamp_template(template,shoulders[1:])
+    assert report['arms']==len(shoulders)-1
+    built,shoulders=proportioned_scene()
+    with ikfkBackend.use_backend(built):
+        for shoulder in shoulders:
+            ikfkGen.build_arm(shoulder,network=network,fk_drive=fk_drive,extract='selective')
+    assert sorted(stamped.nodes)==sorted(built.nodes)
+    for side in SIDES:
+        for node in ('_wrist_IK_Ctrl','_elbow_IK_PoleVec','_elbow_FK_Ctrl','_wrist_IK_Handle','_shoulderBlend'):
+            assert stamped.objExists(side+node),side+node
+    stamped_world,built_world=rig_worlds(stamped),rig_worlds(built)
+    for name,matrix in built_world.items():
+        assert np.abs(stamped_world[name]-matrix).max()<TOLERANCE,name
+
+def test_stamp_keeps_other_names():
+    # a. A node named after the parent of the shoulder but not made from it keeps its name
+    assert ikfkTemplate.generic('L_clavicleIKFK_grp',{'shoulder':'L_shoulder','parent':'L_clavicle'})=='L_clavicleIKFK_grp'
+    assert ikfkTemplate.generic('L_clavicle.worldMatrix[0]',{'parent':'L_clavicle'})=='{parent}.worldMatrix[0]'
+    assert ikfkTemplate.generic('L_wrist_IK_orientConstraint1',{'wrist':'L_wrist'})=='{wrist}_IK_orientConstraint1'
+
+def test_stamp_rejects_arm_without_wrist():
+    scene,shoulders=arm_scene(('L','R'))
+    with ikfkBackend.use_backend(scene):
+        template=ikfkTemplate.capture_template(shoulders[0])
+        scene.delete('R_wrist')
+        nodes=len(scene.nodes)
+        with pytest.raises(ValueError):
+            ikfkTemplate.stamp_template(template,shoulders[1:])
+        assert len(scene.nodes)==nodes